@@ -0,0 +1,184 @@
+"""Асинхронные варианты горячих эндпоинтов чтения.
+
+Обращения к БД идут через асинхронный ORM и не занимают поток,
+пока ждут ответа. Фильтры, пагинатор и сериализаторы общие с
+синхронными представлениями, поэтому формат ответа совпадает.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import InvalidPage, Page
+from django.http import HttpResponse
+from django.utils.translation import gettext as _
+from django.views.decorators.http import require_GET, require_safe
+from django_filters.utils import translate_validation
+from rest_framework import exceptions, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from recipes.models import Recipe
+
+from . import short_codes
+from .cache import (
+    get_cached_recipe_page, get_recipe_list_cache_key,
+    is_recipe_list_cacheable, overlay_user_flags,
+    set_cached_recipe_page,
+)
+from .fast_json import FastJSONRenderer
+from .filters import RecipeFilter
+from .ingredient_index import ingredient_index
+from .pagination import CustomPageNumberPagination
+from .recipe_feed import get_recipe_rows, serialize_recipe_rows
+from .recipe_ids import recipe_ids
+from .serializers import RecipeSerializer
+from .views import get_recipe_queryset, short_redirect_response
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        content_type='application/json',
+        status=status_code,
+        headers=headers
+    )
+
+
+async def authenticate(request):
+    """Аутентификация по токену с теми же ответами, что у DRF."""
+    header = request.headers.get('Authorization', '').split()
+    if not header or header[0].lower() != TokenAuthentication.keyword.lower():
+        return AnonymousUser()
+    if len(header) == 1:
+        raise exceptions.AuthenticationFailed(
+            _('Invalid token header. No credentials provided.')
+        )
+    if len(header) > 2:
+        raise exceptions.AuthenticationFailed(
+            _('Invalid token header. '
+              'Token string should not contain spaces.')
+        )
+
+    try:
+        token = await Token.objects.select_related('user').aget(
+            key=header[1]
+        )
+    except Token.DoesNotExist:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    return token.user
+
+
+def async_api_view(view):
+    """Оборачивает запрос в Request DRF и отдаёт ошибки в формате API."""
+
+    @require_GET
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request = Request(request)
+        try:
+            request.user = await authenticate(request._request)
+            return await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            headers = None
+            if isinstance(exc, exceptions.AuthenticationFailed):
+                headers = {
+                    'WWW-Authenticate': TokenAuthentication.keyword
+                }
+            detail = exc.detail
+            if not isinstance(detail, (list, dict)):
+                detail = {'detail': detail}
+            return render(detail, exc.status_code, headers)
+
+    return wrapper
+
+
+def serialize_recipes(recipes, request, many=False):
+    return RecipeSerializer(
+        recipes, many=many, context={'request': request}
+    ).data
+
+
+async def paginate_recipes(request, queryset):
+    """Страница ленты в формате CustomPageNumberPagination."""
+    pagination = CustomPageNumberPagination()
+    page_size = pagination.get_page_size(request)
+    paginator = pagination.django_paginator_class(queryset, page_size)
+    paginator.count = await queryset.acount()
+    try:
+        number = paginator.validate_number(
+            request.query_params.get(pagination.page_query_param, 1)
+        )
+    except InvalidPage:
+        raise exceptions.NotFound(pagination.invalid_page_message)
+
+    offset = (number - 1) * page_size
+    recipes = [
+        recipe async for recipe in queryset[
+            offset:offset + page_size
+        ].aiterator(chunk_size=page_size)
+    ]
+    pagination.page = Page(recipes, number, paginator)
+    pagination.request = request
+    data = await sync_to_async(serialize_recipe_rows)(recipes, request)
+    return pagination.get_paginated_response(data).data
+
+
+@async_api_view
+async def recipe_list(request):
+    """Лента рецептов."""
+    cache_key = None
+    if is_recipe_list_cacheable(request):
+        cache_key = await sync_to_async(get_recipe_list_cache_key)(request)
+        data = await sync_to_async(get_cached_recipe_page)(cache_key)
+        if data is not None:
+            if request.user.is_authenticated:
+                await sync_to_async(overlay_user_flags)(data, request.user)
+            return render(data)
+
+    filterset = RecipeFilter(
+        request.query_params,
+        queryset=get_recipe_queryset(request.user),
+        request=request
+    )
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+
+    data = await paginate_recipes(request, get_recipe_rows(filterset.qs))
+    if cache_key is not None:
+        await sync_to_async(set_cached_recipe_page)(cache_key, data)
+    return render(data)
+
+
+@async_api_view
+async def recipe_detail(request, pk):
+    """Один рецепт."""
+    try:
+        recipe = await get_recipe_queryset(request.user).aget(pk=pk)
+    except Recipe.DoesNotExist:
+        raise exceptions.NotFound(
+            f'No {Recipe._meta.object_name} matches the given query.'
+        )
+    return render(await sync_to_async(serialize_recipes)(recipe, request))
+
+
+@async_api_view
+async def ingredient_list(request):
+    """Автодополнение ингредиентов из индекса в памяти."""
+    limit = request.query_params.get('limit')
+    return render(await ingredient_index.asearch(
+        request.query_params.get('name', ''),
+        limit=int(limit) if limit and limit.isdigit() else None
+    ))
+
+
+@require_safe
+async def recipe_short_redirect(request, short_code):
+    """Перенаправление короткой ссылки на рецепт."""
+    recipe_id = short_codes.decode(short_code)
+    return short_redirect_response(
+        request, recipe_id,
+        recipe_id is not None and await recipe_ids.acontains(recipe_id)
+    )
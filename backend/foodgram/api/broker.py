@@ -0,0 +1,340 @@
+"""Брокер канального слоя на Unix-сокетах.
+
+Один процесс-брокер держит очереди каналов и группы своей шарды, ASGI
+воркеры подключаются к нему через api.layers.BrokerChannelLayer. Кадр
+протокола — длина в 4 байта и кортеж в marshal: процессы локальные и
+доверенные, а marshal быстрее pickle и не исполняет код при разборе.
+Сами сообщения брокер хранит и пересылает уже закодированными байтами
+и никогда их не разбирает.
+"""
+import asyncio
+import logging
+import marshal
+import os
+import re
+import time
+import zlib
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+HEADER_SIZE = 4
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+CLEANUP_INTERVAL = 1.0
+# Сколько байт можно накопить в буфере ответов клиенту до ожидания.
+WRITE_HIGH_WATER = 256 * 1024
+# Сколько помнить мёртвые каналы: дольше group_expiry по умолчанию
+# членство в группе всё равно не живёт.
+DEAD_CHANNEL_TTL = 86400
+
+DEFAULT_CONFIG = {
+    'capacity': 100,
+    'channel_capacity': (),
+    'expiry': 60,
+    'group_expiry': 86400,
+}
+
+
+def encode_frame(frame):
+    body = marshal.dumps(frame)
+    return len(body).to_bytes(HEADER_SIZE, 'big') + body
+
+
+async def read_frame(reader):
+    size = int.from_bytes(await reader.readexactly(HEADER_SIZE), 'big')
+    if size > MAX_FRAME_SIZE:
+        raise ConnectionError(f'Слишком большой кадр: {size} байт')
+    return marshal.loads(await reader.readexactly(size))
+
+
+def non_local_name(name):
+    if '!' in name:
+        return name[:name.find('!') + 1]
+    return name
+
+
+def get_shard(name, shards):
+    """Номер шарды канала или группы, одинаковый во всех процессах."""
+    if shards == 1:
+        return 0
+    return zlib.crc32(non_local_name(name).encode()) % shards
+
+
+class Config:
+    """Настройки слоя, общие для брокера и всех его клиентов."""
+
+    def __init__(self, capacity, channel_capacity, expiry, group_expiry):
+        self.capacity = capacity
+        self.channel_capacity = [
+            (re.compile(pattern), value)
+            for pattern, value in channel_capacity
+        ]
+        self.expiry = expiry
+        self.group_expiry = group_expiry
+
+    def __eq__(self, other):
+        return self.key() == other.key()
+
+    def key(self):
+        return (
+            self.capacity,
+            [(pattern.pattern, value)
+             for pattern, value in self.channel_capacity],
+            self.expiry,
+            self.group_expiry,
+        )
+
+    def get_capacity(self, channel):
+        for pattern, value in self.channel_capacity:
+            if pattern.match(channel):
+                return value
+        return self.capacity
+
+
+class Client:
+    """Подключение одного процесса-воркера."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        # rid ожидающих receive -> канал.
+        self.waiting = {}
+
+    def reply(self, *frame):
+        self.writer.write(encode_frame(frame))
+
+
+class Broker:
+    """Очереди каналов и группы одной шарды."""
+
+    def __init__(self, shard=0, shards=1, config=None):
+        self.shard = shard
+        self.shards = shards
+        # Ёмкость и сроки — свойства очередей брокера, а не клиента:
+        # иначе они зависели бы от того, какой воркер прислал сообщение.
+        self.config = (
+            Config(**DEFAULT_CONFIG) if config is None else Config(*config)
+        )
+        self.channels = {}
+        self.waiters = {}
+        self.groups = {}
+        # Каналы с просроченными сообщениями. Их группы могут жить на
+        # других шардах, и те узнают о смерти канала из ответа deliver.
+        self.dead = {}
+        self.clients = set()
+        self.handlers = {
+            'hello': self.hello,
+            'send': self.send,
+            'receive': self.receive,
+            'cancel': self.cancel,
+            'requeue': self.requeue,
+            'group_add': self.group_add,
+            'group_discard': self.group_discard,
+            'group_send': self.group_send,
+            'deliver': self.deliver,
+            'revive': self.revive,
+            'flush': self.flush,
+        }
+
+    async def handle(self, reader, writer):
+        client = Client(writer)
+        self.clients.add(client)
+        try:
+            while True:
+                op, *args = await read_frame(reader)
+                self.handlers[op](client, *args)
+                transport = writer.transport
+                if transport.get_write_buffer_size() > WRITE_HIGH_WATER:
+                    # Медленный клиент не даёт брокеру копить ответы.
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception('Ошибка в подключении к брокеру')
+        finally:
+            self.clients.discard(client)
+            self.drop(client)
+            writer.close()
+
+    def close_clients(self):
+        for client in self.clients:
+            client.writer.close()
+
+    def drop(self, client):
+        for rid, channel in client.waiting.items():
+            self.remove_waiter(channel, client, rid)
+        client.waiting.clear()
+
+    def remove_waiter(self, channel, client, rid):
+        waiters = self.waiters.get(channel)
+        if waiters is None:
+            return
+        try:
+            waiters.remove((client, rid))
+        except ValueError:
+            return
+        if not waiters:
+            del self.waiters[channel]
+
+    def put(self, channel, message):
+        """Отдаёт сообщение ждущему receive или кладёт в очередь."""
+        waiters = self.waiters.get(channel)
+        if waiters:
+            client, rid = waiters.popleft()
+            if not waiters:
+                del self.waiters[channel]
+            del client.waiting[rid]
+            client.reply('message', rid, message)
+            return True
+        queue = self.channels.get(channel)
+        if queue is None:
+            queue = self.channels[channel] = deque()
+        else:
+            self.expire(channel, queue)
+        if len(queue) >= self.config.get_capacity(channel):
+            return False
+        queue.append((time.monotonic() + self.config.expiry, message))
+        return True
+
+    def expire(self, channel, queue):
+        now = time.monotonic()
+        expired = False
+        while queue and queue[0][0] < now:
+            queue.popleft()
+            expired = True
+        if expired:
+            # Как в InMemoryChannelLayer: раз сообщение никто не забрал,
+            # канал считается мёртвым и выходит из всех групп.
+            self.dead[channel] = now
+            for members in self.groups.values():
+                members.pop(channel, None)
+
+    def cleanup(self):
+        for channel, queue in list(self.channels.items()):
+            self.expire(channel, queue)
+            if not queue:
+                del self.channels[channel]
+        deadline = time.monotonic() - DEAD_CHANNEL_TTL
+        for channel, expired in list(self.dead.items()):
+            if expired < deadline:
+                del self.dead[channel]
+
+    def hello(self, client, rid, *config):
+        """Проверяет, что настройки слоя клиента совпадают с брокером."""
+        if Config(*config) == self.config:
+            client.reply('ok', rid)
+        else:
+            client.reply('mismatch', rid, self.config.key())
+
+    def send(self, client, rid, channel, message):
+        client.reply(
+            'ok' if self.put(channel, message) else 'full',
+            rid
+        )
+
+    def receive(self, client, rid, channel):
+        queue = self.channels.get(channel)
+        if queue:
+            self.expire(channel, queue)
+        if queue:
+            client.reply('message', rid, queue.popleft()[1])
+            return
+        self.waiters.setdefault(channel, deque()).append((client, rid))
+        client.waiting[rid] = channel
+
+    def cancel(self, client, rid):
+        channel = client.waiting.pop(rid, None)
+        if channel is not None:
+            self.remove_waiter(channel, client, rid)
+        # Если сообщение уже ушло, оно придёт клиенту раньше этого
+        # ответа, и клиент вернёт его через requeue.
+        client.reply('cancelled', rid)
+
+    def requeue(self, client, rid, channel, message):
+        waiters = self.waiters.get(channel)
+        if waiters:
+            self.put(channel, message)
+            return
+        queue = self.channels.setdefault(channel, deque())
+        queue.appendleft((time.monotonic() + self.config.expiry, message))
+
+    def group_add(self, client, rid, group, channel):
+        self.dead.pop(channel, None)
+        self.groups.setdefault(group, {})[channel] = time.monotonic()
+        client.reply('ok', rid)
+
+    def group_discard(self, client, rid, group, channel):
+        members = self.groups.get(group)
+        if members is not None:
+            members.pop(channel, None)
+            if not members:
+                del self.groups[group]
+        client.reply('ok', rid)
+
+    def group_send(self, client, rid, group, message):
+        """Доставляет своим каналам, остальные возвращает клиенту."""
+        members = self.groups.get(group)
+        remote = []
+        if members:
+            deadline = time.monotonic() - self.config.group_expiry
+            for channel, added in list(members.items()):
+                if added < deadline:
+                    del members[channel]
+                elif get_shard(channel, self.shards) == self.shard:
+                    # Переполненные каналы пропускаются, как у group_send
+                    # в других слоях.
+                    self.put(channel, message)
+                else:
+                    remote.append(channel)
+        client.reply('ok', rid, remote)
+
+    def deliver(self, client, rid, channels, message):
+        """Доставка по group_send другой шарды, мёртвые каналы в ответе."""
+        dead = []
+        for channel in channels:
+            if channel in self.dead:
+                dead.append(channel)
+            else:
+                self.put(channel, message)
+        client.reply('ok', rid, dead)
+
+    def revive(self, client, rid, channel):
+        """Канал снова добавлен в группу на другой шарде."""
+        self.dead.pop(channel, None)
+        client.reply('ok', rid)
+
+    def flush(self, client, rid):
+        self.channels.clear()
+        self.groups.clear()
+        self.dead.clear()
+        client.reply('ok', rid)
+
+    async def run_cleanup(self):
+        while True:
+            await asyncio.sleep(CLEANUP_INTERVAL)
+            self.cleanup()
+
+
+async def serve(path, shard=0, shards=1, config=None, started=None):
+    """Запускает брокер шарды на сокете path до отмены.
+
+    config — BrokerChannelLayer.broker_config, клиенты с другими
+    настройками получают отказ при подключении.
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+    broker = Broker(shard, shards, config)
+    server = await asyncio.start_unix_server(broker.handle, path)
+    cleanup = asyncio.ensure_future(broker.run_cleanup())
+    logger.info('Брокер шарды %s из %s слушает %s', shard, shards, path)
+    if started is not None:
+        started()
+    try:
+        # Не serve_forever: при отмене он ждёт, пока клиенты отключатся
+        # сами, а они держат соединения всё время жизни воркера.
+        await asyncio.get_running_loop().create_future()
+    finally:
+        server.close()
+        broker.close_clients()
+        cleanup.cancel()
+        if os.path.exists(path):
+            os.unlink(path)
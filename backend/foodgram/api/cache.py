@@ -0,0 +1,131 @@
+import copy
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+from .subscriptions import SubscriptionResolver
+
+
+RECIPES_VERSION_KEY = 'recipes:version'
+RECIPE_LIST_KEY_PREFIX = 'recipes:list'
+
+# Фильтры, результат которых зависит от текущего пользователя.
+USER_FILTER_PARAMS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def get_version(key):
+    """Возвращает текущее значение счётчика версии из кэша."""
+    version = cache.get(key)
+    if version is None:
+        # Начальное значение берём от времени, чтобы после вытеснения
+        # счётчика не совпасть с версией уже закэшированных страниц.
+        version = time.time_ns()
+        cache.add(key, version)
+        version = cache.get(key, version)
+    return version
+
+
+async def aget_version(key):
+    """Асинхронный вариант get_version."""
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        await cache.aadd(key, version)
+        version = await cache.aget(key, version)
+    return version
+
+
+def bump_version(key):
+    """Увеличивает счётчик версии, делая старые записи недоступными."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def get_recipes_version():
+    return get_version(RECIPES_VERSION_KEY)
+
+
+def bump_recipes_version():
+    bump_version(RECIPES_VERSION_KEY)
+
+
+def is_recipe_list_cacheable(request):
+    """Проверяет, можно ли отдать страницу ленты из общего кэша."""
+    if not request.user.is_authenticated:
+        return True
+    return all(
+        request.query_params.get(param) in (None, '', '0')
+        for param in USER_FILTER_PARAMS
+    )
+
+
+def get_recipe_list_cache_key(request):
+    """Ключ страницы ленты: версия рецептов, адрес и параметры запроса."""
+    params = '&'.join(
+        f'{name}={value}'
+        for name, values in sorted(request.query_params.lists())
+        for value in values
+    )
+    # Ссылки на следующую страницу и изображения абсолютные, поэтому
+    # в ключ входят схема, хост и путь: у синхронной и асинхронной
+    # ленты страницы одинаковые, а ссылки разные.
+    raw = f'{request.build_absolute_uri(request.path)}?{params}'
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f'{RECIPE_LIST_KEY_PREFIX}:{get_recipes_version()}:{digest}'
+
+
+def anonymize_recipe_page(data):
+    """Копия страницы ленты в том виде, в каком её видит аноним."""
+    data = copy.deepcopy(data)
+    for recipe in data['results']:
+        recipe['is_favorited'] = False
+        recipe['is_in_shopping_cart'] = False
+        recipe['author']['is_subscribed'] = False
+    return data
+
+
+def overlay_user_flags(data, user):
+    """Проставляет в анонимной странице флаги текущего пользователя."""
+    results = data['results']
+    if not results:
+        return data
+
+    flags = {
+        pk: (is_favorited, is_in_shopping_cart)
+        for pk, is_favorited, is_in_shopping_cart in Recipe.objects.filter(
+            pk__in=[recipe['id'] for recipe in results]
+        ).annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+        ).values_list('pk', 'is_favorited', 'is_in_shopping_cart')
+    }
+    subscriptions = SubscriptionResolver(user)
+    subscriptions.prime(recipe['author']['id'] for recipe in results)
+
+    for recipe in results:
+        recipe['is_favorited'], recipe['is_in_shopping_cart'] = flags.get(
+            recipe['id'], (False, False)
+        )
+        recipe['author']['is_subscribed'] = subscriptions.is_subscribed(
+            recipe['author']['id']
+        )
+    return data
+
+
+def get_cached_recipe_page(key):
+    return cache.get(key)
+
+
+def set_cached_recipe_page(key, data):
+    cache.set(key, anonymize_recipe_page(data), settings.RECIPES_CACHE_TIMEOUT)
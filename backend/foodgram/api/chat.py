@@ -0,0 +1,161 @@
+"""Комнаты чата для ChatConsumer.
+
+История — кольцевой буфер последних CHAT_HISTORY_SIZE сообщений на
+комнату в памяти процесса, комнат не больше CHAT_MAX_ROOMS (давно не
+писавшие вытесняются). Буфер наполняется сообщениями, которые процесс
+доставляет своим сокетам. При CHAT_PERSIST сообщения копятся и
+записываются в БД одним bulk_create раз в CHAT_FLUSH_INTERVAL секунд,
+а история комнаты, которой ещё нет в памяти, поднимается из БД.
+
+Буфер видит только сообщения своего процесса, поэтому при нескольких
+ASGI-воркерах история берётся только из БД и без CHAT_PERSIST не
+присылается.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from recipes.models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class RoomHistory:
+    """Последние сообщения комнат, каждое не больше одного раза."""
+
+    def __init__(self, size, max_rooms):
+        self.size = size
+        self.max_rooms = max_rooms
+        self.rooms = OrderedDict()
+
+    def __contains__(self, room):
+        return room in self.rooms
+
+    def get(self, room):
+        messages, _ = self.rooms.get(room, ((), None))
+        return list(messages)
+
+    def get_room(self, room):
+        if room in self.rooms:
+            self.rooms.move_to_end(room)
+            return self.rooms[room]
+        self.rooms[room] = deque(), set()
+        if len(self.rooms) > self.max_rooms:
+            self.rooms.popitem(last=False)
+        return self.rooms[room]
+
+    def has_message(self, room, message_id):
+        return message_id in self.get_room(room)[1]
+
+    def add(self, room, message):
+        """Добавляет сообщение, которое могли доставить и другие сокеты."""
+        messages, ids = self.get_room(room)
+        if message['id'] in ids:
+            return
+        if len(messages) == self.size:
+            ids.discard(messages.popleft()['id'])
+        messages.append(message)
+        ids.add(message['id'])
+
+    def load(self, room, messages):
+        """Ставит сообщения из БД перед пришедшими, пока их читали."""
+        arrived = self.get(room)
+        # Пустая комната тоже запоминается, чтобы не ходить в БД.
+        self.rooms.pop(room, None)
+        self.get_room(room)
+        for message in (messages + arrived)[-self.size:]:
+            self.add(room, message)
+
+
+class TokenBucket:
+    """Не больше rate сообщений в секунду, всплеском до burst."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class ChatArchive:
+    """Запись сообщений в БД пачками из фоновой задачи."""
+
+    def __init__(self):
+        self.loop = None
+        self.pending = []
+
+    def add(self, room, user_id, message):
+        if self.loop is not asyncio.get_running_loop():
+            self.loop = asyncio.get_running_loop()
+            self.loop.create_task(self.run(settings.CHAT_FLUSH_INTERVAL))
+        self.pending.append(ChatMessage(
+            room=room,
+            user_id=user_id,
+            user_label=message['user'],
+            text=message['message'],
+            sent_at=parse_datetime(message['sent_at']),
+        ))
+
+    async def run(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    async def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return 0
+        try:
+            await database_sync_to_async(ChatMessage.objects.bulk_create)(
+                batch
+            )
+        except Exception:
+            # Чат не должен падать из-за БД: пачка теряется, но её
+            # сообщения остаются в истории комнат.
+            logger.exception('Не удалось записать %s сообщений', len(batch))
+            return 0
+        return len(batch)
+
+
+def serialize_chat_message(chat_message):
+    return {
+        'id': f'db-{chat_message.pk}',
+        'user': chat_message.user_label,
+        'message': chat_message.text,
+        'sent_at': chat_message.sent_at.isoformat(),
+    }
+
+
+@database_sync_to_async
+def get_saved_history(room, limit):
+    return [
+        serialize_chat_message(chat_message)
+        for chat_message in reversed(
+            ChatMessage.objects.filter(room=room).order_by('-sent_at')[:limit]
+        )
+    ]
+
+
+def is_shared():
+    """Историю видят все воркеры только через БД."""
+    return settings.ASGI_WORKERS > 1
+
+
+history = RoomHistory(settings.CHAT_HISTORY_SIZE, settings.CHAT_MAX_ROOMS)
+archive = ChatArchive()
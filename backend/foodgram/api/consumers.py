@@ -1,94 +1,182 @@
-import json
+from uuid import uuid4
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.utils import timezone
+
+from recipes.models import Recipe
+
+from . import chat
+from .chat import TokenBucket
+from .fast_json import dumps_text, loads
+from .feed_push import get_feed_group
+from .presence import get_user_label, presence
+
+
+@database_sync_to_async
+def recipe_exists(recipe_id):
+    return Recipe.objects.filter(pk=recipe_id).exists()
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class JSONMixin:
+    """encode_json и decode_json как у AsyncJsonWebsocketConsumer.
+
+    Рассылка в группу кодирует кадр один раз и передаёт его в событии
+    полем text: обработчик отправляет готовую строку, не кодируя её
+    заново для каждого сокета.
+    """
+
+    @classmethod
+    async def decode_json(cls, text_data):
+        return loads(text_data)
+
+    @classmethod
+    async def encode_json(cls, content):
+        return dumps_text(content)
+
+    async def send_json(self, content, close=False):
+        await self.send(
+            text_data=await self.encode_json(content), close=close
+        )
+
+
+class ChatConsumer(JSONMixin, AsyncWebsocketConsumer):
+    """Чат комнаты: история при подключении, лимиты до разбора JSON."""
+
+    room_group_name = None
+
     async def connect(self):
-        self.room_group_name = "chat_room"
+        kwargs = self.scope["url_route"]["kwargs"]
+        if "recipe_id" in kwargs:
+            if not await recipe_exists(kwargs["recipe_id"]):
+                await self.close(code=4404)
+                return
+            self.room = f"recipe-{kwargs['recipe_id']}"
+        else:
+            self.room = kwargs.get("room", "general")
+            # Комнаты рецептов открываются только по адресу рецепта,
+            # где проверяется, что он существует.
+            if self.room.startswith("recipe-"):
+                await self.close(code=4404)
+                return
+        self.room_group_name = f"chat.{self.room}"
+        self.rate_limit = TokenBucket(
+            settings.CHAT_RATE_LIMIT, settings.CHAT_BURST
+        )
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
         await self.accept()
 
+        for message in await self.get_history():
+            await self.send_json(message)
+
+    async def get_history(self):
+        if chat.is_shared():
+            if not settings.CHAT_PERSIST:
+                return []
+            return await chat.get_saved_history(
+                self.room, settings.CHAT_HISTORY_SIZE
+            )
+        if settings.CHAT_PERSIST and self.room not in chat.history:
+            chat.history.load(self.room, await chat.get_saved_history(
+                self.room, settings.CHAT_HISTORY_SIZE
+            ))
+        return chat.history.get(self.room)
+
     async def disconnect(self, close_code):
+        if self.room_group_name is None:
+            return
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-    async def receive(self, text_data):
-        data = json.loads(text_data)
-        message = data.get("message", "")
+    async def receive(self, text_data=None, bytes_data=None):
+        # Размер и частота проверяются до разбора JSON: разбор огромного
+        # или бесконечного потока кадров и есть то, от чего защищаемся.
+        if text_data is None:
+            await self.close(code=1003)
+            return
+        if len(text_data) > settings.CHAT_MAX_FRAME_SIZE:
+            await self.close(code=1009)
+            return
+        if not self.rate_limit.allow():
+            await self.send_error("Слишком много сообщений, подождите")
+            return
+        try:
+            message = (await self.decode_json(text_data)).get("message")
+        except (ValueError, AttributeError):
+            message = None
+        if not isinstance(message, str) or not message.strip():
+            await self.send_error('Ожидается {"message": "текст"}')
+            return
 
         # Получаем пользователя
         user = self.scope["user"]
-        user_label = user.email if user.is_authenticated else "Anonymous"
-
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "chat_message",
-                "message": message,
-                "user": user_label
-            }
-        )
+        event = {
+            "id": uuid4().hex,
+            "user": get_user_label(user),
+            "message": message,
+            "sent_at": timezone.now().isoformat(),
+        }
+        if settings.CHAT_PERSIST:
+            chat.archive.add(self.room, user.pk, event)
+        # В событии только готовый кадр и id: поля сообщения уже в нём.
+        await self.channel_layer.group_send(self.room_group_name, {
+            "type": "chat_message",
+            "id": event["id"],
+            "text": await self.encode_json(event),
+        })
 
     async def chat_message(self, event):
-        message = event["message"]
-        user = event["user"]
-        await self.send(text_data=json.dumps({
-            "message": message,
-            "user": user
-        }))
+        # Кадр разбирается для истории один раз на процесс: у остальных
+        # сокетов комнаты сообщение в ней уже есть.
+        if not chat.is_shared() and not chat.history.has_message(
+            self.room, event["id"]
+        ):
+            chat.history.add(self.room, await self.decode_json(event["text"]))
+        await self.send(text_data=event["text"])
+
+    async def send_error(self, error):
+        await self.send_json({"error": error})
 
 
 class UserStatusConsumer(AsyncWebsocketConsumer):
+    """Снимок онлайн-пользователей при подключении, затем диффы."""
+
     async def connect(self):
-        self.user_group = "user_status"
-        await self.channel_layer.group_add(
-            self.user_group,
-            self.channel_name
-        )
+        self.user_label = get_user_label(self.scope["user"])
         await self.accept()
+        await presence.attach(self, self.user_label)
+
+    async def disconnect(self, close_code):
+        presence.detach(self, self.user_label)
+
+
+class FeedConsumer(JSONMixin, AsyncWebsocketConsumer):
+    """Новые рецепты авторов, на которых подписан пользователь."""
 
-        # Отправка уведомления о подключении
+    group_name = None
+
+    async def connect(self):
         user = self.scope["user"]
-        user_label = user.email if user.is_authenticated else "Anonymous"
-        await self.channel_layer.group_send(
-            self.user_group,
-            {
-                "type": "user_joined",
-                "user": user_label
-            }
-        )
+        if not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.group_name = get_feed_group(user.pk)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
 
     async def disconnect(self, close_code):
-        # Отправка уведомления об отключении
-        user = self.scope["user"]
-        user_label = user.email if user.is_authenticated else "Anonymous"
-        await self.channel_layer.group_send(
-            self.user_group,
-            {
-                "type": "user_left",
-                "user": user_label
-            }
-        )
+        if self.group_name is None:
+            return
         await self.channel_layer.group_discard(
-            self.user_group,
+            self.group_name,
             self.channel_name
         )
 
-    async def user_joined(self, event):
-        user = event["user"]
-        await self.send(text_data=json.dumps({
-            "status": "joined",
-            "user": user
-        }))
-
-    async def user_left(self, event):
-        user = event["user"]
-        await self.send(text_data=json.dumps({
-            "status": "left",
-            "user": user
-        }))
+    async def feed_recipe(self, event):
+        await self.send(text_data=event["text"])
@@ -0,0 +1,161 @@
+"""Кодирование JSON для ответов API и WebSocket.
+
+Если установлен orjson, JSON кодируется и разбирается им, иначе —
+модулем json с кодировщиком DRF. Результат в обоих случаях тот же, что
+у JSONRenderer DRF: компактный, в UTF-8, даты, Decimal и ленивые строки
+кодирует encoders.JSONEncoder. Что orjson кодирует иначе — NaN и
+бесконечности он пишет как null, а целые длиннее 64 бит не кодирует
+вовсе, — кодируется кодировщиком DRF: NaN даёт ValueError, как в DRF.
+Целые длиннее 64 бит orjson разбирает во float, поэтому JSON с такими
+числами, как и тот, что orjson не разобрал, разбирает модуль json.
+"""
+import io
+import json
+import math
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_encoder = JSONEncoder(
+    ensure_ascii=False, separators=(',', ':'), allow_nan=False
+)
+_SCALARS = frozenset({str, int, bool, type(None)})
+_CONTAINERS = (dict, list, tuple)
+_INFINITIES = (math.inf, -math.inf)
+# 19 цифр подряд есть в каждом целом меньше -2 ** 63 и больше
+# 2 ** 64 - 1. Совпадение в строке или дроби лишь отдаёт разбор модулю
+# json.
+_LONG_DIGITS = re.compile('[0-9]{19}')
+_LONG_DIGITS_BYTES = re.compile(b'[0-9]{19}')
+
+if orjson is not None:
+    # Даты отдаются кодировщику DRF: orjson пишет их в другом формате.
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def get_backend():
+    return 'orjson' if orjson is not None else 'json'
+
+
+def _has_nonfinite(data):
+    """Есть ли в данных NaN или бесконечность."""
+    if isinstance(data, dict):
+        data = data.values()
+    elif not isinstance(data, _CONTAINERS):
+        data = (data,)
+    for value in data:
+        kind = type(value)
+        if kind in _SCALARS:
+            continue
+        if kind is float:
+            if value != value or value in _INFINITIES:
+                return True
+        elif isinstance(value, _CONTAINERS) and _has_nonfinite(value):
+            return True
+    return False
+
+
+def _default(obj):
+    value = _encoder.default(obj)
+    if _has_nonfinite(value):
+        # orjson записал бы null, исключение вернёт кодирование DRF.
+        raise ValueError('Out of range float values are not JSON compliant')
+    return value
+
+
+def _dumps_orjson(data):
+    """JSON от orjson или None, если DRF закодировал бы его иначе."""
+    try:
+        encoded = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        return None
+    # NaN превращается в null, поэтому данные обходятся, только если
+    # null в ответе есть.
+    if b'null' in encoded and _has_nonfinite(data):
+        return None
+    return encoded
+
+
+def dumps(data):
+    """JSON в байтах UTF-8."""
+    if orjson is not None:
+        encoded = _dumps_orjson(data)
+        if encoded is not None:
+            return encoded
+    return _encoder.encode(data).encode()
+
+
+def dumps_text(data):
+    """JSON строкой, для текстовых кадров WebSocket."""
+    if orjson is not None:
+        encoded = _dumps_orjson(data)
+        if encoded is not None:
+            return encoded.decode()
+    return _encoder.encode(data)
+
+
+def _has_long_digits(data):
+    if isinstance(data, str):
+        return _LONG_DIGITS.search(data) is not None
+    return _LONG_DIGITS_BYTES.search(data) is not None
+
+
+def loads(data):
+    """Разбирает JSON из строки или байтов, ошибка — ValueError."""
+    if orjson is not None and not _has_long_digits(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson, если он установлен."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None
+            or self.ensure_ascii or not self.compact or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        encoded = _dumps_orjson(data)
+        if encoded is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем разделители строк, которые JSON
+        # допускает, а JavaScript — нет.
+        return encoded.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser на orjson, если он установлен."""
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET
+        )
+        if orjson is None or encoding.lower() not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if not _has_long_digits(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                # Ошибку, как и то, что orjson не принимает (например,
+                # 1e400), пусть разбирает и описывает DRF.
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
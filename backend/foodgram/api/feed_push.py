@@ -0,0 +1,130 @@
+"""Рассылка новых рецептов подписчикам автора через WebSocket.
+
+Создание рецепта только ставит рассылку в пул потоков после фиксации
+транзакции, поэтому ответ на POST не зависит от числа подписчиков.
+Поток читает подписчиков пачками по FEED_PUSH_CHUNK_SIZE по индексу
+(author, user) и отправляет одно и то же событие в группу каждого из
+них. Рассылка не переживает перезапуск процесса: подписчик, которого
+не успели уведомить, увидит рецепт в ленте.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections
+
+from users.models import Subscription
+
+from .fast_json import dumps_text
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def get_feed_group(user_id):
+    return f'feed.user.{user_id}'
+
+
+def get_follower_chunk(author_id, after, size):
+    """Следующие size подписчиков автора с id больше after."""
+    return list(
+        Subscription.objects.filter(author_id=author_id, user_id__gt=after)
+        .order_by('user_id')
+        .values_list('user_id', flat=True)[:size]
+    )
+
+
+async def send_to_followers(user_ids, message):
+    layer = get_channel_layer()
+    await asyncio.gather(*(
+        layer.group_send(get_feed_group(user_id), message)
+        for user_id in user_ids
+    ))
+
+
+async def send_and_close(user_ids, message):
+    try:
+        await send_to_followers(user_ids, message)
+    finally:
+        # Цикл async_to_sync закрывается после вызова, подключения
+        # слоя из него больше не нужны.
+        await get_channel_layer().close()
+
+
+def send_chunk(user_ids, message, loop=None):
+    if loop is not None and loop.is_running():
+        # Слой в памяти будит только тот цикл событий, в котором ждут
+        # сокеты, поэтому отправка идёт в цикле ASGI-сервера.
+        asyncio.run_coroutine_threadsafe(
+            send_to_followers(user_ids, message), loop
+        ).result()
+    else:
+        async_to_sync(send_and_close)(user_ids, message)
+
+
+def push_recipe(author_id, recipe, loop=None):
+    """Отправляет рецепт всем подписчикам, возвращает их число."""
+    # Кадр кодируется один раз и уходит всем подписчикам как есть.
+    message = {'type': 'feed.recipe', 'text': dumps_text({
+        'event': 'new_recipe', 'author': author_id, 'recipe': recipe
+    })}
+    size = settings.FEED_PUSH_CHUNK_SIZE
+    sent, after = 0, 0
+    while True:
+        chunk = get_follower_chunk(author_id, after, size)
+        if chunk:
+            send_chunk(chunk, message, loop)
+        sent += len(chunk)
+        if len(chunk) < size:
+            return sent
+        after = chunk[-1]
+
+
+def _push(author_id, recipe, loop):
+    try:
+        push_recipe(author_id, recipe, loop)
+    except Exception:
+        logger.exception(
+            'Не удалось разослать рецепт %s подписчикам', recipe.get('id')
+        )
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.FEED_PUSH_WORKERS,
+                thread_name_prefix='feed-push'
+            )
+        return _executor
+
+
+async def _get_running_loop():
+    return asyncio.get_running_loop()
+
+
+def schedule_feed_push(author_id, recipe):
+    """Ставит рассылку рецепта в очередь пула потоков."""
+    # Из потока представления под ASGI-сервером это его цикл событий,
+    # вне сервера — временный, который к рассылке уже будет закрыт.
+    loop = async_to_sync(_get_running_loop)()
+    future = _get_executor().submit(_push, author_id, recipe, loop)
+    _pending.add(future)
+    future.add_done_callback(_pending.discard)
+    return future
+
+
+def wait_for_feed_pushes(timeout=None):
+    """Дожидается уже поставленных в очередь рассылок."""
+    wait(list(_pending), timeout=timeout)
@@ -0,0 +1,99 @@
+import bisect
+import threading
+
+from recipes.models import Ingredient
+
+from .cache import aget_version, bump_version, get_version
+
+
+INGREDIENTS_VERSION_KEY = 'ingredients:version'
+
+# Символ больше любого другого: верхняя граница диапазона префикса.
+MAX_CHAR = chr(0x10FFFF)
+
+
+def normalize(value):
+    return value.strip().casefold()
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов для автодополнения без запросов к БД.
+
+    Строится при первом обращении и перестраивается, когда меняется
+    версия ингредиентов в кэше, поэтому сигналы одного процесса
+    сбрасывают индекс и в остальных процессах с общим кэшем.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = ([], [])
+
+    def invalidate(self):
+        bump_version(INGREDIENTS_VERSION_KEY)
+
+    def search(self, query='', limit=None):
+        """Сначала ингредиенты, начинающиеся с query, затем содержащие его."""
+        return self._search(self._get_index(), query, limit)
+
+    async def asearch(self, query='', limit=None):
+        """Асинхронный вариант search: индекс строится через aiterator."""
+        version = await aget_version(INGREDIENTS_VERSION_KEY)
+        if self._version != version:
+            # Без блокировки: параллельная перестройка лишь повторит работу.
+            self._set_index(version, [
+                row async for row in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ).aiterator()
+            ])
+        return self._search(self._index, query, limit)
+
+    def _search(self, index, query, limit):
+        keys, rows = index
+        query = normalize(query)
+        if not query:
+            return rows[:limit]
+
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_right(keys, query + MAX_CHAR, lo=start)
+        result = rows[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+
+        for position, key in enumerate(keys):
+            if query in key and not start <= position < end:
+                result.append(rows[position])
+                if len(result) == limit:
+                    break
+        return result
+
+    def _get_index(self):
+        version = get_version(INGREDIENTS_VERSION_KEY)
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._build(version)
+        return self._index
+
+    def _build(self, version):
+        self._set_index(version, Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        ))
+
+    def _set_index(self, version, ingredients):
+        entries = sorted(
+            (normalize(name), pk, {
+                'id': pk, 'name': name, 'measurement_unit': unit
+            })
+            for pk, name, unit in ingredients
+        )
+        # Ключи и строки подменяются одним присваиванием, чтобы читатели
+        # без блокировки не увидели их несогласованными.
+        self._index = (
+            [key for key, _, _ in entries],
+            [row for _, _, row in entries],
+        )
+        self._version = version
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,294 @@
+"""Канальный слой для нескольких ASGI-воркеров без внешних сервисов.
+
+Очереди и группы живут в брокерах api.broker (manage.py
+run_channel_broker), воркеры ходят к ним по Unix-сокетам. Брокеров
+может быть несколько: канал хранится на шарде своего имени (для
+каналов процесса — общей части до «!»), группа — на шарде имени группы.
+group_send доставляет участникам на шарде группы, а остальных
+возвращает воркеру, который досылает сообщение их шардам.
+"""
+import asyncio
+import itertools
+import marshal
+import secrets
+import socket
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.core.exceptions import ImproperlyConfigured
+
+from .broker import encode_frame, get_shard, read_frame
+
+
+class BrokerConnection:
+    """Подключение к брокеру одной шарды в рамках одного event loop."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.rids = itertools.count()
+        self.pending = {}
+        # rid незавершённых receive -> канал, чтобы вернуть сообщение,
+        # пришедшее уже после отмены.
+        self.receiving = {}
+        self.closed = False
+        self.reader_task = asyncio.ensure_future(self.read_replies())
+
+    @classmethod
+    async def open(cls, path, config):
+        # Сокет свой, чтобы закрыть его и после закрытия event loop.
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await asyncio.get_running_loop().sock_connect(sock, path)
+            reader, writer = await asyncio.open_unix_connection(sock=sock)
+        except BaseException:
+            sock.close()
+            raise
+        connection = cls(reader, writer)
+        connection.sock = sock
+        status, result = await connection.request('hello', *config)
+        if status == 'mismatch':
+            await connection.close()
+            raise ImproperlyConfigured(
+                f'Настройки слоя {config} не совпадают с настройками '
+                f'брокера {path}: {tuple(result[0])}'
+            )
+        return connection
+
+    def start(self, op, *args):
+        if self.closed:
+            raise ConnectionError('Соединение с брокером закрыто')
+        rid = next(self.rids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[rid] = future
+        self.writer.write(encode_frame((op, rid, *args)))
+        return rid, future
+
+    async def request(self, op, *args):
+        _, future = self.start(op, *args)
+        return await future
+
+    def notify(self, op, rid, *args):
+        """Кадр по уже начатому запросу rid, без ожидания ответа."""
+        if not self.closed:
+            self.writer.write(encode_frame((op, rid, *args)))
+
+    async def read_replies(self):
+        try:
+            while True:
+                status, rid, *result = await read_frame(self.reader)
+                if status == 'cancelled':
+                    self.pending.pop(rid, None)
+                    self.receiving.pop(rid, None)
+                    continue
+                future = self.pending.pop(rid, None)
+                if status == 'message':
+                    channel = self.receiving.pop(rid, None)
+                    if future is None or future.done():
+                        self.notify('requeue', rid, channel, result[0])
+                        continue
+                if future is not None and not future.done():
+                    future.set_result((status, result))
+        except Exception as error:
+            self.fail(error)
+
+    def fail(self, error):
+        self.closed = True
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(
+                    ConnectionError(f'Брокер недоступен: {error!r}')
+                )
+        self.pending.clear()
+        self.receiving.clear()
+        self.writer.close()
+
+    async def close(self):
+        self.reader_task.cancel()
+        self.fail(ConnectionError('закрыто'))
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def drop(self):
+        """Закрывает сокет подключения, чей event loop уже закрыт."""
+        self.closed = True
+        self.sock.close()
+
+
+class BrokerChannelLayer(BaseChannelLayer):
+    """Слой поверх брокеров api.broker, по подключению на шарду."""
+
+    extensions = ['groups', 'flush']
+
+    def __init__(
+        self,
+        shards=('/tmp/foodgram-channels.sock',),
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        **kwargs
+    ):
+        super().__init__(
+            expiry=expiry,
+            capacity=capacity,
+            channel_capacity=channel_capacity,
+            **kwargs
+        )
+        self.shards = list(shards)
+        self.group_expiry = group_expiry
+        self.channel_capacity = self.compile_capacities(
+            self.channel_capacity
+        )
+        self.client_prefix = secrets.token_hex(6)
+        # Соединения asyncio привязаны к event loop, а async_to_sync
+        # создаёт свои циклы, поэтому подключения хранятся по циклам.
+        # Их закрывает close() в том же цикле, а подключения уже
+        # закрытых циклов — get_connection() при первом подключении из
+        # нового цикла.
+        self._connections = {}
+        self._locks = {}
+
+    @property
+    def broker_config(self):
+        return (
+            self.capacity,
+            [
+                (pattern.pattern, value)
+                for pattern, value in self.channel_capacity
+            ],
+            self.expiry,
+            self.group_expiry,
+        )
+
+    async def get_connection(self, shard):
+        loop = asyncio.get_running_loop()
+        connections = self._connections.get(loop)
+        if connections is None:
+            self._drop_closed_loops()
+            connections = self._connections[loop] = {}
+            self._locks[loop] = asyncio.Lock()
+        connection = connections.get(shard)
+        if connection is not None and not connection.closed:
+            return connection
+        async with self._locks[loop]:
+            connection = connections.get(shard)
+            if connection is None or connection.closed:
+                connection = connections[shard] = await BrokerConnection.open(
+                    self.shards[shard], self.broker_config
+                )
+        return connection
+
+    def _drop_closed_loops(self):
+        for loop in list(self._connections):
+            if loop.is_closed():
+                self._locks.pop(loop, None)
+                for connection in self._connections.pop(loop).values():
+                    connection.drop()
+
+    def get_shard(self, name):
+        return get_shard(name, len(self.shards))
+
+    # API канального слоя
+
+    async def send(self, channel, message):
+        """Отправляет сообщение в канал, ChannelFull при переполнении."""
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        assert '__asgi_channel__' not in message
+        connection = await self.get_connection(self.get_shard(channel))
+        status, _ = await connection.request(
+            'send', channel, marshal.dumps(message)
+        )
+        if status == 'full':
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        """Ждёт первое сообщение в канале."""
+        self.require_valid_channel_name(channel)
+        connection = await self.get_connection(self.get_shard(channel))
+        rid, future = connection.start('receive', channel)
+        connection.receiving[rid] = channel
+        try:
+            _, (message,) = await future
+        except asyncio.CancelledError:
+            if (
+                future.done() and not future.cancelled()
+                and future.exception() is None
+            ):
+                # Сообщение уже пришло, но задачу отменили раньше, чем
+                # она его забрала.
+                connection.notify(
+                    'requeue', rid, channel, future.result()[1][0]
+                )
+            else:
+                connection.notify('cancel', rid)
+            raise
+        return marshal.loads(message)
+
+    async def new_channel(self, prefix='specific.'):
+        return f'{prefix}.{self.client_prefix}!{secrets.token_hex(6)}'
+
+    async def flush(self):
+        for shard in range(len(self.shards)):
+            connection = await self.get_connection(shard)
+            await connection.request('flush')
+
+    async def close(self):
+        """Закрывает подключения к брокерам из текущего event loop."""
+        loop = asyncio.get_running_loop()
+        self._locks.pop(loop, None)
+        connections = self._connections.pop(loop, {})
+        for connection in connections.values():
+            await connection.close()
+
+    # Расширение groups
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        shard = self.get_shard(group)
+        requests = [self._request(shard, 'group_add', group, channel)]
+        channel_shard = self.get_shard(channel)
+        if channel_shard != shard:
+            # Шарда канала могла счесть его мёртвым и отбрасывать
+            # рассылки для него.
+            requests.append(self._request(channel_shard, 'revive', channel))
+        await asyncio.gather(*requests)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_channel_name(channel)
+        self.require_valid_group_name(group)
+        connection = await self.get_connection(self.get_shard(group))
+        await connection.request('group_discard', group, channel)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'Message is not a dict'
+        self.require_valid_group_name(group)
+        # Сообщение кодируется один раз на всех участников группы.
+        payload = marshal.dumps(message)
+        connection = await self.get_connection(self.get_shard(group))
+        _, (remote,) = await connection.request(
+            'group_send', group, payload
+        )
+        if not remote:
+            return
+        by_shard = {}
+        for channel in remote:
+            by_shard.setdefault(self.get_shard(channel), []).append(channel)
+        replies = await asyncio.gather(*(
+            self._request(shard, 'deliver', channels, payload)
+            for shard, channels in by_shard.items()
+        ))
+        # Каналы с просроченными сообщениями выходят из группы, как
+        # это делает брокер для каналов своей шарды.
+        for _, (dead,) in replies:
+            for channel in dead:
+                await connection.request('group_discard', group, channel)
+
+    async def _request(self, shard, op, *args):
+        connection = await self.get_connection(shard)
+        return await connection.request(op, *args)
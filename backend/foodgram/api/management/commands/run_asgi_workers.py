@@ -0,0 +1,97 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Первый дескриптор, который systemd передаёт сервису; с него же читает
+# переданные сокеты endpoint systemd в Twisted.
+LISTEN_FDS_START = 3
+
+
+def run_worker(fileno, application):
+    # Twisted не умеет слушать уже открытый сокет по номеру, но
+    # принимает его как сокет от systemd: третьим дескриптором и с
+    # LISTEN_PID этого процесса. Окружение Twisted читает при импорте.
+    os.dup2(fileno, LISTEN_FDS_START)
+    os.environ.update(
+        LISTEN_PID=str(os.getpid()), LISTEN_FDS='1', LISTEN_FDNAMES='http'
+    )
+    from daphne.cli import CommandLineInterface
+
+    CommandLineInterface().run(
+        ['-e', 'systemd:domain=INET:index=0', application]
+    )
+
+
+class Command(BaseCommand):
+    help = 'Запускает несколько процессов daphne на одном порту'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.ASGI_WORKERS,
+            help='Число процессов daphne'
+        )
+        parser.add_argument('--bind', default='0.0.0.0')
+        parser.add_argument('--port', type=int, default=8000)
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('Нужен хотя бы один воркер')
+        layer = settings.CHANNEL_LAYERS['default']['BACKEND']
+        if workers > 1 and layer != 'api.layers.BrokerChannelLayer':
+            raise CommandError(
+                'Несколько воркеров требуют CHANNEL_BROKER_SOCKETS: слой '
+                'в памяти не доставит сообщения между процессами'
+            )
+        if workers > 1 and not settings.CHAT_PERSIST:
+            self.stderr.write(self.style.WARNING(
+                'Без CHAT_PERSIST история чата при нескольких воркерах '
+                'не присылается'
+            ))
+        # Чат по числу воркеров решает, откуда брать историю.
+        settings.ASGI_WORKERS = workers
+        os.environ['ASGI_WORKERS'] = str(workers)
+        module, _, name = settings.ASGI_APPLICATION.rpartition('.')
+        # Сокет один на всех, соединения между воркерами распределяет
+        # ядро.
+        listener = socket.create_server(
+            (options['bind'], options['port']), backlog=1024
+        )
+        processes = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(listener.fileno(), f'{module}:{name}')
+            )
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        listener.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'{workers} воркеров daphne слушают '
+            f'{options["bind"]}:{options["port"]}'
+        ))
+        # SIGTERM от docker должен пройти через finally и остановить
+        # воркеры.
+        signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+        try:
+            # Упавший воркер останавливает остальных, контейнер
+            # перезапустится целиком.
+            multiprocessing.connection.wait(
+                [process.sentinel for process in processes]
+            )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
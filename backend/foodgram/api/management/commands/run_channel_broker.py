@@ -0,0 +1,67 @@
+import asyncio
+import multiprocessing
+import signal
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.broker import serve
+from api.layers import BrokerChannelLayer
+
+
+def run_shard(path, shard, shards, config):
+    # SIGTERM от docker должен пройти через finally: убрать сокет и
+    # остановить брокеры остальных шард.
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    try:
+        asyncio.run(serve(path, shard, shards, config))
+    except KeyboardInterrupt:
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Запускает брокеры канального слоя, по процессу на шарду'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shard',
+            type=int,
+            help='Запустить только шарду с этим номером'
+        )
+
+    def handle(self, *args, **options):
+        layer = settings.CHANNEL_LAYERS['default']
+        shards = layer.get('CONFIG', {}).get('shards')
+        if layer['BACKEND'] != 'api.layers.BrokerChannelLayer' or not shards:
+            raise CommandError(
+                'CHANNEL_LAYERS не настроен на api.layers.BrokerChannelLayer'
+            )
+        if options['shard'] is not None:
+            if not 0 <= options['shard'] < len(shards):
+                raise CommandError(f'Нет шарды {options["shard"]}')
+            numbers = [options['shard']]
+        else:
+            numbers = range(len(shards))
+        # Ёмкость и сроки хранения задаёт брокер, воркеры с другими
+        # настройками он не примет.
+        config = BrokerChannelLayer(**layer['CONFIG']).broker_config
+
+        processes = [
+            multiprocessing.Process(
+                target=run_shard,
+                args=(shards[number], number, len(shards), config),
+                daemon=True
+            )
+            for number in numbers[1:]
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(self.style.SUCCESS(
+            f'Брокеры шард {", ".join(map(str, numbers))} запущены'
+        ))
+        try:
+            run_shard(shards[numbers[0]], numbers[0], len(shards), config)
+        finally:
+            for process in processes:
+                process.terminate()
@@ -0,0 +1,255 @@
+"""Метрики запросов в памяти процесса и их выдача для Prometheus.
+
+Гистограммы устроены как в HdrHistogram: каждая степень двойки делится
+на SUB_BUCKETS равных корзин, поэтому относительная погрешность
+не больше 1 / SUB_BUCKETS при фиксированном объёме памяти. Границы le
+для Prometheus считаются по этим корзинам с той же точностью. У каждого
+процесса свои метрики, Prometheus собирает их с каждого отдельно.
+"""
+import contextvars
+import heapq
+import threading
+from time import perf_counter
+
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MICROSECONDS = 1_000_000
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 30, 50, 100, 200, 500, 1000)
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    """Логарифмически-линейная гистограмма целых неотрицательных чисел."""
+
+    def __init__(self, highest):
+        self.highest = highest
+        self.counts = [0] * (self.get_index(highest) + 1)
+        self.count = 0
+        self.total = 0
+
+    @staticmethod
+    def get_index(value):
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - 1 - SUB_BUCKET_BITS
+        return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def get_upper_bound(index):
+        """Наименьшее значение, которое уже не попадает в корзину."""
+        if index < SUB_BUCKETS:
+            return index + 1
+        shift = index // SUB_BUCKETS - 1
+        return (index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift
+
+    def record(self, value):
+        # Значения больше highest копятся в последней корзине.
+        self.counts[self.get_index(min(max(value, 0), self.highest))] += 1
+        self.count += 1
+        self.total += value
+
+    def get_cumulative(self, bounds):
+        """Число значений не больше каждой из возрастающих границ."""
+        result = []
+        index = cumulative = 0
+        for bound in bounds:
+            while (
+                index < len(self.counts)
+                and self.get_upper_bound(index) <= bound + 1
+            ):
+                cumulative += self.counts[index]
+                index += 1
+            result.append(cumulative)
+        return result
+
+
+class Metric:
+    """Гистограмма с подписями, отдаваемая как histogram Prometheus."""
+
+    def __init__(self, name, help_text, buckets, scale=1):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # Во сколько раз записываемые целые меньше единицы метрики.
+        self.scale = scale
+        self.bounds = [int(bucket * scale) for bucket in buckets]
+        self.highest = self.bounds[-1] * 2
+        self.histograms = {}
+
+    def record(self, labels, value):
+        histogram = self.histograms.get(labels)
+        if histogram is None:
+            histogram = self.histograms.setdefault(
+                labels, Histogram(self.highest)
+            )
+        histogram.record(value)
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for (view, method), histogram in sorted(self.histograms.items()):
+            labels = f'view="{view}",method="{method}"'
+            for bucket, count in zip(
+                self.buckets, histogram.get_cumulative(self.bounds)
+            ):
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bucket:g}"}} {count}'
+                )
+            lines.extend((
+                f'{self.name}_bucket{{{labels},le="+Inf"}} '
+                f'{histogram.count}',
+                f'{self.name}_sum{{{labels}}} '
+                f'{histogram.total / self.scale:g}',
+                f'{self.name}_count{{{labels}}} {histogram.count}',
+            ))
+        return lines
+
+
+class MetricsRegistry:
+    """Метрики всех представлений процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.duration = Metric(
+                'foodgram_request_duration_seconds',
+                'Время обработки запроса.',
+                DURATION_BUCKETS, MICROSECONDS
+            )
+            self.queries = Metric(
+                'foodgram_request_db_queries',
+                'Число запросов к БД за запрос.', QUERY_BUCKETS
+            )
+            self.db_duration = Metric(
+                'foodgram_request_db_duration_seconds',
+                'Время запросов к БД за запрос.',
+                DURATION_BUCKETS, MICROSECONDS
+            )
+            self.render_duration = Metric(
+                'foodgram_request_render_duration_seconds',
+                'Время сериализации ответа.',
+                DURATION_BUCKETS, MICROSECONDS
+            )
+
+    def record(self, view, method, stats):
+        labels = (view, method)
+        with self._lock:
+            self.duration.record(labels, to_microseconds(stats.duration))
+            self.queries.record(labels, stats.queries)
+            self.db_duration.record(labels, to_microseconds(stats.db_time))
+            if stats.render_time is not None:
+                self.render_duration.record(
+                    labels, to_microseconds(stats.render_time)
+                )
+
+    def render(self):
+        with self._lock:
+            lines = [
+                line
+                for metric in (
+                    self.duration, self.queries,
+                    self.db_duration, self.render_duration,
+                )
+                for line in metric.render()
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+def to_microseconds(seconds):
+    return int(seconds * MICROSECONDS)
+
+
+class RequestStats:
+    """Счётчики одного запроса."""
+
+    def __init__(self, top_queries=0):
+        self.start = perf_counter()
+        self.duration = 0
+        self.queries = 0
+        self.db_time = 0
+        self.render_time = None
+        self._render_start = None
+        self._top_queries = top_queries
+        self._slowest = []
+
+    def add_query(self, duration, sql):
+        self.queries += 1
+        self.db_time += duration
+        if not self._top_queries:
+            return
+        # Куча из top_queries самых долгих, без хранения остальных.
+        item = (duration, self.queries, sql)
+        if len(self._slowest) < self._top_queries:
+            heapq.heappush(self._slowest, item)
+        else:
+            heapq.heappushpop(self._slowest, item)
+
+    def get_slowest_queries(self):
+        return [
+            (duration, sql)
+            for duration, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+    def start_render(self):
+        self._render_start = perf_counter()
+
+    def finish_render(self, response):
+        self.render_time = perf_counter() - self._render_start
+
+    def finish(self):
+        self.duration = perf_counter() - self.start
+
+
+def start_request(top_queries=0):
+    stats = RequestStats(top_queries)
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка execute_wrappers, считающая запросы текущего запроса."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(perf_counter() - start, sql)
+
+
+def install_query_recorder(connection, **kwargs):
+    # Обёртка остаётся у соединения навсегда и стоит одного чтения
+    # contextvar, когда запрос не измеряется.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+metrics = MetricsRegistry()
+
+
+@require_safe
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus."""
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
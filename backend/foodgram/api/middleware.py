@@ -0,0 +1,100 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import (
+    finish_request, install_query_recorder, metrics, start_request
+)
+
+
+slow_request_logger = logging.getLogger('api.slow_requests')
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+SLOW_QUERY_SQL_LENGTH = 500
+
+
+class InstrumentationMiddleware:
+    """Время, запросы к БД и сериализация по каждому представлению.
+
+    Медленные запросы, если задан SLOW_REQUEST_THRESHOLD, попадают
+    в лог api.slow_requests вместе с самыми долгими запросами к БД.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        self.finish(request, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        self.finish(request, stats)
+        return response
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся после представления, это и есть
+        # сериализация в JSON.
+        stats = request.request_stats
+        stats.start_render()
+        response.add_post_render_callback(stats.finish_render)
+        return response
+
+    @staticmethod
+    def start(request):
+        threshold = settings.SLOW_REQUEST_THRESHOLD
+        stats, token = start_request(
+            settings.SLOW_REQUEST_TOP_QUERIES if threshold is not None else 0
+        )
+        request.request_stats = stats
+        return stats, token
+
+    def finish(self, request, stats):
+        stats.finish()
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        method = (
+            request.method if request.method in KNOWN_METHODS else 'OTHER'
+        )
+        metrics.record(view, method, stats)
+
+        threshold = settings.SLOW_REQUEST_THRESHOLD
+        if threshold is not None and stats.duration >= threshold:
+            self.log_slow_request(request, view, stats)
+
+    @staticmethod
+    def log_slow_request(request, view, stats):
+        queries = ''.join(
+            f'\n  {duration * 1000:.1f} мс: '
+            f'{str(sql)[:SLOW_QUERY_SQL_LENGTH]}'
+            for duration, sql in stats.get_slowest_queries()
+        )
+        slow_request_logger.warning(
+            'Медленный запрос %s %s (%s): %.1f мс, запросов к БД %d '
+            'за %.1f мс%s',
+            request.method, request.get_full_path(), view,
+            stats.duration * 1000, stats.queries, stats.db_time * 1000,
+            queries
+        )
@@ -1,6 +1,71 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.db import connections
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+PAGINATION_QUERY_PARAM = 'pagination'
+CURSOR_PAGINATION = 'cursor'
+
+
+def get_approximate_count(queryset):
+    """Оценка числа строк из статистики планировщика PostgreSQL.
+
+    В остальных СУБД возвращает точное значение COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 100
+
+
+class CustomCursorPagination(CursorPagination):
+    """Пагинация по курсору без COUNT(*) на каждой странице.
+
+    Оценку общего числа объектов можно запросить параметром
+    count=approximate.
+    """
+
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'approximate':
+            self.count = get_approximate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = {'count': self.count, **response.data}
+        return response
+
+
+class RecipeCursorPagination(CustomCursorPagination):
+    ordering = ('-pub_date', '-id')
+
+
+class UserCursorPagination(CustomCursorPagination):
+    ordering = ('id',)
+
+
+def get_paginator(request, cursor_class,
+                  default_class=CustomPageNumberPagination):
+    """Пагинатор по умолчанию или курсорный при ?pagination=cursor."""
+    if request.query_params.get(PAGINATION_QUERY_PARAM) == CURSOR_PAGINATION:
+        return cursor_class()
+    return default_class()
@@ -0,0 +1,219 @@
+"""Присутствие пользователей для UserStatusConsumer.
+
+Каждый процесс считает свои сокеты по пользователям (несколько вкладок
+одного пользователя — одно присутствие) и раз в PRESENCE_TICK секунд
+отправляет накопленный дифф: одним group_send другим процессам и одним
+заранее закодированным кадром своим сокетам. Новый сокет получает
+снимок всех онлайн-пользователей, а не историю событий, поэтому волна
+переподключений после деплоя стоит O(N) сообщений, а не O(N²).
+
+Процессы обмениваются диффами через группу PRESENCE_GROUP, куда входит
+по одному каналу от процесса. Новый процесс запрашивает у остальных их
+состояние, а полное состояние каждый процесс повторяет раз в
+HEARTBEAT секунд: по нему же отбрасываются пользователи процессов,
+которые перестали отвечать.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .fast_json import dumps_text
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_GROUP = 'presence'
+HEARTBEAT = 30
+# Пауза перед повторным входом в группу после ошибки канального слоя.
+RETRY_DELAY = 1
+# Ключ пользователей своего процесса в Presence.users.
+LOCAL = ''
+
+
+def get_user_label(user):
+    return user.email if user.is_authenticated else 'Anonymous'
+
+
+class Presence:
+    """Онлайн-пользователи всех процессов глазами одного процесса."""
+
+    def __init__(self):
+        self.loop = None
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.layer = get_channel_layer()
+        self.tick = settings.PRESENCE_TICK
+        self.sockets = set()
+        self.local = Counter()
+        # Процесс (его канал) -> его онлайн-пользователи.
+        self.users = {LOCAL: set()}
+        # Пользователь -> в скольких процессах он онлайн.
+        self.online = Counter()
+        self.seen = {}
+        # Изменения для своих сокетов и для других процессов.
+        self.joined, self.left = set(), set()
+        self.local_joined, self.local_left = set(), set()
+        self.channel = None
+        self.messages_sent = 0
+        self.task = self.loop.create_task(self.run())
+
+    async def attach(self, consumer, user):
+        """Регистрирует сокет и отправляет ему снимок."""
+        if self.loop is not asyncio.get_running_loop():
+            # Новый event loop — новый сервер, старое состояние чужое.
+            self.start()
+        self.sockets.add(consumer)
+        self.local[user] += 1
+        if self.local[user] == 1:
+            self.set_online(LOCAL, user, True)
+            note_change(user, self.local_joined, self.local_left)
+        await consumer.send(text_data=dumps_text({
+            'status': 'snapshot', 'users': sorted(self.online)
+        }))
+        self.messages_sent += 1
+
+    def detach(self, consumer, user):
+        if consumer not in self.sockets:
+            return
+        self.sockets.discard(consumer)
+        self.local[user] -= 1
+        if not self.local[user]:
+            del self.local[user]
+            self.set_online(LOCAL, user, False)
+            note_change(user, self.local_left, self.local_joined)
+
+    def set_online(self, origin, user, online):
+        users = self.users.setdefault(origin, set())
+        if online and user not in users:
+            users.add(user)
+            self.online[user] += 1
+            if self.online[user] == 1:
+                note_change(user, self.joined, self.left)
+        elif not online and user in users:
+            users.discard(user)
+            self.online[user] -= 1
+            if not self.online[user]:
+                del self.online[user]
+                note_change(user, self.left, self.joined)
+
+    def set_state(self, origin, users):
+        users = set(users)
+        for user in users - self.users.get(origin, set()):
+            self.set_online(origin, user, True)
+        for user in self.users.get(origin, set()) - users:
+            self.set_online(origin, user, False)
+
+    async def run(self):
+        self.channel = await self.layer.new_channel()
+        await asyncio.gather(self.receive_updates(), self.run_ticks())
+
+    async def join(self):
+        """Входит в группу и запрашивает состояние других процессов."""
+        await self.layer.group_add(PRESENCE_GROUP, self.channel)
+        await self.layer.group_send(PRESENCE_GROUP, {
+            'type': 'presence.sync', 'origin': self.channel
+        })
+
+    async def run_ticks(self):
+        heartbeat = time.monotonic()
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                if time.monotonic() - heartbeat >= HEARTBEAT:
+                    heartbeat = time.monotonic()
+                    await self.send_heartbeat()
+                await self.flush()
+            except Exception:
+                logger.exception('Не удалось разослать присутствие')
+
+    async def flush(self):
+        """Рассылает изменения, накопленные за тик."""
+        if self.local_joined or self.local_left:
+            diff = {
+                'type': 'presence.diff',
+                'origin': self.channel,
+                'joined': sorted(self.local_joined),
+                'left': sorted(self.local_left),
+            }
+            self.local_joined, self.local_left = set(), set()
+            await self.layer.group_send(PRESENCE_GROUP, diff)
+        if self.joined or self.left:
+            # Один кадр на всех: кодируется один раз за тик.
+            payload = dumps_text({
+                'status': 'diff',
+                'joined': sorted(self.joined),
+                'left': sorted(self.left),
+            })
+            self.joined, self.left = set(), set()
+            for consumer in list(self.sockets):
+                # Сокет мог закрыться, пока рассылка ждала предыдущих.
+                if consumer in self.sockets:
+                    await consumer.send(text_data=payload)
+                    self.messages_sent += 1
+
+    async def send_heartbeat(self):
+        await self.layer.group_add(PRESENCE_GROUP, self.channel)
+        await self.layer.group_send(PRESENCE_GROUP, {
+            'type': 'presence.state',
+            'origin': self.channel,
+            'users': sorted(self.local),
+        })
+        deadline = time.monotonic() - 3 * HEARTBEAT
+        for origin, seen in list(self.seen.items()):
+            if seen < deadline:
+                self.set_state(origin, ())
+                del self.users[origin], self.seen[origin]
+
+    async def receive_updates(self):
+        # Брокер мог перезапуститься и забыть группу, поэтому после
+        # ошибки процесс входит в неё заново.
+        while True:
+            try:
+                await self.join()
+                while True:
+                    await self.handle(await self.layer.receive(self.channel))
+            except Exception:
+                logger.exception(
+                    'Присутствие потеряло канальный слой, повтор через %s с',
+                    RETRY_DELAY
+                )
+                await asyncio.sleep(RETRY_DELAY)
+
+    async def handle(self, message):
+        origin = message['origin']
+        if origin == self.channel:
+            return
+        if message['type'] == 'presence.sync':
+            try:
+                await self.layer.send(origin, {
+                    'type': 'presence.state',
+                    'origin': self.channel,
+                    'users': sorted(self.local),
+                })
+            except ChannelFull:
+                pass
+            return
+        self.seen[origin] = time.monotonic()
+        if message['type'] == 'presence.state':
+            self.set_state(origin, message['users'])
+        elif message['type'] == 'presence.diff':
+            for user in message['joined']:
+                self.set_online(origin, user, True)
+            for user in message['left']:
+                self.set_online(origin, user, False)
+
+
+def note_change(user, added, removed):
+    """Вход после выхода в одном тике взаимно гасятся, и наоборот."""
+    if user in removed:
+        removed.discard(user)
+    else:
+        added.add(user)
+
+
+presence = Presence()
@@ -0,0 +1,91 @@
+import threading
+
+from recipes.models import Recipe
+
+from .cache import aget_version, bump_version, get_version
+
+
+RECIPE_IDS_VERSION_KEY = 'recipes:ids:version'
+
+
+def build_bitmap(ids):
+    bitmap = bytearray()
+    for pk in ids:
+        set_bit(bitmap, pk)
+    return bitmap
+
+
+def set_bit(bitmap, pk):
+    byte = pk >> 3
+    if byte >= len(bitmap):
+        bitmap.extend(bytes(byte - len(bitmap) + 1))
+    bitmap[byte] |= 1 << (pk & 7)
+
+
+def has_bit(bitmap, pk):
+    byte = pk >> 3
+    return byte < len(bitmap) and bool(bitmap[byte] & (1 << (pk & 7)))
+
+
+class RecipeIdSet:
+    """Битовая карта ID существующих рецептов для коротких ссылок.
+
+    Новые рецепты добавляются сигналом, а если другой процесс ещё
+    не знает о рецепте, промах проверяется запросом к БД. Удаление
+    меняет версию в кэше, и карта перестраивается во всех процессах.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._bitmap = bytearray()
+
+    def invalidate(self):
+        bump_version(RECIPE_IDS_VERSION_KEY)
+
+    def add(self, pk):
+        with self._lock:
+            set_bit(self._bitmap, pk)
+
+    def contains(self, pk):
+        if has_bit(self._get_bitmap(), pk):
+            return True
+        if not Recipe.objects.filter(pk=pk).exists():
+            return False
+        self.add(pk)
+        return True
+
+    async def acontains(self, pk):
+        """Асинхронный вариант contains."""
+        version = await aget_version(RECIPE_IDS_VERSION_KEY)
+        if self._version != version:
+            self._set_bitmap(version, build_bitmap([
+                recipe_id async for recipe_id in Recipe.objects.values_list(
+                    'id', flat=True
+                ).aiterator()
+            ]))
+        if has_bit(self._bitmap, pk):
+            return True
+        if not await Recipe.objects.filter(pk=pk).aexists():
+            return False
+        self.add(pk)
+        return True
+
+    def _get_bitmap(self):
+        version = get_version(RECIPE_IDS_VERSION_KEY)
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._set_bitmap(version, build_bitmap(
+                        Recipe.objects.values_list(
+                            'id', flat=True
+                        ).iterator()
+                    ))
+        return self._bitmap
+
+    def _set_bitmap(self, version, bitmap):
+        self._bitmap = bitmap
+        self._version = version
+
+
+recipe_ids = RecipeIdSet()
@@ -3,5 +3,14 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/chat/$', consumers.ChatConsumer.as_asgi()),
+    re_path(
+        r'ws/chat/(?P<room>[a-zA-Z0-9_-]{1,50})/$',
+        consumers.ChatConsumer.as_asgi()
+    ),
+    re_path(
+        r'ws/recipes/(?P<recipe_id>\d+)/chat/$',
+        consumers.ChatConsumer.as_asgi()
+    ),
+    re_path(r'ws/feed/$', consumers.FeedConsumer.as_asgi()),
     re_path(r'ws/status/$', consumers.UserStatusConsumer.as_asgi()),
 ]
@@ -1,14 +1,19 @@
 import base64
+import binascii
+import tempfile
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.core.validators import RegexValidator
+from django.db import transaction
 
 
 from djoser.serializers import UserCreateSerializer
 
 from rest_framework import serializers
 
+from recipes.images import get_rendition_urls
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -16,11 +21,44 @@ from recipes.models import (
     RecipeIngredient,
     ShoppingCart
 )
+from recipes.queries import delete_returning, insert_ignore
+from recipes.shopping_list import rebuild_recipe_shopping_lists
 from users.models import Subscription
 
+from .subscriptions import get_subscription_resolver
+
 
 User = get_user_model()
 
+MAX_IMAGE_SIZE = 2 * 1024 * 1024
+# Каждые 3 байта изображения занимают 4 символа base64.
+MAX_ENCODED_IMAGE_LENGTH = -(-MAX_IMAGE_SIZE // 3) * 4
+# Кратно 4, чтобы каждая часть декодировалась отдельно.
+BASE64_CHUNK_SIZE = 64 * 1024
+
+RECIPE_BATCH_LIMIT = 100
+
+
+class AuthorListSerializer(serializers.ListSerializer):
+    """Список, заранее передающий резолверу подписок авторов страницы."""
+
+    def to_representation(self, data):
+        items = data.all() if hasattr(data, 'all') else data
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            items = list(items)
+            get_subscription_resolver(self.context).prime(
+                self.child.get_author_id(item) for item in items
+            )
+        return super().to_representation(items)
+
+
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """URL уменьшенных копий изображения в WebP."""
+
+    def to_representation(self, value):
+        return get_rendition_urls(value, self.context.get('request'))
+
 
 class BaseRelationSerializer(serializers.ModelSerializer):
     """Абстрактный сериалайзер для отношений пользователь/рецепт."""
@@ -38,22 +76,32 @@ class BaseRelationSerializer(serializers.ModelSerializer):
             'Метод должен возвращать сообщение об ошибке'
         )
 
-    def validate_recipe(self, value):
-        user = self.context['request'].user
-        model_class = self.Meta.model
-
-        if model_class.objects.filter(user=user, recipe=value).exists():
-            raise (serializers.
-                   ValidationError(self.get_already_exists_message())
-                   )
-
-        return value
+    def create(self, validated_data):
+        instance = self.Meta.model(**validated_data)
+        if not insert_ignore(instance):
+            raise serializers.ValidationError(
+                {'recipe': [self.get_already_exists_message()]}
+            )
+        return instance
 
     def to_representation(self, instance):
         recipe = instance.recipe
         return RecipeMinifiedSerializer(recipe, context=self.context).data
 
 
+class RecipeBatchSerializer(serializers.Serializer):
+    """Список ID рецептов для пакетного добавления или удаления."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=RECIPE_BATCH_LIMIT
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
 class ShoppingCartSerializer(BaseRelationSerializer):
     """Сериалайзер для работы с рецептом в списке покупок."""
 
@@ -102,14 +150,16 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Нельзя подписаться на самого себя')
 
-        if Subscription.objects.filter(
-                user=user, author=value
-        ).exists():
-            raise serializers.ValidationError(
-                'Вы уже подписаны на этого автора')
-
         return value
 
+    def create(self, validated_data):
+        instance = Subscription(**validated_data)
+        if not insert_ignore(instance):
+            raise serializers.ValidationError(
+                {'author': ['Вы уже подписаны на этого автора']}
+            )
+        return instance
+
 
 class UserWithRecipesSerializer(serializers.ModelSerializer):
     """Сериалайзер для отображения пользователя с его рецептами."""
@@ -121,13 +171,14 @@ class UserWithRecipesSerializer(serializers.ModelSerializer):
         default=0
     )
     avatar = serializers.SerializerMethodField()
+    avatar_renditions = ImageRenditionsField(source='avatar')
 
     class Meta:
         model = User
         fields = (
             'email', 'id', 'username', 'first_name',
             'last_name', 'is_subscribed', 'recipes',
-            'recipes_count', 'avatar'
+            'recipes_count', 'avatar', 'avatar_renditions'
         )
 
     def get_avatar(self, obj):
@@ -147,10 +198,7 @@ class UserWithRecipesSerializer(serializers.ModelSerializer):
         if self.context.get('is_subscriptions_list'):
             return True
 
-        return Subscription.objects.filter(
-            user=request.user,
-            author=obj
-        ).exists()
+        return get_subscription_resolver(self.context).is_subscribed(obj.id)
 
     def get_recipes(self, obj):
         limit = self.context.get('recipes_limit')
@@ -170,9 +218,11 @@ class UserWithRecipesSerializer(serializers.ModelSerializer):
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     """Упрощённый сериалайзер для отображения рецепта."""
 
+    image_renditions = ImageRenditionsField(source='image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
 
     def get_image(self, obj):
         if obj.image:
@@ -184,29 +234,6 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
         return None
 
 
-class ShortCodeValidatorSerializer(serializers.Serializer):
-    """Валидирует короткий код для редиректа на рецепт."""
-
-    short_code = serializers.CharField()
-
-    def __init__(self, *args, **kwargs):
-        self.recipe_queryset = kwargs.pop(
-            'recipe_queryset', Recipe.objects.all()
-        )
-        super().__init__(*args, **kwargs)
-
-    def validate_short_code(self, value):
-        if not value.isdigit():
-            raise serializers.ValidationError('Неверный формат ссылки')
-
-        recipe_id = int(value)
-
-        if not self.recipe_queryset.filter(pk=recipe_id).exists():
-            raise serializers.ValidationError('Рецепт не найден')
-
-        return recipe_id
-
-
 class ShortLinkSerializer(serializers.Serializer):
     """Сериалайзер для генерации короткой ссылки."""
 
@@ -218,17 +245,37 @@ class ShortLinkSerializer(serializers.Serializer):
         }
 
 
+def decode_base64(encoded):
+    """Декодирует base64 частями во временный файл."""
+    file = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    try:
+        for start in range(0, len(encoded), BASE64_CHUNK_SIZE):
+            file.write(base64.b64decode(
+                encoded[start:start + BASE64_CHUNK_SIZE], validate=True
+            ))
+    except binascii.Error:
+        file.close()
+        raise serializers.ValidationError('Некорректное изображение')
+    file.seek(0)
+    return file
+
+
 class Base64ImageField(serializers.ImageField):
     """Кастомное поле для работы с изображениями в формате Base64."""
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name=f'temp.{ext}')
-            if data.size > 2 * 1024 * 1024:
+            format, _, imgstr = data.partition(';base64,')
+            # Кодировщики часто переносят base64 по 76 символов, а куски
+            # проверяются строго и должны начинаться на границе четвёрок.
+            imgstr = ''.join(imgstr.split())
+            if len(imgstr) > MAX_ENCODED_IMAGE_LENGTH:
                 raise serializers.ValidationError(
                     'Размер изображения не должен превышать 2MB')
+            ext = format.split('/')[-1]
+            data = File(decode_base64(imgstr), name=f'temp.{ext}')
 
         return super().to_internal_value(data)
 
@@ -254,11 +301,17 @@ class UserSerializer(serializers.ModelSerializer):
     """Сериалайзер для отображения пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_renditions = ImageRenditionsField(source='avatar')
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name',
-                  'last_name', 'is_subscribed', 'avatar')
+                  'last_name', 'is_subscribed', 'avatar',
+                  'avatar_renditions')
+        list_serializer_class = AuthorListSerializer
+
+    def get_author_id(self, obj):
+        return obj.id
 
     def get_avatar(self, obj):
         if obj.avatar:
@@ -274,10 +327,7 @@ class UserSerializer(serializers.ModelSerializer):
         if not request or not request.user.is_authenticated:
             return False
 
-        return Subscription.objects.filter(
-            user=request.user,
-            author=obj
-        ).exists()
+        return get_subscription_resolver(self.context).is_subscribed(obj.id)
 
 
 class SetPasswordSerializer(serializers.Serializer):
@@ -330,26 +380,39 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(required=False)
+    image_renditions = ImageRenditionsField(source='image')
 
     class Meta:
         model = Recipe
         fields = (
-            'id', 'author', 'name', 'image', 'text',
+            'id', 'author', 'name', 'image', 'image_renditions', 'text',
             'cooking_time', 'ingredients',
             'is_favorited', 'is_in_shopping_cart'
         )
+        list_serializer_class = AuthorListSerializer
+
+    def get_author_id(self, obj):
+        return obj.author_id
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.favorited_by.filter(user=user).exists()
-        return False
+        return self._get_user_relation(obj, 'is_favorited', 'favorited_by')
 
     def get_is_in_shopping_cart(self, obj):
+        return self._get_user_relation(
+            obj, 'is_in_shopping_cart', 'in_shopping_carts'
+        )
+
+    def _get_user_relation(self, obj, annotation, related_name):
         user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.in_shopping_carts.filter(user=user).exists()
-        return False
+        if not user.is_authenticated:
+            return False
+
+        # Queryset вьюсета уже содержит Exists-аннотацию,
+        # запрос нужен только для отдельных объектов без неё.
+        value = getattr(obj, annotation, None)
+        if value is not None:
+            return value
+        return getattr(obj, related_name).filter(user=user).exists()
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
@@ -433,6 +496,37 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             ))
         RecipeIngredient.objects.bulk_create(objs)
 
+    def update_ingredients(self, recipe, ingredients):
+        """Меняет только добавленные, удалённые и изменённые ингредиенты."""
+        amounts = {
+            int(ingredient['id']): int(ingredient['amount'])
+            for ingredient in ingredients
+        }
+        changed = []
+        removed = []
+        for recipe_ingredient in recipe.ingredient_amounts.all():
+            amount = amounts.pop(recipe_ingredient.ingredient_id, None)
+            if amount is None:
+                removed.append(recipe_ingredient.id)
+            elif amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+
+        if removed:
+            delete_returning(
+                RecipeIngredient.objects.filter(id__in=removed),
+                returning='id'
+            )
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if amounts:
+            self.create_ingredients(recipe, [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id, amount in amounts.items()
+            ])
+        if removed or changed or amounts:
+            rebuild_recipe_shopping_lists([recipe.id])
+
     def validate(self, data):
         cooking_time = data.get('cooking_time')
         if cooking_time and cooking_time < 1:
@@ -463,6 +557,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
 
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
 
@@ -472,14 +567,14 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         self.create_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients', None)
 
         instance = super().update(instance, validated_data)
 
         if ingredients is not None:
-            instance.ingredient_amounts.all().delete()
-            self.create_ingredients(instance, ingredients)
+            self.update_ingredients(instance, ingredients)
 
         return instance
 
@@ -0,0 +1,118 @@
+import csv
+import hashlib
+import io
+import json
+
+from recipes.models import ShoppingCart, ShoppingListItem
+
+from .cache import get_recipes_version
+
+
+EXPORT_CHUNK_SIZE = 500
+
+
+class ShoppingListRenderer:
+    """Базовый формат выгрузки списка покупок."""
+
+    format = None
+    content_type = None
+
+    async def render(self, items):
+        """Асинхронный генератор частей файла по суммам ингредиентов.
+
+        ASGI-сервер отдаёт части по мере чтения из БД. Синхронный
+        генератор Django под ASGI собрал бы в список целиком.
+        """
+        raise NotImplementedError(
+            'Метод должен возвращать части файла'
+        )
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в виде обычного текста."""
+
+    format = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    async def render(self, items):
+        yield 'Список покупок:\n\n'
+        async for item in items:
+            yield (
+                f'{item['ingredient__name']} '
+                f'({item['ingredient__measurement_unit']}) - '
+                f'{item['total_amount']}\n'
+            )
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в формате CSV."""
+
+    format = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    async def render(self, items):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(('name', 'measurement_unit', 'amount'))
+        yield self._flush(buffer)
+        async for item in items:
+            writer.writerow((
+                item['ingredient__name'],
+                item['ingredient__measurement_unit'],
+                item['total_amount'],
+            ))
+            yield self._flush(buffer)
+
+    @staticmethod
+    def _flush(buffer):
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в формате JSON."""
+
+    format = 'json'
+    content_type = 'application/json'
+
+    async def render(self, items):
+        separator = '['
+        async for item in items:
+            yield separator + json.dumps({
+                'name': item['ingredient__name'],
+                'measurement_unit': item['ingredient__measurement_unit'],
+                'amount': item['total_amount'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield '[]' if separator == '[' else ']'
+
+
+SHOPPING_LIST_RENDERERS = {
+    renderer.format: renderer
+    for renderer in (
+        TextShoppingListRenderer,
+        CSVShoppingListRenderer,
+        JSONShoppingListRenderer,
+    )
+}
+
+
+def get_shopping_list_items(user):
+    """Асинхронный итератор по готовым суммам ингредиентов из корзины."""
+    return ShoppingListItem.objects.filter(user=user).values(
+        'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+    ).order_by('ingredient__name').aiterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def get_shopping_list_etag(user, export_format):
+    """ETag по содержимому корзины и версии рецептов."""
+    recipe_ids = ShoppingCart.objects.filter(
+        user=user
+    ).order_by('recipe_id').values_list('recipe_id', flat=True)
+    raw = (
+        f'{export_format}:{get_recipes_version()}:'
+        f'{','.join(map(str, recipe_ids))}'
+    )
+    return f'"{hashlib.sha1(raw.encode()).hexdigest()}"'
@@ -0,0 +1,71 @@
+"""Короткие коды рецептов в base62.
+
+ID переставляется обратимой биекцией на 32-битных числах, поэтому
+соседние рецепты получают непохожие коды, а декодирование не требует
+таблицы соответствий. Код всегда из CODE_LENGTH символов и начинается
+с буквы, так что не пересекается с прежними числовыми кодами.
+"""
+import re
+
+ALPHABET = (
+    'abcdefghijklmnopqrstuvwxyz'
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    '0123456789'
+)
+BASE = len(ALPHABET)
+INDEX = {char: position for position, char in enumerate(ALPHABET)}
+
+BITS = 32
+MASK = (1 << BITS) - 1
+# 62^6 > 2^32, а старший разряд меньше 5 и всегда попадает на букву.
+CODE_LENGTH = 6
+
+# Нечётные множители обратимы по модулю 2^32.
+MULTIPLIER = 0x2C1B3C6D
+SECOND_MULTIPLIER = 0x297A2D39
+INVERSE = pow(MULTIPLIER, -1, 1 << BITS)
+SECOND_INVERSE = pow(SECOND_MULTIPLIER, -1, 1 << BITS)
+
+CODE_PATTERN = re.compile(rf'[a-zA-Z][a-zA-Z0-9]{{{CODE_LENGTH - 1}}}')
+
+
+def permute(value):
+    value = (value * MULTIPLIER) & MASK
+    value ^= value >> 16
+    value = (value * SECOND_MULTIPLIER) & MASK
+    return value ^ (value >> 16)
+
+
+def unpermute(value):
+    # Сдвиг на половину разрядности обращается самим собой.
+    value ^= value >> 16
+    value = (value * SECOND_INVERSE) & MASK
+    value ^= value >> 16
+    return (value * INVERSE) & MASK
+
+
+def encode(recipe_id):
+    """Короткий код для ID рецепта."""
+    if not 0 <= recipe_id <= MASK:
+        # За пределами 32 бит остаются числовые коды.
+        return str(recipe_id)
+    value = permute(recipe_id)
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, BASE)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def decode(code):
+    """ID рецепта по короткому или числовому коду, None для чужих строк."""
+    if code.isascii() and code.isdigit():
+        return int(code)
+    if not CODE_PATTERN.fullmatch(code):
+        return None
+    value = 0
+    for char in code:
+        value = value * BASE + INDEX[char]
+    if value > MASK:
+        return None
+    return unpermute(value)
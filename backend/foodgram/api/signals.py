@@ -0,0 +1,153 @@
+import threading
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.images import schedule_renditions
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart
+)
+from recipes.shopping_list import rebuild_shopping_lists
+from recipes.signals import ingredients_loaded
+
+from .cache import bump_recipes_version
+from .ingredient_index import ingredient_index
+from .recipe_ids import recipe_ids
+
+
+User = get_user_model()
+
+IMAGE_FIELDS = {Recipe: 'image', User: 'avatar'}
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
+
+
+def deleted_with(origin, model):
+    return getattr(origin, 'model', type(origin)) is model
+
+
+class ShoppingListRebuilds(threading.local):
+    """Списки покупок, которые пересоберутся после фиксации транзакции.
+
+    Каскадное удаление присылает сигнал на каждую строку корзины или
+    состава, а пересборка собирает их всех одним запросом.
+    """
+
+    def __init__(self):
+        self.user_ids = set()
+        self.recipe_ids = set()
+
+    def add(self, user_ids=(), recipe_ids=()):
+        self.user_ids.update(user_ids)
+        self.recipe_ids.update(recipe_ids)
+        # Колбэк на каждую строку, но работу делает только первый. После
+        # отката транзакции её id просто пересоберутся со следующими.
+        transaction.on_commit(self.rebuild)
+
+    def rebuild(self):
+        user_ids, self.user_ids = self.user_ids, set()
+        recipe_ids, self.recipe_ids = self.recipe_ids, set()
+        if recipe_ids:
+            user_ids.update(ShoppingCart.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('user_id', flat=True))
+        if user_ids:
+            rebuild_shopping_lists(user_ids)
+
+
+shopping_list_rebuilds = ShoppingListRebuilds()
+
+
+def invalidate(bump):
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        # Пока транзакция не зафиксирована, параллельные запросы видят
+        # старые данные и могут положить их в кэш под новой версией.
+        transaction.on_commit(bump)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+@receiver([post_save, post_delete], sender=Ingredient)
+def recipe_changed(sender, **kwargs):
+    invalidate(bump_recipes_version)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver(ingredients_loaded)
+def ingredient_changed(sender, **kwargs):
+    invalidate(ingredient_index.invalidate)
+
+
+@receiver([post_save, post_delete], sender=User)
+def author_changed(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login — в ленту он не попадает.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate(bump_recipes_version)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+        transaction.on_commit(lambda: recipe_ids.add(instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with(origin, User):
+        change_counter(User, instance.author_id, 'recipes_count', -1)
+    invalidate(recipe_ids.invalidate)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def recipe_relation_created(sender, instance, created, **kwargs):
+    # API добавляет и удаляет строки без сигналов и правит счётчик сам,
+    # сюда попадают админка, shell и каскадное удаление.
+    if created:
+        change_counter(Recipe, instance.recipe_id, COUNTER_FIELDS[sender], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_relation_deleted(sender, instance, origin=None, **kwargs):
+    # Счётчики удаляемого рецепта уже никому не нужны.
+    if not deleted_with(origin, Recipe):
+        change_counter(
+            Recipe, instance.recipe_id, COUNTER_FIELDS[sender], -1
+        )
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    # API меняет корзину без сигналов и правит список сам, сюда попадают
+    # админка, shell и каскадное удаление.
+    shopping_list_rebuilds.add(user_ids=[instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, origin=None, **kwargs):
+    # При удалении рецепта списки пересоберут удаляемые строки корзины.
+    if deleted_with(origin, Recipe):
+        return
+    shopping_list_rebuilds.add(recipe_ids=[instance.recipe_id])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def image_saved(sender, instance, update_fields=None, **kwargs):
+    field = IMAGE_FIELDS[sender]
+    if update_fields is not None and field not in update_fields:
+        return
+    image = getattr(instance, field)
+    if image:
+        # Копии уже созданного изображения пул пропустит.
+        transaction.on_commit(partial(schedule_renditions, image.name))
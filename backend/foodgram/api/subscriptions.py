@@ -0,0 +1,65 @@
+from users.models import Subscription
+
+
+# До такого числа подписок пользователя их проще загрузить целиком.
+FOLLOWING_SET_LIMIT = 1000
+
+
+class SubscriptionResolver:
+    """Отвечает на is_subscribed для всех авторов в рамках одного запроса.
+
+    Небольшой граф подписок загружается одним запросом в множество,
+    для большого выполняется запрос IN только по авторам текущей страницы.
+    """
+
+    def __init__(self, user, set_limit=FOLLOWING_SET_LIMIT):
+        self.user = user
+        self.set_limit = set_limit
+        self._following = None
+        self._resolved = {}
+        self._pending = set()
+
+    def prime(self, author_ids):
+        """Запоминает авторов страницы, чтобы проверить их одним запросом."""
+        self._pending.update(
+            author_id for author_id in author_ids
+            if author_id not in self._resolved
+        )
+
+    def is_subscribed(self, author_id):
+        if not self.user.is_authenticated:
+            return False
+        if author_id not in self._resolved:
+            self._resolve(self._pending | {author_id})
+        return self._resolved[author_id]
+
+    def _resolve(self, author_ids):
+        subscriptions = Subscription.objects.filter(user=self.user)
+
+        if self._following is None:
+            following = list(subscriptions.values_list(
+                'author_id', flat=True
+            )[:self.set_limit + 1])
+            self._following = (
+                set(following) if len(following) <= self.set_limit else False
+            )
+
+        if self._following is False:
+            subscribed = set(subscriptions.filter(
+                author_id__in=author_ids
+            ).values_list('author_id', flat=True))
+        else:
+            subscribed = self._following & author_ids
+
+        for author_id in author_ids:
+            self._resolved[author_id] = author_id in subscribed
+        self._pending.clear()
+
+
+def get_subscription_resolver(context):
+    """Резолвер из контекста сериализатора, общий для вложенных полей."""
+    resolver = context.get('subscriptions')
+    if resolver is None:
+        resolver = SubscriptionResolver(context['request'].user)
+        context['subscriptions'] = resolver
+    return resolver
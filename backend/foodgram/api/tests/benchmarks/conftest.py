@@ -0,0 +1,22 @@
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+
+from recipes.models import Ingredient
+
+
+DATA_DIR = settings.BASE_DIR.parent.parent / 'data'
+
+
+@pytest.fixture
+def ingredients_csv():
+    path = DATA_DIR / 'ingredients.csv'
+    if not path.exists():
+        pytest.skip(f'Нет файла с ингредиентами: {path}')
+    return path
+
+
+@pytest.fixture
+def real_ingredients(ingredients_csv):
+    call_command('load_ingredients', ingredients_csv, verbosity=0)
+    return list(Ingredient.objects.all())
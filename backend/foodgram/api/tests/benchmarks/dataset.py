@@ -0,0 +1,149 @@
+"""Воспроизводимый набор данных для нагрузочных замеров.
+
+Фабрики создают пользователей, рецепты, избранное, корзины и подписки
+пачками через bulk_create. Популярность авторов и рецептов убывает по
+закону Ципфа, как в живой ленте: немногие собирают большую часть
+подписок и избранного. При одном и том же seed набор совпадает.
+"""
+import itertools
+import random
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+
+from recipes.counters import recount
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart
+)
+from recipes.shopping_list import rebuild_shopping_lists
+from users.models import Subscription, User
+
+
+PASSWORD = 'benchmark-password'
+AUTHOR_SHARE = 0.2
+INGREDIENTS_PER_RECIPE = (3, 12)
+FAVORITES_PER_USER = (0, 40)
+CART_PER_USER = (0, 10)
+SUBSCRIPTIONS_PER_USER = (0, 20)
+BATCH_SIZE = 1000
+
+
+@dataclass
+class Dataset:
+    users: list = field(default_factory=list)
+    authors: list = field(default_factory=list)
+    recipes: list = field(default_factory=list)
+    ingredients: list = field(default_factory=list)
+
+
+def zipf_weights(count, exponent=1.0):
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def sample_popular(rng, population, weights, count):
+    """До count разных элементов, популярные выпадают чаще."""
+    chosen = {}
+    for item in rng.choices(population, weights, k=count * 2):
+        chosen.setdefault(item.pk, item)
+        if len(chosen) == count:
+            break
+    return list(chosen.values())
+
+
+def user_factory(number, password_hash):
+    return User(
+        email=f'user{number}@bench.example',
+        username=f'user{number}',
+        first_name=f'Имя{number}',
+        last_name=f'Фамилия{number}',
+        password=password_hash,
+    )
+
+
+def recipe_factory(rng, number, author):
+    return Recipe(
+        author=author,
+        name=f'Рецепт {number}',
+        image='recipes/images/test.png',
+        text=f'Описание рецепта {number}. ' * rng.randint(1, 20),
+        cooking_time=rng.randint(1, 240),
+    )
+
+
+def ingredient_amounts_factory(rng, recipe, ingredients):
+    return [
+        RecipeIngredient(
+            recipe=recipe, ingredient=ingredient,
+            amount=rng.randint(1, 500)
+        )
+        for ingredient in rng.sample(
+            ingredients, rng.randint(*INGREDIENTS_PER_RECIPE)
+        )
+    ]
+
+
+def seed_dataset(users=200, recipes=1000, seed=0):
+    """Заполняет БД, ингредиенты должны быть загружены заранее."""
+    rng = random.Random(seed)
+    dataset = Dataset(ingredients=list(Ingredient.objects.order_by('id')))
+    # Хэш пароля считается долго, у всех пользователей он один.
+    password_hash = make_password(PASSWORD)
+    dataset.users = User.objects.bulk_create(
+        (user_factory(number, password_hash) for number in range(users)),
+        batch_size=BATCH_SIZE
+    )
+    dataset.authors = dataset.users[:max(1, int(users * AUTHOR_SHARE))]
+    author_weights = zipf_weights(len(dataset.authors))
+
+    dataset.recipes = Recipe.objects.bulk_create(
+        (
+            recipe_factory(
+                rng, number,
+                rng.choices(dataset.authors, author_weights)[0]
+            )
+            for number in range(recipes)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    RecipeIngredient.objects.bulk_create(
+        itertools.chain.from_iterable(
+            ingredient_amounts_factory(rng, recipe, dataset.ingredients)
+            for recipe in dataset.recipes
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+    popular_recipes = rng.sample(dataset.recipes, len(dataset.recipes))
+    recipe_weights = zipf_weights(len(popular_recipes), 0.8)
+    for model, limits in (
+        (Favorite, FAVORITES_PER_USER),
+        (ShoppingCart, CART_PER_USER),
+    ):
+        model.objects.bulk_create(
+            (
+                model(user=user, recipe=recipe)
+                for user in dataset.users
+                for recipe in sample_popular(
+                    rng, popular_recipes, recipe_weights,
+                    rng.randint(*limits)
+                )
+            ),
+            batch_size=BATCH_SIZE
+        )
+    Subscription.objects.bulk_create(
+        (
+            Subscription(user=user, author=author)
+            for user in dataset.users
+            for author in sample_popular(
+                rng, dataset.authors, author_weights,
+                rng.randint(*SUBSCRIPTIONS_PER_USER)
+            )
+            if author.pk != user.pk
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+    # bulk_create обходит сигналы и счётчики.
+    recount()
+    rebuild_shopping_lists()
+    return dataset
@@ -0,0 +1,261 @@
+"""Замеры основных эндпоинтов на большом наборе данных.
+
+Для каждого сценария записываются число запросов к БД, перцентили
+задержки и пик памяти. Результат сравнивается с baseline.json: любой
+лишний запрос к БД (N+1) — регрессия, задержка p50 и память — если
+выросли больше допустимого. Пересоздать baseline:
+
+    BENCHMARK_UPDATE_BASELINE=1 pytest -m benchmark -k api_suite
+"""
+import json
+import os
+import statistics
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from time import perf_counter
+from typing import Callable
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from recipes.models import ShoppingCart
+
+from .dataset import seed_dataset
+
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+USERS = int(os.getenv('BENCHMARK_USERS', 200))
+RECIPES = int(os.getenv('BENCHMARK_RECIPES', 1000))
+ITERATIONS = int(os.getenv('BENCHMARK_ITERATIONS', 30))
+# Допустимый относительный рост p50 и пика памяти.
+LATENCY_THRESHOLD = float(os.getenv('BENCHMARK_LATENCY_THRESHOLD', 1.0))
+MEMORY_THRESHOLD = float(os.getenv('BENCHMARK_MEMORY_THRESHOLD', 0.5))
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAA'
+    'CVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNo'
+    'AAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+@dataclass
+class Scenario:
+    name: str
+    client: APIClient
+    send: Callable[[APIClient, int], object]
+    expected_status: int = 200
+
+
+async def read_streaming(response):
+    async for _ in response.streaming_content:
+        pass
+
+
+def get(url, params=None):
+    def send(client, iteration):
+        response = client.get(url, params)
+        if response.streaming:
+            async_to_sync(read_streaming)(response)
+        return response
+    return send
+
+
+def recipe_data(dataset, iteration, ingredients=5):
+    offset = iteration % (len(dataset.ingredients) - ingredients)
+    return {
+        'name': f'Новый рецепт {iteration}',
+        'text': 'Описание',
+        'cooking_time': 10 + iteration % 50,
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 10 + iteration}
+            for ingredient in dataset.ingredients[offset:offset + ingredients]
+        ],
+    }
+
+
+def make_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user=user)
+    return client
+
+
+def get_scenarios(dataset):
+    # Самая полная корзина, чтобы выгрузка была показательной.
+    shopper_id = ShoppingCart.objects.values('user').annotate(
+        total=Count('id')
+    ).order_by('-total', 'user').values_list('user', flat=True).first()
+    shopper = next(user for user in dataset.users if user.pk == shopper_id)
+    author = dataset.authors[0]
+    anonymous = make_client()
+    reader = make_client(shopper)
+    writer = make_client(author)
+    own_recipe = next(
+        recipe for recipe in dataset.recipes if recipe.author_id == author.pk
+    )
+    feed = reverse('recipes-list')
+
+    def create(client, iteration):
+        return client.post(feed, {
+            **recipe_data(dataset, iteration), 'image': IMAGE
+        }, format='json')
+
+    def patch(client, iteration):
+        return client.patch(
+            reverse('recipes-detail', args=[own_recipe.id]),
+            recipe_data(dataset, iteration), format='json'
+        )
+
+    return [
+        Scenario('feed', anonymous, get(feed, {'limit': 6})),
+        Scenario('feed_authenticated', reader, get(feed, {'limit': 6})),
+        Scenario('feed_by_author', reader, get(
+            feed, {'author': author.id, 'limit': 6}
+        )),
+        Scenario('feed_favorited', reader, get(
+            feed, {'is_favorited': 1, 'limit': 6}
+        )),
+        Scenario('recipe_detail', reader, get(
+            reverse('recipes-detail', args=[dataset.recipes[0].id])
+        )),
+        Scenario('subscriptions', reader, get(
+            reverse('users-subscriptions'), {'recipes_limit': 3}
+        )),
+        Scenario('ingredient_search', anonymous, get(
+            reverse('ingredients-list'), {'name': 'сах'}
+        )),
+        Scenario('cart_download', reader, get(
+            reverse('recipes-download-shopping-cart')
+        )),
+        Scenario('recipe_create', writer, create, expected_status=201),
+        Scenario('recipe_patch', writer, patch),
+    ]
+
+
+def run_scenario(scenario, iterations):
+    def send(iteration):
+        response = scenario.send(scenario.client, iteration)
+        assert response.status_code == scenario.expected_status, (
+            scenario.name, response.status_code
+        )
+
+    send(0)
+    # Клиент очищает журнал запросов в начале каждого запроса, и
+    # CaptureQueriesContext считает верно, только если журнал был пуст.
+    reset_queries()
+    with CaptureQueriesContext(connection) as context:
+        send(1)
+    # captured_queries читает журнал, который следующий запрос очистит.
+    queries = len(context.captured_queries)
+
+    tracemalloc.start()
+    try:
+        send(2)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    for iteration in range(3, 3 + iterations):
+        start = perf_counter()
+        send(iteration)
+        timings.append((perf_counter() - start) * 1000)
+    percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'queries': queries,
+        'p50_ms': round(percentiles[49], 3),
+        'p90_ms': round(percentiles[89], 3),
+        'p99_ms': round(percentiles[98], 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def find_regressions(results, baseline):
+    """Описания регрессий относительно baseline."""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append(
+                f'{name}: запросов к БД {result["queries"]} '
+                f'вместо {expected["queries"]}'
+            )
+        for key, threshold in (
+            ('p50_ms', LATENCY_THRESHOLD),
+            ('peak_memory_kb', MEMORY_THRESHOLD),
+        ):
+            if result[key] > expected[key] * (1 + threshold):
+                regressions.append(
+                    f'{name}: {key} {result[key]} при baseline '
+                    f'{expected[key]} (допустимо +{threshold:.0%})'
+                )
+    return regressions
+
+
+def test_find_regressions():
+    baseline = {'feed': {'queries': 3, 'p50_ms': 10, 'peak_memory_kb': 100}}
+
+    assert find_regressions({
+        'feed': {'queries': 3, 'p50_ms': 19, 'peak_memory_kb': 140},
+        'new': {'queries': 50, 'p50_ms': 1, 'peak_memory_kb': 1},
+    }, baseline) == []
+    assert len(find_regressions({
+        'feed': {'queries': 4, 'p50_ms': 21, 'peak_memory_kb': 151},
+    }, baseline)) == 3
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_api_suite(real_ingredients, settings, tmp_path):
+    # Кэш ленты скрыл бы запросы к БД, ради которых всё и затевалось.
+    settings.RECIPES_CACHE_TIMEOUT = 0
+    settings.MEDIA_ROOT = tmp_path
+    dataset = seed_dataset(users=USERS, recipes=RECIPES)
+
+    results = {
+        scenario.name: run_scenario(scenario, ITERATIONS)
+        for scenario in get_scenarios(dataset)
+    }
+    report = {
+        'dataset': {
+            'users': USERS,
+            'recipes': RECIPES,
+            'ingredients': len(dataset.ingredients),
+        },
+        'scenarios': results,
+    }
+
+    print()
+    for name, result in results.items():
+        print(
+            f'{name:20} запросов {result["queries"]:3}  '
+            f'p50 {result["p50_ms"]:8.2f} мс  '
+            f'p90 {result["p90_ms"]:8.2f} мс  '
+            f'p99 {result["p99_ms"]:8.2f} мс  '
+            f'память {result["peak_memory_kb"]:9.1f} КБ'
+        )
+    if os.getenv('BENCHMARK_RESULTS'):
+        Path(os.getenv('BENCHMARK_RESULTS')).write_text(
+            json.dumps(report, ensure_ascii=False, indent=2)
+        )
+    if os.getenv('BENCHMARK_UPDATE_BASELINE'):
+        BASELINE_PATH.write_text(
+            json.dumps(report, ensure_ascii=False, indent=2) + '\n'
+        )
+        return
+
+    if not BASELINE_PATH.exists():
+        pytest.skip(f'Нет baseline: {BASELINE_PATH}')
+    baseline = json.loads(BASELINE_PATH.read_text())
+    if baseline['dataset'] != report['dataset']:
+        pytest.skip('Baseline снят на другом наборе данных')
+    regressions = find_regressions(results, baseline['scenarios'])
+    assert not regressions, '\n'.join(regressions)
@@ -0,0 +1,79 @@
+import asyncio
+import statistics
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+
+from recipes.models import Recipe, RecipeIngredient
+
+
+RECIPES_COUNT = 60
+CONCURRENCY = 32
+REQUESTS = 400
+
+
+@pytest.fixture
+def feed(author, sample_ingredient, settings):
+    # Страницы ленты не кэшируются: сравниваем именно работу с БД.
+    settings.RECIPES_CACHE_TIMEOUT = 0
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            image='recipes/images/test.png',
+            text='Описание',
+            cooking_time=10
+        )
+        for number in range(RECIPES_COUNT)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=sample_ingredient,
+                         amount=10)
+        for recipe in recipes
+    )
+    return recipes
+
+
+async def load(urls):
+    """Выполняет REQUESTS запросов по CONCURRENCY одновременно."""
+    client = AsyncClient()
+    queue = iter(range(REQUESTS))
+    latencies = []
+
+    async def worker():
+        for number in queue:
+            started = time.perf_counter()
+            response = await client.get(urls[number % len(urls)])
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - started
+    return (
+        REQUESTS / elapsed,
+        statistics.quantiles(latencies, n=100)[98] * 1000
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', ['recipes-list', 'recipes-detail'])
+def test_async_views_under_load(feed, name):
+    args = [[]]
+    if name == 'recipes-detail':
+        args = [[recipe.id] for recipe in feed]
+    sync_urls = [reverse(name, args=value) for value in args]
+    async_urls = [reverse(f'async-{name}', args=value) for value in args]
+
+    sync_rps, sync_p99 = async_to_sync(load)(sync_urls)
+    async_rps, async_p99 = async_to_sync(load)(async_urls)
+
+    print(
+        f'\n{name}, {CONCURRENCY} одновременных запросов: '
+        f'sync {sync_rps:.0f} rps, p99 {sync_p99:.1f} мс; '
+        f'async {async_rps:.0f} rps, p99 {async_p99:.1f} мс'
+    )
@@ -0,0 +1,185 @@
+"""Пропускная способность BrokerChannelLayer между процессами.
+
+Брокеры и четыре воркера — отдельные процессы, как в проде. Замеряются
+рассылка group_send на каналы всех воркеров и отправка send по кругу,
+где отправитель при ChannelFull ждёт, пока получатель разберёт очередь.
+"""
+import asyncio
+import multiprocessing
+import shutil
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import pytest
+from channels.exceptions import ChannelFull
+
+from api.broker import serve
+from api.layers import BrokerChannelLayer
+
+
+WORKERS = 4
+CHANNELS_PER_WORKER = 25
+GROUP_MESSAGES = 400
+SEND_MESSAGES = 5000
+CAPACITY = 100
+
+
+def run_broker(path, shard, shards, config):
+    asyncio.run(serve(path, shard, shards, config))
+
+
+def fan_out_worker(shards, capacity, ready, results):
+    async def main():
+        layer = BrokerChannelLayer(shards=shards, capacity=capacity)
+        channels = [
+            await layer.new_channel() for _ in range(CHANNELS_PER_WORKER)
+        ]
+        for channel in channels:
+            await layer.group_add('bench', channel)
+        ready.put(True)
+
+        async def consume(channel):
+            for _ in range(GROUP_MESSAGES):
+                await layer.receive(channel)
+
+        await asyncio.gather(*map(consume, channels))
+        results.put((perf_counter(), CHANNELS_PER_WORKER * GROUP_MESSAGES))
+
+    asyncio.run(main())
+
+
+def ring_worker(shards, capacity, number, ready, results):
+    async def main():
+        layer = BrokerChannelLayer(shards=shards, capacity=capacity)
+        inbox = f'bench-{number}'
+        outbox = f'bench-{(number + 1) % WORKERS}'
+        ready.put(True)
+        start = perf_counter()
+        full = 0
+
+        async def produce():
+            nonlocal full
+            for sequence in range(SEND_MESSAGES):
+                message = {'type': 'bench', 'n': sequence}
+                while True:
+                    try:
+                        await layer.send(outbox, message)
+                        break
+                    except ChannelFull:
+                        # Обратное давление: ждём, пока очередь разберут.
+                        full += 1
+                        await asyncio.sleep(0.001)
+
+        async def consume():
+            for sequence in range(SEND_MESSAGES):
+                message = await layer.receive(inbox)
+                assert message['n'] == sequence
+
+        await asyncio.gather(produce(), consume())
+        results.put((perf_counter() - start, full))
+
+    asyncio.run(main())
+
+
+@pytest.fixture
+def capacity():
+    return CAPACITY
+
+
+@pytest.fixture(params=[1, 2], ids=['1-shard', '2-shards'])
+def brokers(request, capacity):
+    # Ёмкость очередей задаёт брокер, воркеры подключаются с той же.
+    config = BrokerChannelLayer(capacity=capacity).broker_config
+    directory = tempfile.mkdtemp(prefix='foodgram-', dir='/tmp')
+    paths = [
+        str(Path(directory) / f'{shard}.sock')
+        for shard in range(request.param)
+    ]
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(
+            target=run_broker, args=(path, shard, len(paths), config),
+            daemon=True
+        )
+        for shard, path in enumerate(paths)
+    ]
+    for process in processes:
+        process.start()
+    for _ in range(500):
+        if all(Path(path).exists() for path in paths):
+            break
+        asyncio.run(asyncio.sleep(0.01))
+    yield paths
+    for process in processes:
+        process.kill()
+        process.join()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def start_workers(target, args):
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    results = context.Queue()
+    processes = [
+        context.Process(target=target, args=(*args(number), ready, results))
+        for number in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=60)
+    return processes, results
+
+
+def collect(processes, results):
+    collected = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join(10)
+        assert process.exitcode == 0
+    return collected
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('capacity', [GROUP_MESSAGES + 1])
+def test_group_fan_out_throughput(brokers, capacity):
+    # Все рассылки успевают лечь в очереди до того, как их разберут.
+    processes, results = start_workers(
+        fan_out_worker, lambda number: (brokers, capacity)
+    )
+
+    async def send():
+        layer = BrokerChannelLayer(shards=brokers, capacity=capacity)
+        for sequence in range(GROUP_MESSAGES):
+            await layer.group_send('bench', {'type': 'bench', 'n': sequence})
+
+    start = perf_counter()
+    asyncio.run(send())
+    collected = collect(processes, results)
+    elapsed = max(finished for finished, _ in collected) - start
+    delivered = sum(count for _, count in collected)
+
+    print(
+        f'\ngroup_send на {WORKERS * CHANNELS_PER_WORKER} каналов в '
+        f'{WORKERS} процессах, шард {len(brokers)}: доставлено '
+        f'{delivered} сообщений за {elapsed:.2f} с, '
+        f'{delivered / elapsed:,.0f} сообщений/с'
+    )
+    assert delivered == WORKERS * CHANNELS_PER_WORKER * GROUP_MESSAGES
+
+
+@pytest.mark.benchmark
+def test_send_throughput_with_backpressure(brokers, capacity):
+    processes, results = start_workers(
+        ring_worker, lambda number: (brokers, capacity, number)
+    )
+    collected = collect(processes, results)
+    elapsed = max(duration for duration, _ in collected)
+    delivered = WORKERS * SEND_MESSAGES
+    full = sum(full for _, full in collected)
+
+    print(
+        f'\nsend по кругу из {WORKERS} процессов, шард {len(brokers)}: '
+        f'{delivered} сообщений за {elapsed:.2f} с, '
+        f'{delivered / elapsed:,.0f} сообщений/с, ChannelFull {full} раз'
+    )
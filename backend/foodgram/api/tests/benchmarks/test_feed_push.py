@@ -0,0 +1,113 @@
+"""Рецепт автора со 100 тысячами подписчиков.
+
+Замеряются задержка POST, который только ставит рассылку в очередь, и
+время самой рассылки в пуле потоков: подписчики читаются пачками по
+FEED_PUSH_CHUNK_SIZE, у каждого по открытому сокету. Данные
+фиксируются в БД, иначе поток пула их не увидит.
+"""
+import json
+import os
+import statistics
+from time import perf_counter
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.feed_push import get_feed_group, wait_for_feed_pushes
+from recipes.models import Ingredient
+from users.models import Subscription
+
+
+User = get_user_model()
+
+FOLLOWERS = int(os.getenv('BENCHMARK_FOLLOWERS', 100_000))
+POSTS = 5
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAA'
+    'CVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNo'
+    'AAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_popular_author(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    author = User.objects.create_user(
+        email='author@example.com', username='author', password='pass12345',
+        first_name='Автор', last_name='Популярный'
+    )
+    followers = User.objects.bulk_create(
+        (
+            User(email=f'follower{number}@example.com',
+                 username=f'follower{number}',
+                 first_name='Имя', last_name='Фамилия')
+            for number in range(FOLLOWERS)
+        ),
+        batch_size=5000
+    )
+    Subscription.objects.bulk_create(
+        (Subscription(user=follower, author=author)
+         for follower in followers),
+        batch_size=5000
+    )
+    ingredient = Ingredient.objects.create(name='Соль', measurement_unit='г')
+
+    layer = get_channel_layer()
+
+    async def open_sockets():
+        channels = {}
+        for follower in (followers[0], followers[-1]):
+            channel = await layer.new_channel()
+            await layer.group_add(get_feed_group(follower.pk), channel)
+            channels[follower.pk] = channel
+        return channels
+
+    channels = async_to_sync(open_sockets)()
+    client = APIClient()
+    client.force_authenticate(author)
+    latencies, pushes = [], []
+    for number in range(POSTS):
+        started = perf_counter()
+        response = client.post(reverse('recipes-list'), {
+            'name': f'Рецепт {number}',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': IMAGE,
+            'ingredients': [{'id': ingredient.id, 'amount': 10}],
+        }, format='json')
+        latencies.append(perf_counter() - started)
+        assert response.status_code == 201
+        wait_for_feed_pushes()
+        pushes.append(perf_counter() - started)
+
+    async def receive_all():
+        return {
+            pk: [
+                json.loads(
+                    (await layer.receive(channel))['text']
+                )['recipe']['name']
+                for _ in range(POSTS)
+            ]
+            for pk, channel in channels.items()
+        }
+
+    expected = [f'Рецепт {number}' for number in range(POSTS)]
+    assert async_to_sync(receive_all)() == {
+        pk: expected for pk in channels
+    }
+
+    latency = statistics.median(latencies) * 1000
+    push = statistics.median(pushes)
+    print(
+        f'\n{FOLLOWERS} подписчиков: POST {latency:.0f} мс, рассылка '
+        f'{push:.2f} с ({FOLLOWERS / push:.0f} групп/с) пачками по '
+        f'{settings.FEED_PUSH_CHUNK_SIZE}'
+    )
+    # Ответ не ждёт рассылки.
+    assert latency < push * 1000 / 10
@@ -0,0 +1,45 @@
+import timeit
+
+import pytest
+
+from api.filters import IngredientFilter
+from api.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+
+QUERIES = ('а', 'мол', 'сах', 'соль', 'картоф', 'ябл', 'х', 'перец ч')
+ROUNDS = 20
+
+
+def search_orm(query):
+    return list(IngredientFilter(
+        {'name': query}, queryset=Ingredient.objects.all()
+    ).qs.values('id', 'name', 'measurement_unit'))
+
+
+def search_index(query):
+    return ingredient_index.search(query)
+
+
+def measure(search):
+    def run():
+        for query in QUERIES:
+            search(query)
+
+    run()
+    seconds = min(timeit.repeat(run, number=1, repeat=ROUNDS))
+    return seconds / len(QUERIES) * 1e6
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_ingredient_index_faster_than_orm(real_ingredients):
+    orm_us = measure(search_orm)
+    index_us = measure(search_index)
+
+    print(
+        f'\nПоиск ингредиентов ({len(real_ingredients)} строк): '
+        f'ORM {orm_us:.1f} мкс/запрос, индекс {index_us:.1f} мкс/запрос, '
+        f'ускорение x{orm_us / index_us:.1f}'
+    )
+    assert index_us < orm_us
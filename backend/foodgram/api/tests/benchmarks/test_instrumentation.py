@@ -0,0 +1,77 @@
+import timeit
+
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from api.metrics import finish_request, metrics, record_query, start_request
+from api.middleware import InstrumentationMiddleware
+
+
+ROUNDS = 15
+NUMBER = 200
+
+
+def best(function, number=NUMBER):
+    return min(timeit.repeat(function, number=number, repeat=ROUNDS)) / number
+
+
+def measure_request_overhead():
+    """Затраты middleware на запрос без учёта запросов к БД."""
+    request = RequestFactory().get('/')
+
+    def view(request):
+        return HttpResponse()
+
+    instrumented = InstrumentationMiddleware(view)
+    return best(lambda: instrumented(request)) - best(lambda: view(request))
+
+
+def measure_query_overhead(top_queries):
+    """Затраты обёртки на один запрос к БД."""
+    cursor = connection.cursor()
+
+    def run():
+        cursor.execute('SELECT 1')
+
+    plain = best(run)
+    stats, token = start_request(top_queries)
+    try:
+        # Обёртка стоит у соединения всегда, в запросе она ещё и считает.
+        assert record_query in connection.execute_wrappers
+        instrumented = best(run)
+    finally:
+        finish_request(token)
+    return instrumented - plain, stats
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('threshold', [None, 10.0])
+def test_instrumentation_overhead(recipe, threshold):
+    url = reverse('recipes-detail', args=[recipe.id])
+    client = Client()
+    with override_settings(SLOW_REQUEST_THRESHOLD=threshold):
+        metrics.reset()
+        client.get(url)
+        queries = metrics.queries.histograms[('recipes-detail', 'GET')].total
+        request_seconds = best(lambda: client.get(url), number=20)
+        request_overhead = measure_request_overhead()
+        query_overhead, stats = measure_query_overhead(
+            settings.SLOW_REQUEST_TOP_QUERIES if threshold else 0
+        )
+    metrics.reset()
+
+    assert stats.queries == ROUNDS * NUMBER
+    overhead = request_overhead + queries * query_overhead
+    print(
+        f'\nИнструментирование (порог {threshold}): запрос '
+        f'{request_seconds * 1e6:.0f} мкс, middleware '
+        f'{request_overhead * 1e6:.1f} мкс + {queries} x '
+        f'{query_overhead * 1e6:.2f} мкс на запросы к БД '
+        f'({overhead / request_seconds:.1%})'
+    )
+    assert overhead / request_seconds < 0.05
@@ -0,0 +1,128 @@
+"""JSON для ответов API и рассылок WebSocket.
+
+Страница ленты из 100 рецептов кодируется JSONRenderer DRF и
+FastJSONRenderer, ответ на POST разбирается JSONParser и
+FastJSONParser. Для рассылки в комнату чата из 1000 сокетов
+сравнивается кодирование кадра для каждого получателя, как было
+раньше, с одним кадром на всех, и замеряется доставка целиком.
+Какой кодировщик работает, печатается: без orjson оба рендерера
+идут через json.
+"""
+import asyncio
+import io
+import json
+import statistics
+from time import perf_counter
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.urls import reverse
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api import chat
+from api.fast_json import (
+    FastJSONParser, FastJSONRenderer, dumps_text, get_backend
+)
+from api.routing import websocket_urlpatterns
+from recipes.models import Recipe, RecipeIngredient
+
+
+RECIPES = 100
+ITERATIONS = 200
+MEMBERS = 1000
+
+
+def measure(function, iterations=ITERATIONS):
+    timings = []
+    for _ in range(iterations):
+        started = perf_counter()
+        function()
+        timings.append(perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+@pytest.fixture
+def feed_page(authenticated_client, author, sample_ingredient, settings):
+    settings.RECIPES_CACHE_TIMEOUT = 0
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            image='recipes/images/test.png',
+            text='Описание рецепта ' * 20,
+            cooking_time=10
+        )
+        for number in range(RECIPES)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=sample_ingredient,
+                         amount=10)
+        for recipe in recipes
+    )
+    response = authenticated_client.get(
+        reverse('recipes-list'), {'limit': RECIPES}
+    )
+    assert len(response.data['results']) == RECIPES
+    return response.data
+
+
+@pytest.mark.benchmark
+def test_feed_page(feed_page):
+    body = JSONRenderer().render(feed_page)
+    assert FastJSONRenderer().render(feed_page) == body
+
+    drf = measure(lambda: JSONRenderer().render(feed_page))
+    fast = measure(lambda: FastJSONRenderer().render(feed_page))
+    drf_parse = measure(lambda: JSONParser().parse(io.BytesIO(body)))
+    fast_parse = measure(lambda: FastJSONParser().parse(io.BytesIO(body)))
+    print(
+        f'\nСтраница из {RECIPES} рецептов ({len(body) // 1024} КБ, '
+        f'{get_backend()}): кодирование {drf:.2f} -> {fast:.2f} мс, '
+        f'разбор {drf_parse:.2f} -> {fast_parse:.2f} мс'
+    )
+
+
+@pytest.mark.benchmark
+def test_room_broadcast():
+    chat.history.rooms.clear()
+    event = {
+        'id': 'a' * 32,
+        'user': 'author@example.com',
+        'message': 'Кто пробовал этот рецепт с другой мукой? ' * 3,
+        'sent_at': '2026-10-18T12:30:15.123456+00:00',
+    }
+    per_member = measure(
+        lambda: [json.dumps(event) for _ in range(MEMBERS)], 20
+    )
+    once = measure(lambda: dumps_text(event), 20)
+
+    async def main():
+        members = []
+        for _ in range(MEMBERS):
+            communicator = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), '/ws/chat/benchmark/'
+            )
+            communicator.scope['user'] = AnonymousUser()
+            assert (await communicator.connect())[0]
+            members.append(communicator)
+        started = perf_counter()
+        await members[0].send_json_to({'message': event['message']})
+        frames = await asyncio.gather(*(
+            member.receive_from(timeout=30) for member in members
+        ))
+        elapsed = perf_counter() - started
+        await asyncio.gather(*(member.disconnect() for member in members))
+        return frames, elapsed
+
+    frames, elapsed = async_to_sync(main)()
+    chat.history.rooms.clear()
+    assert len(set(frames)) == 1
+    print(
+        f'\nРассылка на {MEMBERS} сокетов ({get_backend()}): кодирование '
+        f'для каждого {per_member:.2f} мс, один раз {once:.3f} мс; '
+        f'доставка {elapsed * 1000:.0f} мс'
+    )
@@ -0,0 +1,18 @@
+import time
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Ingredient
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_load_full_ingredient_file(ingredients_csv):
+    started = time.perf_counter()
+    call_command('load_ingredients', ingredients_csv)
+    elapsed = time.perf_counter() - started
+
+    print(f'\nЗагрузка {ingredients_csv.name}: {elapsed * 1000:.0f} мс')
+    assert Ingredient.objects.count() == 2186
+    assert elapsed < 1
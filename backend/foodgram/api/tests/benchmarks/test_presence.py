@@ -0,0 +1,85 @@
+"""Волна переподключений для UserStatusConsumer.
+
+Тысячи сокетов подключаются почти одновременно, как после деплоя.
+Замеряются число кадров, ушедших клиентам, и задержка доставки: от
+подключения пользователя до кадра, в котором о нём узнал сокет. Для
+сравнения печатается, сколько кадров отправила бы прежняя схема с
+group_send на каждое подключение.
+"""
+import asyncio
+import json
+import statistics
+from time import perf_counter
+
+import pytest
+
+from api.presence import Presence
+
+
+SOCKETS = 3000
+BATCH = 100
+TICK = 0.25
+
+
+class Socket:
+    def __init__(self, connected_at, earliest):
+        self.connected_at = connected_at
+        self.earliest = earliest
+        self.frames = 0
+        self.latencies = []
+
+    async def send(self, text_data):
+        now = perf_counter()
+        self.frames += 1
+        # Дифф один на всех, разбираем его один раз.
+        earliest = self.earliest.get(text_data)
+        if earliest is None:
+            frame = json.loads(text_data)
+            earliest = self.earliest[text_data] = min(
+                (self.connected_at[user] for user in frame.get('joined', ())),
+                default=0
+            )
+        if earliest:
+            # Худшая задержка в кадре: от самого раннего из вошедших.
+            self.latencies.append(now - earliest)
+
+
+@pytest.mark.benchmark
+def test_reconnect_storm(settings):
+    settings.PRESENCE_TICK = TICK
+    connected_at = {}
+    earliest = {}
+
+    async def main():
+        presence = Presence()
+        sockets = []
+        for number in range(SOCKETS):
+            user = f'user{number}'
+            connected_at[user] = perf_counter()
+            socket = Socket(connected_at, earliest)
+            sockets.append(socket)
+            await presence.attach(socket, user)
+            if number % BATCH == BATCH - 1:
+                await asyncio.sleep(0.01)
+        await asyncio.sleep(TICK * 3)
+        return presence, sockets
+
+    start = perf_counter()
+    presence, sockets = asyncio.run(main())
+    elapsed = perf_counter() - start - TICK * 3
+
+    frames = sum(socket.frames for socket in sockets)
+    latencies = [
+        latency for socket in sockets for latency in socket.latencies
+    ]
+    p99 = statistics.quantiles(latencies, n=100)[98] * 1000
+    legacy = SOCKETS * (SOCKETS + 1) // 2
+    print(
+        f'\n{SOCKETS} сокетов за {elapsed:.2f} с: кадров клиентам '
+        f'{frames} (прежняя схема: {legacy}), '
+        f'p99 задержки {p99:.0f} мс при тике {TICK * 1000:.0f} мс'
+    )
+    # Снимок и не больше кадра на тик на каждый сокет.
+    ticks = (elapsed + TICK * 3) / TICK + 1
+    assert frames <= SOCKETS * (1 + ticks)
+    assert presence.messages_sent == frames
@@ -0,0 +1,34 @@
+import random
+import timeit
+
+import pytest
+
+from api import short_codes
+
+
+ROUNDS = 10
+IDS = random.Random(0).sample(range(1, 10 ** 7), 10000)
+
+
+def measure(function, values):
+    def run():
+        for value in values:
+            function(value)
+
+    run()
+    seconds = min(timeit.repeat(run, number=1, repeat=ROUNDS))
+    return len(values) / seconds
+
+
+@pytest.mark.benchmark
+def test_short_code_throughput():
+    codes = [short_codes.encode(recipe_id) for recipe_id in IDS]
+
+    encode_ops = measure(short_codes.encode, IDS)
+    decode_ops = measure(short_codes.decode, codes)
+
+    print(
+        f'\nКороткие коды: кодирование {encode_ops / 1e6:.2f} млн/с, '
+        f'декодирование {decode_ops / 1e6:.2f} млн/с'
+    )
+    assert min(encode_ops, decode_ops) > 1e5
@@ -0,0 +1,79 @@
+import timeit
+
+import pytest
+from django.test import RequestFactory
+from rest_framework import serializers, status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.views import build_absolute_url, recipe_short_redirect
+from recipes.models import Recipe
+
+
+ROUNDS = 20
+NUMBER = 200
+
+
+class ShortCodeValidatorSerializer(serializers.Serializer):
+    short_code = serializers.CharField()
+
+    def validate_short_code(self, value):
+        if not value.isdigit():
+            raise serializers.ValidationError('Неверный формат ссылки')
+        if not Recipe.objects.filter(pk=int(value)).exists():
+            raise serializers.ValidationError('Рецепт не найден')
+        return int(value)
+
+
+class DRFShortRedirectView(APIView):
+    """Прежний вариант редиректа: сериализатор, запрос к БД и Response."""
+
+    permission_classes = [AllowAny]
+
+    def get(self, request, short_code):
+        serializer = ShortCodeValidatorSerializer(
+            data={'short_code': short_code}
+        )
+        if not serializer.is_valid():
+            return Response(
+                {'detail': ' '.join(serializer.errors['short_code'])},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        full_url = build_absolute_url(
+            request, f'/recipes/{serializer.validated_data["short_code"]}/'
+        )
+        return Response(
+            {'Location': full_url},
+            status=status.HTTP_302_FOUND,
+            headers={'Location': full_url}
+        )
+
+
+def measure(view, request, short_code):
+    def run():
+        response = view(request, short_code=short_code)
+        if hasattr(response, 'render'):
+            response.render()
+        assert response.status_code == status.HTTP_302_FOUND
+
+    run()
+    seconds = min(timeit.repeat(run, number=NUMBER, repeat=ROUNDS))
+    return seconds / NUMBER * 1e6
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_fast_redirect_faster_than_drf_view(recipe):
+    request = RequestFactory().get(f'/r/{recipe.id}/')
+    drf_us = measure(
+        DRFShortRedirectView.as_view(), request, str(recipe.id)
+    )
+    fast_us = measure(recipe_short_redirect, request, str(recipe.id))
+
+    print(
+        f'\nРедирект по короткой ссылке: DRF {drf_us:.1f} мкс/запрос, '
+        f'битовая карта {fast_us:.1f} мкс/запрос, '
+        f'ускорение x{drf_us / fast_us:.1f}'
+    )
+    assert fast_us < drf_us
@@ -1,8 +1,9 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework.test import APIClient
 
-from recipes.models import Ingredient
+from recipes.models import Ingredient, Recipe, RecipeIngredient
 
 
 User = get_user_model()
@@ -13,20 +14,42 @@ def enable_db_access_for_all_tests(db):
     pass
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
 
 
 @pytest.fixture
-def authenticated_client(api_client):
-    user = User.objects.create_user(
+def user():
+    return User.objects.create_user(
         email='test@example.com',
         first_name='test_first_name',
         last_name='test_last_name',
         username='testuser',
         password='testpassword123'
     )
+
+
+@pytest.fixture
+def author():
+    return User.objects.create_user(
+        email='author@example.com',
+        first_name='author_first_name',
+        last_name='author_last_name',
+        username='author',
+        password='authorpassword123'
+    )
+
+
+@pytest.fixture
+def authenticated_client(api_client, user):
     api_client.force_authenticate(user=user)
     return api_client
 
@@ -41,6 +64,21 @@ def second_sample_ingredient():
     return Ingredient.objects.create(name='Соль', measurement_unit='г')
 
 
+@pytest.fixture
+def recipe(author, sample_ingredient):
+    recipe = Recipe.objects.create(
+        author=author,
+        name='Рецепт автора',
+        image='recipes/images/test.png',
+        text='Описание рецепта автора',
+        cooking_time=15
+    )
+    RecipeIngredient.objects.create(
+        recipe=recipe, ingredient=sample_ingredient, amount=100
+    )
+    return recipe
+
+
 @pytest.fixture
 def recipe_data(sample_ingredient):
     return {
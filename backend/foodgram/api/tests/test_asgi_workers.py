@@ -0,0 +1,66 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get_status(url):
+    try:
+        return urllib.request.urlopen(url, timeout=1).status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def test_many_workers_need_broker():
+    with pytest.raises(CommandError):
+        call_command('run_asgi_workers', workers=2)
+
+
+def test_workers_share_port(tmp_path):
+    port = get_free_port()
+    process = subprocess.Popen(
+        [sys.executable, 'manage.py', 'run_asgi_workers',
+         '--workers', '2', '--bind', '127.0.0.1', '--port', str(port)],
+        cwd=settings.BASE_DIR,
+        env={
+            **os.environ,
+            'DJANGO_HOSTS': '127.0.0.1',
+            # Брокеры для HTTP не нужны, слой подключается к ним лениво.
+            'CHANNEL_BROKER_SOCKETS': str(tmp_path / 'channels.sock'),
+        },
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                status = get_status(f'http://127.0.0.1:{port}/metrics/')
+                break
+            except OSError:
+                assert time.monotonic() < deadline
+                time.sleep(0.2)
+        assert status == 200
+        children = Path(
+            f'/proc/{process.pid}/task/{process.pid}/children'
+        ).read_text().split()
+        assert len(children) == 2
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(15) == 0
@@ -0,0 +1,95 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite
+
+
+@pytest.fixture
+def token_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+    )
+    return client
+
+
+def assert_same(client, sync_url, async_url, params=None):
+    sync_response = client.get(sync_url, params)
+    async_response = client.get(async_url, params)
+
+    assert async_response.status_code == sync_response.status_code
+    assert async_response.json() == sync_response.json()
+    return async_response
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {}, {'limit': 1}, {'author': 0}, {'page': 5}, {'author': 'abc'},
+])
+def test_recipe_list_matches_sync(api_client, recipe, params):
+    assert_same(api_client, reverse('recipes-list'),
+                reverse('async-recipes-list'), params)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{}, {'is_favorited': 1}])
+def test_recipe_list_user_flags(token_client, user, recipe, params):
+    Favorite.objects.create(user=user, recipe=recipe)
+    recipe.author.followers.create(user=user)
+
+    response = assert_same(token_client, reverse('recipes-list'),
+                           reverse('async-recipes-list'), params)
+
+    result = response.json()['results'][0]
+    assert result['is_favorited'] is True
+    assert result['author']['is_subscribed'] is True
+
+
+@pytest.mark.django_db
+def test_recipe_detail_matches_sync(token_client, recipe):
+    assert_same(token_client, reverse('recipes-detail', args=[recipe.id]),
+                reverse('async-recipes-detail', args=[recipe.id]))
+    assert_same(token_client, reverse('recipes-detail', args=[0]),
+                reverse('async-recipes-detail', args=[0]))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{}, {'name': 'са'}, {'limit': 1}])
+def test_ingredient_list_matches_sync(api_client, sample_ingredient,
+                                      second_sample_ingredient, params):
+    assert_same(api_client, reverse('ingredients-list'),
+                reverse('async-ingredients-list'), params)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('short_code', ['{id}', '0', 'abc'])
+def test_short_redirect_matches_sync(api_client, recipe, short_code):
+    short_code = short_code.format(id=recipe.id)
+    sync_response = api_client.get(
+        reverse('recipe_short_redirect', args=[short_code])
+    )
+    async_response = api_client.get(
+        reverse('async-recipe-short-redirect', args=[short_code])
+    )
+
+    assert async_response.status_code == sync_response.status_code
+    assert async_response.content == sync_response.content
+    assert async_response.get('Location') == sync_response.get('Location')
+
+
+@pytest.mark.django_db
+def test_invalid_token(api_client, recipe):
+    api_client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+    assert_same(api_client, reverse('recipes-list'),
+                reverse('async-recipes-list'))
+
+
+@pytest.mark.django_db
+def test_only_get_allowed(api_client):
+    response = api_client.post(reverse('async-recipes-list'))
+
+    assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
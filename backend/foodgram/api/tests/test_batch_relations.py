@@ -0,0 +1,112 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from api.serializers import RECIPE_BATCH_LIMIT
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+MISSING_ID = 10 ** 6
+CART_URL = reverse('recipes-shopping-cart-batch')
+FAVORITE_URL = reverse('recipes-favorite-batch')
+
+
+@pytest.fixture
+def recipes(author):
+    return Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            image='recipes/images/test.png',
+            text='Описание',
+            cooking_time=10
+        )
+        for number in range(20)
+    )
+
+
+def statuses(response):
+    assert response.status_code == status.HTTP_200_OK
+    return {item['id']: item['status'] for item in response.data['results']}
+
+
+@pytest.mark.django_db
+def test_batch_add_to_cart(authenticated_client, user, recipes):
+    ShoppingCart.objects.create(user=user, recipe=recipes[0])
+    ids = [recipe.id for recipe in recipes[:3]] + [MISSING_ID]
+
+    response = authenticated_client.post(
+        CART_URL, {'recipes': ids}, format='json'
+    )
+
+    assert statuses(response) == {
+        recipes[0].id: 'exists',
+        recipes[1].id: 'added',
+        recipes[2].id: 'added',
+        MISSING_ID: 'not_found',
+    }
+    assert ShoppingCart.objects.filter(user=user).count() == 3
+    assert list(Recipe.objects.filter(
+        pk__in=[recipe.id for recipe in recipes[1:3]]
+    ).values_list('shopping_cart_count', flat=True)) == [1, 1]
+
+
+@pytest.mark.django_db
+def test_batch_remove_from_favorites(authenticated_client, user, recipes):
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    Recipe.objects.filter(pk=recipes[0].pk).update(favorites_count=1)
+
+    response = authenticated_client.delete(
+        FAVORITE_URL,
+        {'recipes': [recipes[0].id, recipes[1].id, MISSING_ID]},
+        format='json'
+    )
+
+    assert statuses(response) == {
+        recipes[0].id: 'removed',
+        recipes[1].id: 'missing',
+        MISSING_ID: 'not_found',
+    }
+    assert not Favorite.objects.filter(user=user).exists()
+    recipes[0].refresh_from_db()
+    assert recipes[0].favorites_count == 0
+
+
+@pytest.mark.django_db
+def test_batch_query_count_is_constant(authenticated_client, recipes):
+    ids = [recipe.id for recipe in recipes]
+
+    with CaptureQueriesContext(connection) as context:
+        authenticated_client.post(CART_URL, {'recipes': ids}, format='json')
+
+    # Проверка, вставка, обновление счётчиков и списка покупок —
+    # на любое число рецептов.
+    assert len([
+        query for query in context.captured_queries
+        if query['sql'].split(None, 1)[0] in ('SELECT', 'INSERT', 'UPDATE')
+    ]) == 4
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('data', [
+    {},
+    {'recipes': []},
+    {'recipes': ['abc']},
+    {'recipes': [0]},
+    {'recipes': [1] * (RECIPE_BATCH_LIMIT + 1)},
+])
+def test_batch_validation(authenticated_client, data):
+    response = authenticated_client.post(CART_URL, data, format='json')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_batch_unauthenticated(api_client, recipes):
+    response = api_client.post(
+        CART_URL, {'recipes': [recipes[0].id]}, format='json'
+    )
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
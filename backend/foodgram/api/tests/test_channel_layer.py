@@ -0,0 +1,522 @@
+"""Проверки канального слоя по контракту Channels.
+
+Одни и те же тесты гоняются на InMemoryChannelLayer, на котором
+контракт заведомо выполняется, и на BrokerChannelLayer с одной и с
+двумя шардами.
+"""
+import asyncio
+import gc
+import multiprocessing
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from django.core.exceptions import ImproperlyConfigured
+
+from api.broker import serve
+from api.layers import BrokerChannelLayer
+
+
+# Слои, созданные тестом, закрываются в конце run().
+created_layers = []
+
+
+class BrokerThread(threading.Thread):
+    """Брокеры шард в отдельном потоке со своим event loop."""
+
+    def __init__(self, paths, config=None):
+        super().__init__(daemon=True)
+        self.paths = paths
+        self.config = config
+        self.started = threading.Event()
+
+    def run(self):
+        asyncio.run(self.main())
+
+    async def main(self):
+        self.loop = asyncio.get_running_loop()
+        remaining = len(self.paths)
+
+        def started():
+            nonlocal remaining
+            remaining -= 1
+            if not remaining:
+                self.started.set()
+
+        self.task = asyncio.gather(*(
+            serve(path, shard, len(self.paths), self.config, started)
+            for shard, path in enumerate(self.paths)
+        ))
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.join()
+
+
+@pytest.fixture
+def socket_dir():
+    # Путь Unix-сокета ограничен ~100 символами, tmp_path бывает длиннее.
+    directory = tempfile.mkdtemp(prefix='foodgram-', dir='/tmp')
+    yield Path(directory)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def start_brokers(socket_dir):
+    threads = []
+
+    def start(shards=1, **config):
+        paths = [
+            str(socket_dir / f'{len(threads)}-{shard}.sock')
+            for shard in range(shards)
+        ]
+        thread = BrokerThread(
+            paths, BrokerChannelLayer(**config).broker_config
+        )
+        thread.start()
+        assert thread.started.wait(5)
+        threads.append(thread)
+        return paths
+
+    yield start
+    for thread in threads:
+        thread.stop()
+
+
+@pytest.fixture(autouse=True)
+def record_layers(monkeypatch):
+    init = BrokerChannelLayer.__init__
+
+    def record(layer, *args, **kwargs):
+        init(layer, *args, **kwargs)
+        created_layers.append(layer)
+
+    monkeypatch.setattr(BrokerChannelLayer, '__init__', record)
+    yield
+    for layer in created_layers:
+        layer._drop_closed_loops()
+    created_layers.clear()
+    # Подключение и его задача чтения ссылаются друг на друга.
+    gc.collect()
+
+
+def broker_layers(start_brokers, shards):
+    """Слои одного теста, брокеры запускаются с настройками первого."""
+    paths = []
+
+    def make(**config):
+        if not paths:
+            paths.extend(start_brokers(shards, **config))
+        return BrokerChannelLayer(shards=paths, **config)
+
+    return make
+
+
+@pytest.fixture(params=['memory', 'broker', 'sharded'])
+def make_layer(request, start_brokers):
+    if request.param == 'memory':
+        return InMemoryChannelLayer
+    return broker_layers(
+        start_brokers, 2 if request.param == 'sharded' else 1
+    )
+
+
+@pytest.fixture
+def make_broker_layer(start_brokers):
+    return broker_layers(start_brokers, 2)
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            for layer in created_layers:
+                await layer.close()
+
+    return asyncio.run(main())
+
+
+async def receive_nothing(layer, channel, timeout=0.1):
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(layer.receive(channel), timeout)
+
+
+def test_send_receive(make_layer):
+    async def main():
+        layer = make_layer()
+        await layer.send('test-channel-1', {'type': 'test.message', 'n': 1})
+        return await layer.receive('test-channel-1')
+
+    assert run(main()) == {'type': 'test.message', 'n': 1}
+
+
+def test_receive_returns_copy(make_layer):
+    async def main():
+        layer = make_layer()
+        message = {'type': 'test.message', 'items': [1, 2]}
+        await layer.send('test-channel-1', message)
+        message['items'].append(3)
+        return await layer.receive('test-channel-1')
+
+    assert run(main())['items'] == [1, 2]
+
+
+def test_messages_in_order(make_layer):
+    async def main():
+        layer = make_layer()
+        for number in range(10):
+            await layer.send('test-channel-1', {'type': 'test', 'n': number})
+        return [
+            (await layer.receive('test-channel-1'))['n'] for _ in range(10)
+        ]
+
+    assert run(main()) == list(range(10))
+
+
+def test_receive_waits_for_send(make_layer):
+    async def main():
+        layer = make_layer()
+        receiving = asyncio.ensure_future(layer.receive('test-channel-1'))
+        await asyncio.sleep(0.05)
+        assert not receiving.done()
+        await layer.send('test-channel-1', {'type': 'test.message'})
+        return await asyncio.wait_for(receiving, 1)
+
+    assert run(main()) == {'type': 'test.message'}
+
+
+def test_send_capacity(make_layer):
+    async def main():
+        layer = make_layer(capacity=3)
+        for _ in range(3):
+            await layer.send('test-channel-1', {'type': 'test.message'})
+        with pytest.raises(ChannelFull):
+            await layer.send('test-channel-1', {'type': 'test.message'})
+        for _ in range(3):
+            await layer.receive('test-channel-1')
+        # После разбора очереди отправка снова проходит.
+        await layer.send('test-channel-1', {'type': 'test.message'})
+
+    run(main())
+
+
+def test_channel_capacity_patterns(make_broker_layer):
+    # InMemoryChannelLayer не компилирует channel_capacity и падает.
+    async def main():
+        layer = make_broker_layer(
+            capacity=3, channel_capacity={'limited.*': 1}
+        )
+        await layer.send('limited.channel', {'type': 'test.message'})
+        with pytest.raises(ChannelFull):
+            await layer.send('limited.channel', {'type': 'test.message'})
+        for _ in range(3):
+            await layer.send('other.channel', {'type': 'test.message'})
+
+    run(main())
+
+
+def test_config_mismatch_rejected(start_brokers):
+    shards = start_brokers(capacity=500)
+
+    async def main():
+        receiver = BrokerChannelLayer(shards=shards, capacity=500)
+        channel = await receiver.new_channel()
+        await receiver.group_add('test-group', channel)
+        with pytest.raises(ImproperlyConfigured):
+            await BrokerChannelLayer(shards=shards, capacity=2).group_send(
+                'test-group', {'type': 'test.message'}
+            )
+        # Ёмкость канала задаёт брокер, а не отправитель.
+        sender = BrokerChannelLayer(shards=shards, capacity=500)
+        for number in range(5):
+            await sender.group_send(
+                'test-group', {'type': 'test.message', 'n': number}
+            )
+        return [(await receiver.receive(channel))['n'] for _ in range(5)]
+
+    assert run(main()) == list(range(5))
+
+
+def test_process_local_channels(make_layer):
+    async def main():
+        layer = make_layer()
+        first = await layer.new_channel()
+        second = await layer.new_channel()
+        assert first != second
+        assert '!' in first
+        layer.require_valid_channel_name(first)
+        await layer.send(first, {'type': 'test.message', 'to': 'first'})
+        await layer.send(second, {'type': 'test.message', 'to': 'second'})
+        return (
+            (await layer.receive(second))['to'],
+            (await layer.receive(first))['to'],
+        )
+
+    assert run(main()) == ('second', 'first')
+
+
+def test_concurrent_receivers_get_different_messages(make_layer):
+    async def main():
+        layer = make_layer()
+        receivers = [
+            asyncio.ensure_future(layer.receive('test-channel-1'))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        for number in range(3):
+            await layer.send('test-channel-1', {'type': 'test', 'n': number})
+        messages = await asyncio.wait_for(asyncio.gather(*receivers), 1)
+        return sorted(message['n'] for message in messages)
+
+    assert run(main()) == [0, 1, 2]
+
+
+def test_cancelled_receive_keeps_message(make_layer):
+    async def main():
+        layer = make_layer()
+        receiving = asyncio.ensure_future(layer.receive('test-channel-1'))
+        await asyncio.sleep(0.05)
+        receiving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await receiving
+        await layer.send('test-channel-1', {'type': 'test.message'})
+        return await asyncio.wait_for(layer.receive('test-channel-1'), 1)
+
+    assert run(main()) == {'type': 'test.message'}
+
+
+def test_groups(make_layer):
+    async def main():
+        layer = make_layer()
+        channels = [await layer.new_channel() for _ in range(3)]
+        await layer.group_add('test-group', channels[0])
+        await layer.group_add('test-group', channels[1])
+        await layer.group_add('other-group', channels[2])
+        await layer.group_discard('test-group', channels[1])
+        # Повторный discard и discard из несуществующей группы не ошибка.
+        await layer.group_discard('test-group', channels[1])
+        await layer.group_discard('missing-group', channels[1])
+        await layer.group_send('test-group', {'type': 'message.1'})
+
+        assert await asyncio.wait_for(layer.receive(channels[0]), 1) == {
+            'type': 'message.1'
+        }
+        await receive_nothing(layer, channels[1])
+        await receive_nothing(layer, channels[2])
+
+    run(main())
+
+
+def test_group_send_skips_full_channels(make_layer):
+    async def main():
+        layer = make_layer(capacity=2)
+        full = await layer.new_channel()
+        free = await layer.new_channel()
+        await layer.group_add('test-group', full)
+        await layer.group_add('test-group', free)
+        for number in range(3):
+            await layer.group_send('test-group', {'type': 'test', 'n': number})
+        assert [(await layer.receive(free))['n'] for _ in range(2)] == [0, 1]
+        await receive_nothing(layer, free)
+
+    run(main())
+
+
+def test_message_expiry(make_layer):
+    async def main():
+        layer = make_layer(expiry=0.1)
+        await layer.send('test-channel-1', {'type': 'test', 'n': 1})
+        await asyncio.sleep(0.2)
+        await layer.send('test-channel-1', {'type': 'test', 'n': 2})
+        return await layer.receive('test-channel-1')
+
+    assert run(main()) == {'type': 'test', 'n': 2}
+
+
+def test_expired_message_removes_channel_from_groups(make_layer):
+    async def main():
+        layer = make_layer(expiry=0.1)
+        channel = await layer.new_channel()
+        await layer.group_add('test-group', channel)
+        await layer.send(channel, {'type': 'test', 'n': 1})
+        await asyncio.sleep(0.2)
+        await receive_nothing(layer, channel)
+        await layer.group_send('test-group', {'type': 'test', 'n': 2})
+        await receive_nothing(layer, channel)
+
+    run(main())
+
+
+def test_flush(make_layer):
+    async def main():
+        layer = make_layer()
+        channel = await layer.new_channel()
+        await layer.group_add('test-group', channel)
+        await layer.send('test-channel-1', {'type': 'test.message'})
+        await layer.flush()
+        await receive_nothing(layer, 'test-channel-1')
+        await layer.group_send('test-group', {'type': 'test.message'})
+        await receive_nothing(layer, channel)
+
+    run(main())
+
+
+def test_validation(make_layer):
+    async def main():
+        layer = make_layer()
+        with pytest.raises(TypeError):
+            await layer.send('bad channel', {'type': 'test'})
+        with pytest.raises(TypeError):
+            await layer.group_add('bad group', 'test-channel-1')
+        with pytest.raises(AssertionError):
+            await layer.send('test-channel-1', 'not a dict')
+        with pytest.raises(AssertionError):
+            await layer.group_send('test-group', ['not a dict'])
+
+    run(main())
+
+
+# Подключения из закрытых циклов закрываются без цикла, и asyncio
+# предупреждает о незакрытом транспорте.
+@pytest.mark.filterwarnings('ignore::ResourceWarning')
+def test_works_from_sync_code(make_layer):
+    layer = make_layer()
+
+    # Каждый вызов async_to_sync идёт в своём event loop.
+    async_to_sync(layer.send)('test-channel-1', {'type': 'test.message'})
+    assert async_to_sync(layer.receive)('test-channel-1') == {
+        'type': 'test.message'
+    }
+
+
+@pytest.mark.filterwarnings('ignore::ResourceWarning')
+def test_connections_of_closed_loops_dropped(make_broker_layer):
+    layer = make_broker_layer()
+    async_to_sync(layer.send)('test-channel-1', {'type': 'test.message'})
+    (connections,) = layer._connections.values()
+    assert async_to_sync(layer.receive)('test-channel-1') == {
+        'type': 'test.message'
+    }
+    assert len(layer._connections) == 1
+    assert all(
+        connection.closed and connection.sock.fileno() == -1
+        for connection in connections.values()
+    )
+
+    async def main():
+        await layer.send('test-channel-1', {'type': 'test.message'})
+        await layer.close()
+
+    run(main())
+    assert not layer._connections
+
+
+def test_group_expiry(make_broker_layer):
+    async def main():
+        layer = make_broker_layer(group_expiry=0.1)
+        channel = await layer.new_channel()
+        await layer.group_add('test-group', channel)
+        await asyncio.sleep(0.2)
+        await layer.group_send('test-group', {'type': 'test.message'})
+        await receive_nothing(layer, channel)
+
+    run(main())
+
+
+def test_group_spans_layers_and_shards(make_broker_layer):
+    async def main():
+        # Разные экземпляры слоя ведут себя как разные процессы: у
+        # каждого свой префикс каналов и свои подключения.
+        layers = [make_broker_layer() for _ in range(8)]
+        channels = [await layer.new_channel() for layer in layers]
+        shards = {layer.get_shard(channel)
+                  for layer, channel in zip(layers, channels)}
+        assert shards == {0, 1}
+        for channel in channels:
+            await layers[0].group_add('test-group', channel)
+        await layers[-1].group_send('test-group', {'type': 'test.message'})
+        return [
+            await asyncio.wait_for(layer.receive(channel), 1)
+            for layer, channel in zip(layers, channels)
+        ]
+
+    assert run(main()) == [{'type': 'test.message'}] * 8
+
+
+def test_broker_restart(socket_dir):
+    path = str(socket_dir / 'restart.sock')
+    layer = BrokerChannelLayer(shards=[path])
+
+    async def main():
+        broker = BrokerThread([path])
+        broker.start()
+        broker.started.wait(5)
+        await layer.send('test-channel-1', {'type': 'test.message'})
+        broker.stop()
+        with pytest.raises(ConnectionError):
+            await layer.receive('test-channel-1')
+
+        broker = BrokerThread([path])
+        broker.start()
+        broker.started.wait(5)
+        try:
+            await layer.send('test-channel-1', {'type': 'test.message'})
+            return await layer.receive('test-channel-1')
+        finally:
+            broker.stop()
+
+    assert run(main()) == {'type': 'test.message'}
+
+
+def receive_in_process(shards, channel, group, queue):
+    async def main():
+        layer = BrokerChannelLayer(shards=shards)
+        local = await layer.new_channel()
+        await layer.group_add(group, local)
+        queue.put('ready')
+        message = await layer.receive(local)
+        await layer.send(channel, {'type': 'reply', 'got': message['n']})
+
+    asyncio.run(main())
+
+
+def test_fan_out_across_processes(start_brokers):
+    shards = start_brokers(2)
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    processes = [
+        context.Process(
+            target=receive_in_process,
+            args=(shards, 'replies', 'test-group', ready)
+        )
+        for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+
+    async def main():
+        layer = BrokerChannelLayer(shards=shards)
+        await layer.group_send('test-group', {'type': 'test', 'n': 7})
+        return [
+            await asyncio.wait_for(layer.receive('replies'), 5)
+            for _ in processes
+        ]
+
+    try:
+        for _ in processes:
+            assert ready.get(timeout=30) == 'ready'
+        assert run(main()) == [{'type': 'reply', 'got': 7}] * 3
+    finally:
+        for process in processes:
+            process.join(5)
+            process.kill()
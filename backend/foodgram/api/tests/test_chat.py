@@ -0,0 +1,276 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api import chat
+from api.routing import websocket_urlpatterns
+from recipes.models import ChatMessage
+
+
+@pytest.fixture(autouse=True)
+def clean_history():
+    chat.history.rooms.clear()
+    chat.archive.pending.clear()
+    yield
+    chat.history.rooms.clear()
+    chat.archive.pending.clear()
+
+
+async def connect(path, user=None):
+    communicator = WebsocketCommunicator(
+        URLRouter(websocket_urlpatterns), path
+    )
+    communicator.scope['user'] = user or AnonymousUser()
+    connected, code = await communicator.connect()
+    assert connected, code
+    return communicator
+
+
+async def send(communicator, text):
+    await communicator.send_json_to({'message': text})
+
+
+async def receive_messages(communicator, count):
+    return [
+        (await communicator.receive_json_from())['message']
+        for _ in range(count)
+    ]
+
+
+def test_history_replayed_on_connect(user):
+    async def main():
+        first = await connect('/ws/chat/kitchen/', user)
+        for text in ('раз', 'два', 'три'):
+            await send(first, text)
+        assert await receive_messages(first, 3) == ['раз', 'два', 'три']
+
+        second = await connect('/ws/chat/kitchen/')
+        replayed = [await second.receive_json_from() for _ in range(3)]
+        assert [message['message'] for message in replayed] == [
+            'раз', 'два', 'три'
+        ]
+        assert replayed[0]['user'] == user.email
+        assert await second.receive_nothing()
+
+        await send(second, 'четыре')
+        assert await receive_messages(first, 1) == ['четыре']
+        assert await receive_messages(second, 1) == ['четыре']
+        for communicator in (first, second):
+            await communicator.disconnect()
+
+    async_to_sync(main)()
+
+
+def test_rooms_are_isolated():
+    async def main():
+        kitchen = await connect('/ws/chat/kitchen/')
+        garden = await connect('/ws/chat/garden/')
+        await send(kitchen, 'привет')
+        assert await receive_messages(kitchen, 1) == ['привет']
+        assert await garden.receive_nothing()
+
+        # Старый адрес без комнаты ведёт в общую комнату.
+        general = await connect('/ws/chat/')
+        assert await general.receive_nothing()
+        for communicator in (kitchen, garden, general):
+            await communicator.disconnect()
+
+    async_to_sync(main)()
+
+
+def test_recipe_rooms(recipe):
+    async def main():
+        communicator = await connect(f'/ws/recipes/{recipe.id}/chat/')
+        await send(communicator, 'вкусно')
+        assert await receive_messages(communicator, 1) == ['вкусно']
+        assert chat.history.get(f'recipe-{recipe.id}')[0]['message'] == (
+            'вкусно'
+        )
+        await communicator.disconnect()
+
+        missing = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f'/ws/recipes/{recipe.id + 1000}/chat/'
+        )
+        missing.scope['user'] = AnonymousUser()
+        connected, code = await missing.connect()
+        assert not connected
+        assert code == 4404
+
+    async_to_sync(main)()
+
+
+def test_recipe_prefix_reserved(recipe):
+    async def main():
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/chat/recipe-{recipe.id}/'
+        )
+        communicator.scope['user'] = AnonymousUser()
+        connected, code = await communicator.connect()
+        assert not connected
+        assert code == 4404
+
+    async_to_sync(main)()
+
+
+def test_oversized_frame_closes_connection(settings):
+    settings.CHAT_MAX_FRAME_SIZE = 100
+
+    async def main():
+        communicator = await connect('/ws/chat/kitchen/')
+        await communicator.send_to(text_data='{"message": "' + 'я' * 200)
+        output = await communicator.receive_output()
+        assert output == {'type': 'websocket.close', 'code': 1009}
+
+    async_to_sync(main)()
+
+
+def test_rate_limit(settings):
+    settings.CHAT_RATE_LIMIT = 0.01
+    settings.CHAT_BURST = 2
+
+    async def main():
+        communicator = await connect('/ws/chat/kitchen/')
+        for text in ('раз', 'два', 'три'):
+            await send(communicator, text)
+        frames = [await communicator.receive_json_from() for _ in range(3)]
+        await communicator.disconnect()
+        return frames
+
+    frames = async_to_sync(main)()
+    assert [frame.get('message') for frame in frames[:2]] == ['раз', 'два']
+    assert 'error' in frames[2]
+
+
+@pytest.mark.parametrize('text', ['не json', '[1, 2]', '{"message": ""}'])
+def test_invalid_frames(text):
+    async def main():
+        communicator = await connect('/ws/chat/kitchen/')
+        await communicator.send_to(text_data=text)
+        frame = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return frame
+
+    assert 'error' in async_to_sync(main)()
+    assert chat.history.get('kitchen') == []
+
+
+def test_room_history_is_bounded():
+    history = chat.RoomHistory(size=3, max_rooms=2)
+    for number in range(5):
+        history.add('kitchen', {'id': str(number)})
+    # Один и тот же message от разных сокетов процесса — одна запись.
+    history.add('kitchen', {'id': '4'})
+    assert [message['id'] for message in history.get('kitchen')] == [
+        '2', '3', '4'
+    ]
+
+    history.add('garden', {'id': 'g'})
+    history.add('kitchen', {'id': '5'})
+    history.add('bath', {'id': 'b'})
+    # Вытесняется комната, в которую дольше всех не писали.
+    assert 'garden' not in history
+    assert 'kitchen' in history
+
+
+def test_loaded_history_keeps_arrived_messages():
+    history = chat.RoomHistory(size=3, max_rooms=2)
+    # Сообщение пришло в комнату, пока история читалась из БД.
+    history.add('kitchen', {'id': 'new'})
+    history.load('kitchen', [{'id': 'db-1'}, {'id': 'db-2'}, {'id': 'db-3'}])
+    assert [message['id'] for message in history.get('kitchen')] == [
+        'db-2', 'db-3', 'new'
+    ]
+
+
+def test_archive_writes_in_one_batch(user):
+    archive = chat.ChatArchive()
+
+    async def add():
+        for number in range(5):
+            archive.add('kitchen', user.pk, {
+                'user': user.email,
+                'message': f'сообщение {number}',
+                'sent_at': f'2026-10-18T10:00:0{number}+00:00',
+            })
+
+    async_to_sync(add)()
+    assert not ChatMessage.objects.exists()
+    with CaptureQueriesContext(connection) as context:
+        assert async_to_sync(archive.flush)() == 5
+    assert len(context.captured_queries) == 1
+    assert list(ChatMessage.objects.values_list('text', flat=True)) == [
+        f'сообщение {number}' for number in range(5)
+    ]
+
+
+def test_persisted_history_loaded_for_cold_room(settings, user):
+    settings.CHAT_PERSIST = True
+    settings.CHAT_FLUSH_INTERVAL = 60
+
+    async def main():
+        first = await connect('/ws/chat/kitchen/', user)
+        for text in ('раз', 'два'):
+            await send(first, text)
+        await receive_messages(first, 2)
+        await first.disconnect()
+        await chat.archive.flush()
+
+        # Как будто сообщения писал другой процесс.
+        chat.history.rooms.clear()
+        second = await connect('/ws/chat/kitchen/')
+        return await receive_messages(second, 2)
+
+    assert async_to_sync(main)() == ['раз', 'два']
+    assert ChatMessage.objects.filter(user=user).count() == 2
+
+
+def test_archive_flushes_in_background(settings, user):
+    settings.CHAT_PERSIST = True
+    settings.CHAT_FLUSH_INTERVAL = 0.05
+
+    async def main():
+        communicator = await connect('/ws/chat/kitchen/', user)
+        await send(communicator, 'сохрани')
+        await receive_messages(communicator, 1)
+        await asyncio.sleep(0.2)
+        await communicator.disconnect()
+
+    async_to_sync(main)()
+    assert ChatMessage.objects.get().text == 'сохрани'
+
+
+@pytest.mark.parametrize('persist', [False, True])
+def test_history_from_database_with_many_workers(settings, user, persist):
+    settings.ASGI_WORKERS = 2
+    settings.CHAT_PERSIST = persist
+    settings.CHAT_FLUSH_INTERVAL = 60
+
+    async def main():
+        first = await connect('/ws/chat/kitchen/', user)
+        await send(first, 'раз')
+        await receive_messages(first, 1)
+        await chat.archive.flush()
+        # Сообщение другого воркера этот процесс не доставлял.
+        await database_sync_to_async(ChatMessage.objects.create)(
+            room='kitchen',
+            user_label='b@example.com',
+            text='два',
+            sent_at=timezone.now(),
+        )
+        second = await connect('/ws/chat/kitchen/')
+        if persist:
+            assert await receive_messages(second, 2) == ['раз', 'два']
+        assert await second.receive_nothing()
+        for communicator in (first, second):
+            await communicator.disconnect()
+
+    async_to_sync(main)()
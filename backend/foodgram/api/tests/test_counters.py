@@ -0,0 +1,221 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_favorite_and_cart_counters(authenticated_client, recipe):
+    favorite_url = reverse('recipes-favorite', args=[recipe.id])
+    cart_url = reverse('recipes-shopping-cart', args=[recipe.id])
+
+    authenticated_client.post(favorite_url)
+    authenticated_client.post(cart_url)
+    recipe.refresh_from_db()
+    assert (recipe.favorites_count, recipe.shopping_cart_count) == (1, 1)
+
+    authenticated_client.delete(favorite_url)
+    response = authenticated_client.delete(favorite_url)
+    recipe.refresh_from_db()
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert (recipe.favorites_count, recipe.shopping_cart_count) == (0, 1)
+
+
+@pytest.mark.django_db
+def test_recipes_count(authenticated_client, user, recipe_data):
+    response = authenticated_client.post(
+        reverse('recipes-list'), recipe_data, format='json'
+    )
+    user.refresh_from_db()
+    assert user.recipes_count == 1
+
+    authenticated_client.delete(
+        reverse('recipes-detail', args=[response.data['id']])
+    )
+    user.refresh_from_db()
+    assert user.recipes_count == 0
+
+
+@pytest.mark.django_db
+def test_subscriptions_use_recipes_count(authenticated_client, user, author,
+                                         recipe):
+    author.followers.create(user=user)
+    User.objects.filter(pk=author.pk).update(recipes_count=1)
+
+    response = authenticated_client.get(reverse('users-subscriptions'))
+
+    assert response.data['results'][0]['recipes_count'] == 1
+
+
+@pytest.mark.django_db
+def test_recount_repairs_drift(user, author, recipe):
+    Favorite.objects.create(user=user, recipe=recipe)
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    Recipe.objects.filter(pk=recipe.pk).update(favorites_count=5)
+
+    call_command('recount')
+
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    assert recipe.favorites_count == 1
+    assert recipe.shopping_cart_count == 1
+    assert author.recipes_count == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_favorites(recipe):
+    if connection.vendor != 'postgresql':
+        pytest.skip('SQLite не допускает параллельной записи')
+
+    users = User.objects.bulk_create(
+        User(email=f'fan{number}@example.com', username=f'fan{number}')
+        for number in range(8)
+    )
+    url = reverse('recipes-favorite', args=[recipe.id])
+
+    def toggle(user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        try:
+            for method in (client.post, client.delete, client.post):
+                method(url)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(users)) as executor:
+        list(executor.map(toggle, users))
+
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == len(users)
+
+
+@pytest.mark.django_db
+def test_stale_save_keeps_counters(user, recipe):
+    stale = Recipe.objects.get(pk=recipe.pk)
+    Favorite.objects.create(user=user, recipe=recipe)
+    Recipe.objects.filter(pk=recipe.pk).update(favorites_count=1)
+
+    stale.name = 'Новое название'
+    stale.save()
+
+    recipe.refresh_from_db()
+    assert (recipe.name, recipe.favorites_count) == ('Новое название', 1)
+
+
+@pytest.mark.django_db
+def test_deleting_user_updates_counters(authenticated_client, user, author,
+                                        recipe):
+    authenticated_client.post(reverse('recipes-favorite', args=[recipe.id]))
+    authenticated_client.post(
+        reverse('recipes-shopping-cart', args=[recipe.id])
+    )
+    user.delete()
+
+    recipe.refresh_from_db()
+    assert (recipe.favorites_count, recipe.shopping_cart_count) == (0, 0)
+
+    # Рецепты удаляемого автора уходят вместе с ним.
+    author.delete()
+    assert not Recipe.objects.exists()
+
+
+@pytest.mark.django_db
+def test_orm_changes_update_counters(user, author, recipe):
+    # Так строки меняют админка и shell, в обход API.
+    author.refresh_from_db()
+    assert author.recipes_count == 1
+
+    favorite = Favorite.objects.create(user=user, recipe=recipe)
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    recipe.refresh_from_db()
+    assert (recipe.favorites_count, recipe.shopping_cart_count) == (1, 1)
+
+    favorite.delete()
+    ShoppingCart.objects.filter(user=user).delete()
+    recipe.refresh_from_db()
+    assert (recipe.favorites_count, recipe.shopping_cart_count) == (0, 0)
+
+    Recipe.objects.filter(pk=recipe.pk).delete()
+    author.refresh_from_db()
+    assert author.recipes_count == 0
+
+
+@pytest.mark.django_db
+def test_admin_updates_recipes_count(author, user, recipe_data, settings,
+                                     tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    admin = User.objects.create_superuser(
+        email='admin@example.com', username='admin', password='pass12345',
+        first_name='Админ', last_name='Админов'
+    )
+    client = Client()
+    client.force_login(admin)
+    image = base64.b64decode(recipe_data['image'].split(',')[1])
+
+    def add_recipe(name):
+        response = client.post(reverse('admin:recipes_recipe_add'), {
+            'name': name,
+            'author': author.pk,
+            'image': SimpleUploadedFile('test.png', image, 'image/png'),
+            'text': 'Описание',
+            'cooking_time': 10,
+            'ingredient_amounts-TOTAL_FORMS': 1,
+            'ingredient_amounts-INITIAL_FORMS': 0,
+            'ingredient_amounts-0-ingredient':
+                recipe_data['ingredients'][0]['id'],
+            'ingredient_amounts-0-amount': 10,
+        })
+        assert response.status_code == 302
+        return Recipe.objects.get(name=name)
+
+    def recipes_count(user):
+        user.refresh_from_db()
+        return user.recipes_count
+
+    recipes = [add_recipe(f'Рецепт {number}') for number in range(4)]
+    assert recipes_count(author) == 4
+
+    client.post(
+        reverse('admin:recipes_recipe_delete', args=[recipes[0].pk]),
+        {'post': 'yes'}
+    )
+    assert recipes_count(author) == 3
+
+    client.post(reverse('admin:recipes_recipe_changelist'), {
+        'action': 'delete_selected',
+        '_selected_action': [recipes[1].pk, recipes[2].pk],
+        'post': 'yes',
+    })
+    assert recipes_count(author) == 1
+
+    response = client.post(
+        reverse('admin:recipes_recipe_change', args=[recipes[3].pk]), {
+            'name': recipes[3].name,
+            'author': user.pk,
+            'text': 'Описание',
+            'cooking_time': 10,
+            'ingredient_amounts-TOTAL_FORMS': 1,
+            'ingredient_amounts-INITIAL_FORMS': 1,
+            'ingredient_amounts-0-id':
+                recipes[3].ingredient_amounts.get().pk,
+            'ingredient_amounts-0-recipe': recipes[3].pk,
+            'ingredient_amounts-0-ingredient':
+                recipe_data['ingredients'][0]['id'],
+            'ingredient_amounts-0-amount': 10,
+        }
+    )
+    assert response.status_code == 302
+    assert (recipes_count(author), recipes_count(user)) == (0, 1)
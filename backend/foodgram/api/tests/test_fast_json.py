@@ -0,0 +1,200 @@
+import io
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api import chat, consumers, fast_json, feed_push
+from api.routing import websocket_urlpatterns
+from users.models import Subscription
+
+
+User = get_user_model()
+
+DATA = {
+    'name': 'Борщ',
+    'lines': 'раз\u2028два\u2029три',
+    'amount': Decimal('1.50'),
+    'created': datetime(2026, 10, 18, 12, 30, 15, 123456, timezone.utc),
+    'id': uuid.UUID('12345678123456781234567812345678'),
+    'lazy': gettext_lazy('Рецепт'),
+    'tags': ('завтрак', 'обед'),
+    'nested': [{'cooking_time': 15, 'image': None, 'is_favorited': True}],
+}
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def backend(request, monkeypatch):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(fast_json, 'orjson', None)
+    return request.param
+
+
+def count_calls(monkeypatch, module, name):
+    calls = []
+    function = getattr(module, name)
+
+    def wrapper(*args):
+        calls.append(args)
+        return function(*args)
+
+    monkeypatch.setattr(module, name, wrapper)
+    return calls
+
+
+def test_renderer_matches_drf(backend):
+    assert fast_json.get_backend() == backend
+    assert fast_json.FastJSONRenderer().render(DATA) == (
+        JSONRenderer().render(DATA)
+    )
+    assert fast_json.FastJSONRenderer().render(None) == b''
+
+
+@pytest.mark.parametrize('value', [
+    float('nan'), float('inf'), Decimal('NaN'), [{'rating': float('-inf')}]
+])
+def test_nonfinite_floats_rejected(backend, value):
+    data = {'value': value, 'image': None}
+    with pytest.raises(ValueError):
+        JSONRenderer().render(data)
+    with pytest.raises(ValueError):
+        fast_json.FastJSONRenderer().render(data)
+    with pytest.raises(ValueError):
+        fast_json.dumps_text(data)
+
+
+def test_big_integers(backend):
+    data = {'big': 2 ** 70, 'negative': -2 ** 64, 'nested': [2 ** 100]}
+    rendered = JSONRenderer().render(data)
+    assert fast_json.FastJSONRenderer().render(data) == rendered
+    assert fast_json.dumps(data) == rendered
+    assert fast_json.dumps_text(data) == rendered.decode()
+
+
+def test_renderer_indent(backend):
+    rendered = fast_json.FastJSONRenderer().render(
+        {'a': [1]}, 'application/json; indent=2'
+    )
+    assert rendered == b'{\n  "a": [\n    1\n  ]\n}'
+
+
+def test_dumps_and_loads(backend):
+    text = fast_json.dumps_text(DATA)
+    assert text.encode() == fast_json.dumps(DATA)
+    assert fast_json.loads(text)['amount'] == 1.5
+    assert fast_json.loads(text.encode())['lazy'] == 'Рецепт'
+    with pytest.raises(ValueError):
+        fast_json.loads('{"message": ')
+
+
+def test_parser(backend):
+    parser = fast_json.FastJSONParser()
+    body = '{"name": "Борщ", "cooking_time": 15}'.encode()
+    assert parser.parse(io.BytesIO(body)) == {
+        'name': 'Борщ', 'cooking_time': 15
+    }
+    with pytest.raises(ParseError):
+        parser.parse(io.BytesIO(b'{"name": '))
+
+
+@pytest.mark.parametrize('number', [
+    str(2 ** 64 - 1), str(2 ** 64), str(-2 ** 63), str(-2 ** 63 - 1),
+    str(10 ** 30), '1e400',
+])
+def test_parsed_numbers_match_drf(backend, number):
+    body = f'{{"id": {number}, "ids": [{number}]}}'
+    expected = JSONParser().parse(io.BytesIO(body.encode()))
+    parsed = fast_json.FastJSONParser().parse(io.BytesIO(body.encode()))
+    assert parsed == expected
+    assert type(parsed['id']) is type(expected['id'])
+    assert fast_json.loads(body) == fast_json.loads(body.encode()) == (
+        expected
+    )
+
+
+def test_api_uses_fast_json(authenticated_client, recipe):
+    response = authenticated_client.get(reverse('recipes-list'))
+    assert isinstance(response.accepted_renderer, fast_json.FastJSONRenderer)
+    assert response['Content-Type'] == 'application/json'
+
+    response = authenticated_client.post(
+        reverse('recipes-list'), '{"broken": ',
+        content_type='application/json'
+    )
+    assert response.status_code == 400
+    assert 'JSON parse error' in response.data['detail']
+
+
+def test_chat_broadcast_encoded_once(monkeypatch):
+    chat.history.rooms.clear()
+    encoded = count_calls(monkeypatch, consumers, 'dumps_text')
+    decoded = count_calls(monkeypatch, consumers, 'loads')
+    layer = get_channel_layer()
+    group_send = layer.group_send
+    events = []
+
+    async def record(group, message):
+        events.append(message)
+        await group_send(group, message)
+
+    monkeypatch.setattr(layer, 'group_send', record)
+
+    async def main():
+        members = []
+        for _ in range(3):
+            communicator = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), '/ws/chat/encoding/'
+            )
+            communicator.scope['user'] = AnonymousUser()
+            assert (await communicator.connect())[0]
+            members.append(communicator)
+        await members[0].send_json_to({'message': 'привет'})
+        frames = [await member.receive_from() for member in members]
+        for member in members:
+            await member.disconnect()
+        return frames
+
+    frames = async_to_sync(main)()
+    assert len(set(frames)) == 1
+    assert fast_json.loads(frames[0])['message'] == 'привет'
+    assert len(encoded) == 1
+    (event,) = events
+    assert event == {
+        'type': 'chat_message',
+        'id': fast_json.loads(frames[0])['id'],
+        'text': frames[0],
+    }
+    # Кадр от клиента и один разбор для истории на все три сокета.
+    assert len(decoded) == 2
+    assert chat.history.get('encoding')[0]['message'] == 'привет'
+    chat.history.rooms.clear()
+
+
+def test_feed_push_encoded_once(monkeypatch, author, user):
+    followers = [user] + [
+        User.objects.create_user(
+            email=f'reader{number}@example.com', username=f'reader{number}',
+            first_name='Имя', last_name='Фамилия', password='pass12345'
+        )
+        for number in range(3)
+    ]
+    Subscription.objects.bulk_create(
+        Subscription(user=follower, author=author) for follower in followers
+    )
+    encoded = count_calls(monkeypatch, feed_push, 'dumps_text')
+    assert feed_push.push_recipe(author.pk, {'id': 1, 'name': 'Борщ'}) == 4
+    assert len(encoded) == 1
@@ -0,0 +1,155 @@
+import time
+from concurrent.futures import Future
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api import feed_push
+from api.routing import websocket_urlpatterns
+from users.models import Subscription
+
+
+User = get_user_model()
+
+
+class InlineExecutor:
+    """Выполняет рассылку сразу, в потоке, который её поставил."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+@pytest.fixture
+def inline_push(monkeypatch):
+    # Поток пула не видит незафиксированных данных теста, поэтому
+    # рассылка идёт в потоке теста, не закрывая его соединение.
+    monkeypatch.setattr(feed_push, '_get_executor', InlineExecutor)
+    monkeypatch.setattr(feed_push, 'close_old_connections', lambda: None)
+
+
+@pytest.fixture
+def make_users():
+    def make_users(count, prefix='follower'):
+        return User.objects.bulk_create(
+            User(
+                email=f'{prefix}{number}@example.com',
+                username=f'{prefix}{number}',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for number in range(count)
+        )
+    return make_users
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+
+async def connect(user):
+    communicator = WebsocketCommunicator(
+        URLRouter(websocket_urlpatterns), '/ws/feed/'
+    )
+    communicator.scope['user'] = user
+    connected, code = await communicator.connect()
+    return communicator, connected, code
+
+
+def test_anonymous_rejected():
+    async def main():
+        _, connected, code = await connect(AnonymousUser())
+        assert not connected
+        assert code == 4401
+
+    async_to_sync(main)()
+
+
+def test_followers_receive_new_recipe(
+    author, user, make_users, recipe_data, inline_push,
+    django_capture_on_commit_callbacks
+):
+    follower, stranger = make_users(2)
+    Subscription.objects.create(user=user, author=author)
+    Subscription.objects.create(user=follower, author=author)
+    client = APIClient()
+    client.force_authenticate(author)
+
+    def create_recipe():
+        with django_capture_on_commit_callbacks(execute=True):
+            return client.post(
+                reverse('recipes-list'), recipe_data, format='json'
+            )
+
+    async def main():
+        sockets = {}
+        for reader in (user, follower, stranger, author):
+            communicator, connected, _ = await connect(reader)
+            assert connected
+            sockets[reader.pk] = communicator
+        response = await database_sync_to_async(create_recipe)()
+        assert response.status_code == 201
+
+        for reader in (user, follower):
+            event = await sockets[reader.pk].receive_json_from()
+            assert event['event'] == 'new_recipe'
+            assert event['author'] == author.pk
+            assert event['recipe']['id'] == response.data['id']
+            assert set(event['recipe']) == {
+                'id', 'name', 'image', 'image_renditions', 'cooking_time'
+            }
+            assert event['recipe']['image'].startswith('http://testserver/')
+        for reader in (stranger, author):
+            assert await sockets[reader.pk].receive_nothing()
+        for communicator in sockets.values():
+            await communicator.disconnect()
+
+    async_to_sync(main)()
+
+
+def test_followers_read_in_chunks(settings, author, make_users):
+    settings.FEED_PUSH_CHUNK_SIZE = 2
+    followers = make_users(5)
+    Subscription.objects.bulk_create(
+        Subscription(user=follower, author=author) for follower in followers
+    )
+    Subscription.objects.create(user=make_users(1, 'other')[0],
+                                author=followers[0])
+
+    with CaptureQueriesContext(connection) as context:
+        sent = feed_push.push_recipe(author.pk, {'id': 1})
+    assert sent == 5
+    # 2 + 2 + 1: неполная пачка значит, что подписчиков больше нет.
+    assert len(context.captured_queries) == 3
+
+
+def test_create_does_not_wait_for_push(
+    monkeypatch, authenticated_client, user, recipe_data,
+    django_capture_on_commit_callbacks
+):
+    pushed = []
+
+    def slow_push(author_id, recipe, loop):
+        time.sleep(0.2)
+        pushed.append((author_id, recipe['name']))
+
+    monkeypatch.setattr(feed_push, 'push_recipe', slow_push)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(
+            reverse('recipes-list'), recipe_data, format='json'
+        )
+    assert response.status_code == 201
+    assert not pushed
+    feed_push.wait_for_feed_pushes(timeout=5)
+    assert pushed == [(user.pk, 'Тестовый рецепт')]
@@ -0,0 +1,145 @@
+import base64
+import io
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+
+from api.serializers import MAX_ENCODED_IMAGE_LENGTH
+from recipes.images import (
+    RENDITIONS, get_rendition_name, wait_for_renditions
+)
+from recipes.models import Recipe
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+
+def make_png(size=(2000, 1000)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def data_uri(content):
+    return 'data:image/png;base64,' + base64.b64encode(content).decode()
+
+
+def assert_renditions(name):
+    for rendition, size in RENDITIONS.items():
+        with default_storage.open(get_rendition_name(name, rendition)) as file:
+            image = Image.open(file)
+            assert image.format == 'WEBP'
+            assert max(image.size) == size
+
+
+@pytest.mark.django_db
+def test_recipe_upload_creates_renditions(
+    authenticated_client, recipe_data, django_capture_on_commit_callbacks
+):
+    recipe_data['image'] = data_uri(make_png())
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(
+            reverse('recipes-list'), recipe_data, format='json'
+        )
+    wait_for_renditions()
+
+    assert response.status_code == status.HTTP_201_CREATED
+    name = Recipe.objects.get(pk=response.data['id']).image.name
+    assert_renditions(name)
+    assert response.data['image_renditions']['thumbnail'].endswith(
+        get_rendition_name(name, 'thumbnail')
+    )
+
+
+@pytest.mark.django_db
+def test_feed_exposes_thumbnails(api_client, recipe):
+    response = api_client.get(reverse('recipes-list'))
+
+    result = response.data['results'][0]
+    assert set(result['image_renditions']) == set(RENDITIONS)
+    assert result['image_renditions']['card'].endswith(
+        'recipes/images/test.card.webp'
+    )
+    assert result['author']['avatar_renditions'] is None
+
+
+@pytest.mark.django_db
+def test_avatar_upload_creates_renditions(
+    authenticated_client, user, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.put(
+            reverse('users-avatar_action'),
+            {'avatar': data_uri(make_png((300, 300)))},
+            format='json'
+        )
+    wait_for_renditions()
+
+    assert response.status_code == status.HTTP_200_OK
+    user.refresh_from_db()
+    assert default_storage.exists(
+        get_rendition_name(user.avatar.name, 'thumbnail')
+    )
+
+
+@pytest.mark.django_db
+def test_oversized_image_rejected_before_decoding(authenticated_client,
+                                                  recipe_data):
+    recipe_data['image'] = (
+        'data:image/png;base64,' + 'A' * (MAX_ENCODED_IMAGE_LENGTH + 4)
+    )
+
+    response = authenticated_client.post(
+        reverse('recipes-list'), recipe_data, format='json'
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'image' in response.data
+
+
+@pytest.mark.django_db
+def test_wrapped_base64_accepted(authenticated_client, user):
+    # Как у base64 --wrap=76: перевод строки после каждых 76 символов.
+    response = authenticated_client.put(
+        reverse('users-avatar_action'),
+        {'avatar': 'data:image/png;base64,' + base64.encodebytes(
+            make_png((300, 300))
+        ).decode()},
+        format='json'
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    user.refresh_from_db()
+    with default_storage.open(user.avatar.name) as file:
+        assert Image.open(file).size == (300, 300)
+
+
+@pytest.mark.django_db
+def test_invalid_base64_rejected(authenticated_client, recipe_data):
+    recipe_data['image'] = 'data:image/png;base64,!!!!'
+
+    response = authenticated_client.post(
+        reverse('recipes-list'), recipe_data, format='json'
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_generate_renditions_command(recipe):
+    default_storage.save(recipe.image.name, ContentFile(make_png((64, 64))))
+
+    call_command('generate_renditions', verbosity=0)
+
+    assert all(
+        default_storage.exists(get_rendition_name(recipe.image.name, name))
+        for name in RENDITIONS
+    )
@@ -2,6 +2,8 @@ import pytest
 from django.urls import reverse
 from rest_framework import status
 
+from recipes.models import Ingredient
+
 
 @pytest.mark.django_db
 def test_ingredient_list(api_client, sample_ingredient):
@@ -22,3 +24,62 @@ def test_ingredient_search(api_client, sample_ingredient,
     assert response.status_code == status.HTTP_200_OK
     assert len(response.data) == 1
     assert response.data[0]['name'] == 'Соль'
+
+
+@pytest.mark.django_db
+def test_ingredient_search_prefix_before_substring(api_client):
+    Ingredient.objects.bulk_create([
+        Ingredient(name='Морская соль', measurement_unit='г'),
+        Ingredient(name='Соль', measurement_unit='г'),
+        Ingredient(name='Соленья', measurement_unit='г'),
+        Ingredient(name='Сахар', measurement_unit='г'),
+    ])
+    url = reverse('ingredients-list')
+
+    response = api_client.get(url, {'name': 'сол'})
+
+    assert [i['name'] for i in response.data] == [
+        'Соленья', 'Соль', 'Морская соль'
+    ]
+
+
+@pytest.mark.django_db
+def test_ingredient_search_limit(api_client):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Перец {number}', measurement_unit='г')
+        for number in range(10)
+    )
+    url = reverse('ingredients-list')
+
+    response = api_client.get(url, {'name': 'перец', 'limit': 3})
+
+    assert len(response.data) == 3
+
+
+@pytest.mark.django_db
+def test_ingredient_search_without_queries(api_client, sample_ingredient,
+                                           django_assert_num_queries):
+    url = reverse('ingredients-list')
+    api_client.get(url, {'name': 'с'})
+
+    with django_assert_num_queries(0):
+        response = api_client.get(url, {'name': 'са'})
+
+    assert response.data == [{
+        'id': sample_ingredient.id,
+        'name': 'Сахар',
+        'measurement_unit': 'г'
+    }]
+
+
+@pytest.mark.django_db
+def test_ingredient_index_rebuilt_on_change(api_client, sample_ingredient):
+    url = reverse('ingredients-list')
+    api_client.get(url, {'name': 'са'})
+
+    sample_ingredient.name = 'Сахарная пудра'
+    sample_ingredient.save()
+    Ingredient.objects.create(name='Сахарин', measurement_unit='г')
+    response = api_client.get(url, {'name': 'са'})
+
+    assert [i['name'] for i in response.data] == ['Сахарин', 'Сахарная пудра']
@@ -0,0 +1,114 @@
+import io
+import json
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from recipes.management.commands import load_ingredients
+from recipes.models import Ingredient
+
+
+DATA_DIR = settings.BASE_DIR.parent.parent / 'data'
+
+
+@pytest.fixture
+def ingredients_json(tmp_path):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(json.dumps([
+        {'name': 'Сахар', 'measurement_unit': 'г'},
+        {'name': 'Молоко', 'measurement_unit': 'мл'},
+        {'name': 'Молоко', 'measurement_unit': 'мл'},
+        {'name': 'Молоко', 'measurement_unit': 'г'},
+    ], ensure_ascii=False, indent=2), encoding='utf-8')
+    return path
+
+
+@pytest.mark.django_db
+def test_load_json_skips_existing_and_duplicates(ingredients_json,
+                                                 sample_ingredient):
+    call_command('load_ingredients', ingredients_json, batch_size=1)
+
+    assert sorted(Ingredient.objects.values_list(
+        'name', 'measurement_unit'
+    )) == [('Молоко', 'г'), ('Молоко', 'мл'), ('Сахар', 'г')]
+
+
+@pytest.mark.django_db
+def test_load_is_idempotent(ingredients_json):
+    call_command('load_ingredients', ingredients_json)
+    call_command('load_ingredients', ingredients_json)
+
+    assert Ingredient.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_load_refreshes_ingredient_index(api_client, ingredients_json):
+    url = reverse('ingredients-list')
+    api_client.get(url, {'name': 'мол'})
+
+    call_command('load_ingredients', ingredients_json)
+    response = api_client.get(url, {'name': 'мол'})
+
+    assert len(response.data) == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('file_name', ['ingredients.csv', 'ingredients.json'])
+def test_load_project_data(file_name):
+    path = DATA_DIR / file_name
+    if not path.exists():
+        pytest.skip(f'Нет файла с ингредиентами: {path}')
+
+    call_command('load_ingredients', path)
+
+    assert Ingredient.objects.count() == 2186
+
+
+@pytest.mark.django_db
+def test_load_unknown_format(tmp_path):
+    path = tmp_path / 'ingredients.xml'
+    path.write_text('<ingredients/>')
+
+    with pytest.raises(CommandError):
+        call_command('load_ingredients', path)
+
+
+@pytest.mark.django_db
+def test_load_skips_malformed_rows(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('Сахар,г\nСоль\n\nМука,г\n', encoding='utf-8')
+    stdout, stderr = io.StringIO(), io.StringIO()
+
+    call_command('load_ingredients', path, stdout=stdout, stderr=stderr)
+
+    assert sorted(Ingredient.objects.values_list('name', flat=True)) == [
+        'Мука', 'Сахар'
+    ]
+    assert 'Добавлено 2 ингредиентов из 2 строк' in stdout.getvalue()
+    assert 'Пропущено 1 строк' in stderr.getvalue()
+
+
+@pytest.mark.django_db
+def test_load_counts_only_inserted_rows(ingredients_json, monkeypatch):
+    read_json = load_ingredients.READERS['json']
+
+    def read_json_with_concurrent_insert(file):
+        for number, row in enumerate(read_json(file)):
+            if number == 1:
+                # Другой процесс успел добавить ингредиент из файла.
+                Ingredient.objects.create(
+                    name='Молоко', measurement_unit='мл'
+                )
+            yield row
+
+    monkeypatch.setitem(
+        load_ingredients.READERS, 'json', read_json_with_concurrent_insert
+    )
+    stdout = io.StringIO()
+    call_command('load_ingredients', ingredients_json, stdout=stdout)
+
+    assert Ingredient.objects.count() == 3
+    assert 'Добавлено 2 ингредиентов из 4 строк' in stdout.getvalue()
@@ -0,0 +1,125 @@
+import logging
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from hypothesis import given
+from hypothesis import strategies as st
+from rest_framework import status
+
+from api.metrics import SUB_BUCKETS, Histogram, metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def get_metric_lines(client, name):
+    response = client.get(reverse('metrics'))
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    return [
+        line for line in response.content.decode().splitlines()
+        if line.startswith(name)
+    ]
+
+
+@given(st.integers(min_value=0, max_value=2 ** 40))
+def test_histogram_bucket_contains_value(value):
+    index = Histogram.get_index(value)
+    upper = Histogram.get_upper_bound(index)
+    lower = Histogram.get_upper_bound(index - 1) if index else 0
+
+    assert lower <= value < upper
+    assert upper - lower <= max(1, value / SUB_BUCKETS)
+
+
+def test_histogram_is_bounded():
+    histogram = Histogram(100_000)
+    size = len(histogram.counts)
+
+    for value in (0, 5, 999, 10 ** 9):
+        histogram.record(value)
+
+    assert len(histogram.counts) == size
+    assert histogram.count == 4
+    # 1023 — граница корзины, в которую попадает 999.
+    assert histogram.get_cumulative([0, 5, 1023]) == [1, 2, 3]
+
+
+def test_recipe_list_is_recorded(api_client, recipe):
+    url = reverse('recipes-list')
+    queries = 0
+    for params in ({}, {'limit': 1}):
+        with CaptureQueriesContext(connection) as context:
+            api_client.get(url, params)
+        queries += len(context.captured_queries)
+
+    labels = 'view="recipes-list",method="GET"'
+    assert get_metric_lines(
+        api_client, f'foodgram_request_db_queries_sum{{{labels}}}'
+    ) == [
+        f'foodgram_request_db_queries_sum{{{labels}}} '
+        f'{queries}'
+    ]
+    assert get_metric_lines(
+        api_client, 'foodgram_request_render_duration_seconds_count'
+    ) == [
+        f'foodgram_request_render_duration_seconds_count{{{labels}}} 2'
+    ]
+
+
+def test_async_view_queries_are_recorded(api_client, recipe):
+    api_client.get(reverse('async-recipes-detail', args=[recipe.id]))
+
+    [line] = get_metric_lines(
+        api_client,
+        'foodgram_request_db_queries_sum{view="async-recipes-detail"'
+    )
+    assert int(line.rsplit(' ', 1)[1]) > 0
+
+
+def test_histogram_buckets_are_cumulative(api_client, recipe):
+    for _ in range(3):
+        api_client.get(reverse('recipes-detail', args=[recipe.id]))
+
+    lines = get_metric_lines(api_client, 'foodgram_request_duration_seconds')
+    counts = [
+        int(line.rsplit(' ', 1)[1]) for line in lines
+        if 'recipes-detail' in line and '_bucket' in line
+    ]
+    assert counts == sorted(counts)
+    assert counts[-1] == 3
+
+
+def test_unresolved_path_is_recorded(api_client):
+    api_client.get('/no-such-page/')
+
+    lines = get_metric_lines(api_client, 'foodgram_request_duration_seconds')
+    assert (
+        'foodgram_request_duration_seconds_count'
+        '{view="<unresolved>",method="GET"} 1'
+    ) in lines
+
+
+@override_settings(SLOW_REQUEST_THRESHOLD=0, SLOW_REQUEST_TOP_QUERIES=1)
+def test_slow_request_is_logged_with_top_query(api_client, recipe, caplog):
+    with caplog.at_level(logging.WARNING, logger='api.slow_requests'):
+        api_client.get(reverse('recipes-list'))
+
+    [record] = caplog.records
+    assert 'recipes-list' in record.getMessage()
+    assert record.getMessage().count('\n') == 1
+    assert 'SELECT' in record.getMessage()
+
+
+def test_slow_request_log_disabled_by_default(api_client, recipe, caplog):
+    with caplog.at_level(logging.WARNING, logger='api.slow_requests'):
+        api_client.get(reverse('recipes-list'))
+
+    assert not caplog.records
@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from recipes.models import Recipe
+from users.models import Subscription
+
+
+User = get_user_model()
+
+RECIPES_COUNT = 14
+
+
+@pytest.fixture
+def feed(author):
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            image='recipes/images/test.png',
+            text='Описание',
+            cooking_time=10
+        )
+        for number in range(RECIPES_COUNT)
+    )
+    # Половина рецептов с одинаковой датой: порядок внутри неё задаёт id.
+    published = timezone.now()
+    for number, recipe in enumerate(recipes):
+        recipe.pub_date = published - timedelta(minutes=number // 2)
+    Recipe.objects.bulk_update(recipes, ['pub_date'])
+    return Recipe.objects.order_by('-pub_date', '-id')
+
+
+def walk(client, url, params):
+    ids = []
+    while url:
+        response = client.get(url, params)
+        assert response.status_code == status.HTTP_200_OK
+        ids.extend(item['id'] for item in response.data['results'])
+        url, params = response.data['next'], None
+    return ids
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_walks_whole_feed(api_client, feed):
+    ids = walk(api_client, reverse('recipes-list'),
+               {'pagination': 'cursor', 'limit': 4})
+
+    assert ids == [recipe.id for recipe in feed]
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_skips_count(api_client, feed):
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get(
+            reverse('recipes-list'), {'pagination': 'cursor'}
+        )
+
+    assert 'count' not in response.data
+    assert len(response.data['results']) == 6
+    assert not any(
+        'COUNT(' in query['sql'] for query in context.captured_queries
+    )
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_approximate_count(api_client, feed):
+    response = api_client.get(
+        reverse('recipes-list'),
+        {'pagination': 'cursor', 'count': 'approximate'}
+    )
+
+    assert response.data['count'] == RECIPES_COUNT
+
+
+@pytest.mark.django_db
+def test_page_number_pagination_is_default(api_client, feed):
+    response = api_client.get(reverse('recipes-list'), {'page': 2})
+
+    assert response.data['count'] == RECIPES_COUNT
+    assert [item['id'] for item in response.data['results']] == [
+        recipe.id for recipe in feed[6:12]
+    ]
+
+
+@pytest.mark.django_db
+def test_subscriptions_cursor_pagination(authenticated_client, user):
+    authors = User.objects.bulk_create(
+        User(email=f'author{number}@example.com',
+             username=f'author{number}')
+        for number in range(5)
+    )
+    Subscription.objects.bulk_create(
+        Subscription(user=user, author=author) for author in authors
+    )
+
+    ids = walk(authenticated_client, reverse('users-subscriptions'),
+               {'pagination': 'cursor', 'limit': 2})
+
+    assert ids == sorted(author.id for author in authors)
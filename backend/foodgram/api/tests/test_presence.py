@@ -0,0 +1,242 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from channels.layers import InMemoryChannelLayer
+from channels.testing import WebsocketCommunicator
+
+from api import presence as presence_module
+from api.consumers import UserStatusConsumer
+from api.presence import Presence
+
+TICK = 0.05
+
+
+class Socket:
+    """Сокет, который только запоминает полученные кадры."""
+
+    def __init__(self):
+        self.frames = asyncio.Queue()
+
+    async def send(self, text_data):
+        await self.frames.put(json.loads(text_data))
+
+    async def next_frame(self, timeout=1):
+        return await asyncio.wait_for(self.frames.get(), timeout)
+
+    async def no_frames(self, timeout=TICK * 3):
+        await asyncio.sleep(timeout)
+        assert self.frames.empty()
+
+    async def settle(self):
+        """Дожидается конца тика и забывает всё полученное."""
+        await asyncio.sleep(TICK * 2)
+        while not self.frames.empty():
+            self.frames.get_nowait()
+
+
+class RestartingLayer(InMemoryChannelLayer):
+    """Слой в памяти, который умеет «перезапустить брокер»: забыть
+    группы и оборвать ожидающие receive."""
+
+    def __init__(self):
+        super().__init__()
+        self.waiters = set()
+
+    async def receive(self, channel):
+        waiter = asyncio.get_running_loop().create_future()
+        receive = asyncio.ensure_future(super().receive(channel))
+        self.waiters.add(waiter)
+        try:
+            await asyncio.wait(
+                {waiter, receive}, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            self.waiters.discard(waiter)
+            if not receive.done():
+                receive.cancel()
+        if not receive.done():
+            raise ConnectionError('Брокер перезапущен')
+        return receive.result()
+
+    async def restart(self):
+        await self.flush()
+        for waiter in self.waiters:
+            waiter.set_result(None)
+
+
+@pytest.fixture(autouse=True)
+def fast_tick(settings):
+    settings.PRESENCE_TICK = TICK
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_snapshot_on_connect():
+    async def main():
+        presence = Presence()
+        first, second = Socket(), Socket()
+        await presence.attach(first, 'a@example.com')
+        assert await first.next_frame() == {
+            'status': 'snapshot', 'users': ['a@example.com']
+        }
+        await presence.attach(second, 'b@example.com')
+        assert await second.next_frame() == {
+            'status': 'snapshot', 'users': ['a@example.com', 'b@example.com']
+        }
+
+    run(main())
+
+
+def test_diff_sent_once_per_tick():
+    async def main():
+        presence = Presence()
+        observer = Socket()
+        await presence.attach(observer, 'observer@example.com')
+        await observer.settle()
+
+        for number in range(50):
+            await presence.attach(Socket(), f'user{number}@example.com')
+        diff = await observer.next_frame()
+
+        assert diff['status'] == 'diff'
+        assert diff['left'] == []
+        assert len(diff['joined']) == 50
+        await observer.no_frames()
+
+    run(main())
+
+
+def test_tabs_of_one_user_are_counted():
+    async def main():
+        presence = Presence()
+        observer = Socket()
+        await presence.attach(observer, 'observer@example.com')
+        tabs = [Socket(), Socket()]
+        for tab in tabs:
+            await presence.attach(tab, 'a@example.com')
+        await observer.settle()
+
+        presence.detach(tabs[0], 'a@example.com')
+        await observer.no_frames()
+        presence.detach(tabs[1], 'a@example.com')
+        assert await observer.next_frame() == {
+            'status': 'diff', 'joined': [], 'left': ['a@example.com']
+        }
+        # Повторное отключение того же сокета ничего не ломает.
+        presence.detach(tabs[1], 'a@example.com')
+        assert presence.local == {'observer@example.com': 1}
+
+    run(main())
+
+
+def test_join_and_leave_within_tick_cancel_out():
+    async def main():
+        presence = Presence()
+        observer = Socket()
+        await presence.attach(observer, 'observer@example.com')
+        await observer.settle()
+
+        socket = Socket()
+        await presence.attach(socket, 'a@example.com')
+        presence.detach(socket, 'a@example.com')
+        await observer.no_frames()
+
+    run(main())
+
+
+def test_presence_shared_between_processes():
+    async def main():
+        # Два экземпляра Presence на одном слое ведут себя как два
+        # процесса: у каждого свой канал в группе присутствия.
+        first, second = Presence(), Presence()
+        first_socket, second_socket = Socket(), Socket()
+        await first.attach(first_socket, 'a@example.com')
+        await first_socket.settle()
+
+        await second.attach(second_socket, 'b@example.com')
+        snapshot = await second_socket.next_frame()
+        assert snapshot == {'status': 'snapshot', 'users': ['b@example.com']}
+        # Состояние первого процесса приходит в ответ на запрос второго.
+        # Дифф тика повторяет и то, что уже было в снимке: клиент
+        # применяет его как операции над множеством.
+        assert await second_socket.next_frame() == {
+            'status': 'diff',
+            'joined': ['a@example.com', 'b@example.com'],
+            'left': [],
+        }
+        assert await first_socket.next_frame() == {
+            'status': 'diff', 'joined': ['b@example.com'], 'left': []
+        }
+
+        # Вкладка того же пользователя в другом процессе — не выход.
+        extra = Socket()
+        await second.attach(extra, 'a@example.com')
+        await asyncio.sleep(TICK * 3)
+        first.detach(first_socket, 'a@example.com')
+        await second_socket.no_frames()
+        second.detach(extra, 'a@example.com')
+        assert await second_socket.next_frame() == {
+            'status': 'diff', 'joined': [], 'left': ['a@example.com']
+        }
+
+    run(main())
+
+
+def test_presence_recovers_after_broker_restart(monkeypatch, caplog):
+    layer = RestartingLayer()
+    monkeypatch.setattr(presence_module, 'get_channel_layer', lambda: layer)
+    monkeypatch.setattr(presence_module, 'RETRY_DELAY', TICK)
+
+    async def main():
+        first, second = Presence(), Presence()
+        first_socket, second_socket = Socket(), Socket()
+        await first.attach(first_socket, 'a@example.com')
+        await second.attach(second_socket, 'b@example.com')
+        await first_socket.settle()
+
+        await layer.restart()
+        await asyncio.sleep(TICK * 3)
+        assert 'Присутствие потеряло канальный слой' in caplog.text
+        # Оба процесса снова в группе и видят изменения друг друга.
+        await first_socket.settle()
+        await second.attach(Socket(), 'c@example.com')
+        assert await first_socket.next_frame() == {
+            'status': 'diff', 'joined': ['c@example.com'], 'left': []
+        }
+
+    run(main())
+
+
+def test_consumer_sends_snapshot_and_diffs():
+    user = SimpleNamespace(is_authenticated=True, email='a@example.com')
+
+    async def connect(scope_user):
+        communicator = WebsocketCommunicator(
+            UserStatusConsumer.as_asgi(), '/ws/status/'
+        )
+        communicator.scope['user'] = scope_user
+        connected, _ = await communicator.connect()
+        assert connected
+        return communicator
+
+    async def main():
+        first = await connect(user)
+        assert await first.receive_json_from() == {
+            'status': 'snapshot', 'users': ['a@example.com']
+        }
+        anonymous = await connect(SimpleNamespace(is_authenticated=False))
+        assert await anonymous.receive_json_from() == {
+            'status': 'snapshot', 'users': ['Anonymous', 'a@example.com']
+        }
+        await first.receive_json_from()
+        await anonymous.disconnect()
+        assert await first.receive_json_from() == {
+            'status': 'diff', 'joined': [], 'left': ['Anonymous']
+        }
+        await first.disconnect()
+
+    run(main())
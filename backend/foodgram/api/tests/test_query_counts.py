@@ -0,0 +1,152 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import Subscription
+from api.subscriptions import SubscriptionResolver
+
+
+User = get_user_model()
+
+RECIPES_COUNT = 30
+
+
+@pytest.fixture
+def many_authors(user):
+    authors = User.objects.bulk_create(
+        User(
+            email=f'author{number}@example.com',
+            username=f'author{number}',
+            first_name='Автор',
+            last_name=str(number)
+        )
+        for number in range(RECIPES_COUNT)
+    )
+    Subscription.objects.bulk_create(
+        Subscription(user=user, author=author) for author in authors[::2]
+    )
+    return authors
+
+
+@pytest.fixture
+def many_recipes(user, many_authors, sample_ingredient,
+                 second_sample_ingredient):
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {number}',
+            image='recipes/images/test.png',
+            text='Описание',
+            cooking_time=10
+        )
+        for number, author in enumerate(many_authors)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes
+        for ingredient in (sample_ingredient, second_sample_ingredient)
+    )
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::2]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::3]
+    )
+    return recipes
+
+
+def get_page_queries(client, url, limit):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, {'limit': limit})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data['results']) == limit
+    return response, [query['sql'] for query in context.captured_queries]
+
+
+def get_recipe_page_queries(client, limit):
+    return get_page_queries(client, reverse('recipes-list'), limit)
+
+
+@pytest.mark.django_db
+def test_recipe_page_query_count_does_not_grow_with_page(
+        authenticated_client, many_recipes):
+    _, small_page = get_recipe_page_queries(authenticated_client, 3)
+    _, large_page = get_recipe_page_queries(authenticated_client, 25)
+
+    assert len(small_page) == len(large_page) == 4
+    assert not any(
+        sql.startswith(('SELECT 1 AS "a" FROM "recipes_favorite"',
+                        'SELECT 1 AS "a" FROM "recipes_shoppingcart"'))
+        for sql in large_page
+    )
+
+
+@pytest.mark.django_db
+def test_recipe_flags_match_relations(authenticated_client, user,
+                                      many_recipes):
+    response, _ = get_recipe_page_queries(authenticated_client, 25)
+
+    favorited = set(
+        user.favorites.values_list('recipe_id', flat=True)
+    )
+    in_cart = set(
+        user.shopping_cart.values_list('recipe_id', flat=True)
+    )
+    for recipe in response.data['results']:
+        assert recipe['is_favorited'] == (recipe['id'] in favorited)
+        assert recipe['is_in_shopping_cart'] == (recipe['id'] in in_cart)
+
+
+@pytest.mark.django_db
+def test_recipe_detail_uses_annotations(authenticated_client, user, recipe,
+                                        django_assert_max_num_queries):
+    Favorite.objects.create(user=user, recipe=recipe)
+    url = reverse('recipes-detail', args=[recipe.id])
+
+    with django_assert_max_num_queries(3):
+        response = authenticated_client.get(url)
+
+    assert response.data['is_favorited'] is True
+    assert response.data['is_in_shopping_cart'] is False
+
+
+@pytest.mark.django_db
+def test_recipe_authors_is_subscribed(authenticated_client, user,
+                                      many_recipes):
+    response, _ = get_recipe_page_queries(authenticated_client, 25)
+
+    following = set(user.following.values_list('author_id', flat=True))
+    for recipe in response.data['results']:
+        assert recipe['author']['is_subscribed'] == (
+            recipe['author']['id'] in following
+        )
+
+
+@pytest.mark.django_db
+def test_user_list_query_count_does_not_grow_with_page(
+        authenticated_client, user, many_authors):
+    url = reverse('users-list')
+    _, small_page = get_page_queries(authenticated_client, url, 3)
+    response, large_page = get_page_queries(authenticated_client, url, 25)
+
+    following = set(user.following.values_list('author_id', flat=True))
+    assert len(small_page) == len(large_page)
+    for author in response.data['results']:
+        assert author['is_subscribed'] == (author['id'] in following)
+
+
+@pytest.mark.django_db
+def test_resolver_uses_in_query_for_large_follow_graph(
+        user, many_authors, django_assert_num_queries):
+    resolver = SubscriptionResolver(user, set_limit=5)
+    page = [author.id for author in many_authors[:10]]
+    resolver.prime(page)
+
+    with django_assert_num_queries(2):
+        flags = [resolver.is_subscribed(author_id) for author_id in page]
+
+    assert flags == [number % 2 == 0 for number in range(10)]
@@ -0,0 +1,115 @@
+import re
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+
+
+User = get_user_model()
+
+# Строка плана SQLite вида "SCAN recipes_recipe" без индекса.
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN \S+$', re.MULTILINE)
+
+
+def explain(queryset):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # На маленьких тестовых таблицах планировщик всегда выберет
+            # Seq Scan, поэтому проверяем лишь, что индекс применим.
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                return queryset.explain()
+            finally:
+                cursor.execute('RESET enable_seqscan')
+    return queryset.explain()
+
+
+def assert_uses_indexes(queryset):
+    plan = explain(queryset)
+    if connection.vendor == 'postgresql':
+        assert 'Seq Scan' not in plan, plan
+    else:
+        assert not SQLITE_FULL_SCAN.search(plan), plan
+    return plan
+
+
+def feed(user=None):
+    queryset = Recipe.objects.order_by('-pub_date')
+    if user is not None:
+        queryset = queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+        )
+    return queryset[:6]
+
+
+@pytest.mark.django_db
+def test_feed_ordered_by_index():
+    plan = assert_uses_indexes(feed())
+
+    assert 'recipe_pub_date_idx' in plan
+
+
+@pytest.mark.django_db
+def test_feed_flags_use_indexes(user):
+    assert_uses_indexes(feed(user))
+
+
+@pytest.mark.django_db
+def test_feed_filtered_by_author_uses_index(user):
+    assert_uses_indexes(Recipe.objects.filter(author=user).order_by(
+        '-pub_date'
+    ))
+
+
+@pytest.mark.django_db
+def test_favorite_and_cart_filters_use_indexes(user):
+    assert_uses_indexes(Recipe.objects.filter(favorited_by__user=user))
+    assert_uses_indexes(Recipe.objects.filter(in_shopping_carts__user=user))
+
+
+@pytest.mark.django_db
+def test_recipe_relations_reverse_lookup_uses_index(recipe):
+    plan = assert_uses_indexes(
+        Favorite.objects.filter(recipe=recipe).values('user_id')
+    )
+
+    assert 'favorite_recipe_user_idx' in plan
+
+
+@pytest.mark.django_db
+def test_subscriptions_use_indexes(user):
+    assert_uses_indexes(User.objects.filter(followers__user=user))
+    plan = assert_uses_indexes(
+        user.followers.values('user_id')
+    )
+
+    assert 'subscription_author_user_idx' in plan
+
+
+@pytest.mark.django_db
+def test_ingredient_prefix_search_uses_index():
+    if connection.vendor != 'postgresql':
+        pytest.skip('Индекс по UPPER(name) с text_pattern_ops есть '
+                    'только в PostgreSQL')
+
+    plan = assert_uses_indexes(
+        Ingredient.objects.filter(name__istartswith='сах')
+    )
+
+    assert 'ingredient_upper_name_like_idx' in plan
+
+
+@pytest.mark.django_db
+def test_ingredient_unique_name_and_unit(sample_ingredient):
+    assert_uses_indexes(Ingredient.objects.filter(
+        name=sample_ingredient.name,
+        measurement_unit=sample_ingredient.measurement_unit
+    ))
@@ -0,0 +1,142 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, RecipeIngredient, ShoppingCart
+from users.models import Subscription
+
+
+@pytest.mark.django_db
+def test_anonymous_page_served_from_cache(api_client, recipe,
+                                          django_assert_num_queries):
+    url = reverse('recipes-list')
+    first = api_client.get(url)
+
+    with django_assert_num_queries(0):
+        second = api_client.get(url)
+
+    assert second.status_code == status.HTTP_200_OK
+    assert second.data == first.data
+
+
+@pytest.mark.django_db
+def test_cache_key_depends_on_page_params(api_client, recipe):
+    url = reverse('recipes-list')
+    api_client.get(url)
+
+    response = api_client.get(url, {'author': recipe.author.id + 1})
+
+    assert response.data['count'] == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('first,second', [
+    ('async-recipes-list', 'recipes-list'),
+    ('recipes-list', 'async-recipes-list'),
+])
+def test_cache_key_depends_on_path(api_client, recipe, first, second):
+    recipe.author.recipes.create(
+        name='Второй рецепт', image='recipes/images/test.png',
+        text='Описание', cooking_time=5
+    )
+    for name in (first, second):
+        url = reverse(name)
+        response = api_client.get(url, {'limit': 1})
+        assert response.json()['next'].startswith(
+            f'http://testserver{url}?'
+        )
+
+
+@pytest.mark.django_db
+def test_recipe_save_invalidates_cache(api_client, recipe):
+    url = reverse('recipes-list')
+    api_client.get(url)
+
+    recipe.name = 'Новое название'
+    recipe.save()
+    response = api_client.get(url)
+
+    assert response.data['results'][0]['name'] == 'Новое название'
+
+
+@pytest.mark.django_db
+def test_recipe_ingredient_change_invalidates_cache(
+        api_client, recipe, second_sample_ingredient):
+    url = reverse('recipes-list')
+    api_client.get(url)
+
+    RecipeIngredient.objects.create(
+        recipe=recipe, ingredient=second_sample_ingredient, amount=5
+    )
+    response = api_client.get(url)
+
+    assert len(response.data['results'][0]['ingredients']) == 2
+
+
+@pytest.mark.django_db
+def test_authenticated_flags_overlay_cached_page(
+        authenticated_client, user, recipe):
+    api_client = APIClient()
+    url = reverse('recipes-list')
+    api_client.get(url)
+    Favorite.objects.create(user=user, recipe=recipe)
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    Subscription.objects.create(user=user, author=recipe.author)
+
+    personal = authenticated_client.get(url).data['results'][0]
+    anonymous = api_client.get(url).data['results'][0]
+
+    assert personal['is_favorited'] is True
+    assert personal['is_in_shopping_cart'] is True
+    assert personal['author']['is_subscribed'] is True
+    assert anonymous['is_favorited'] is False
+    assert anonymous['is_in_shopping_cart'] is False
+    assert anonymous['author']['is_subscribed'] is False
+
+
+@pytest.mark.django_db
+def test_authenticated_miss_stores_anonymous_page(
+        authenticated_client, user, recipe, django_assert_num_queries):
+    api_client = APIClient()
+    url = reverse('recipes-list')
+    Favorite.objects.create(user=user, recipe=recipe)
+
+    personal = authenticated_client.get(url).data['results'][0]
+    with django_assert_num_queries(0):
+        anonymous = api_client.get(url).data['results'][0]
+
+    assert personal['is_favorited'] is True
+    assert anonymous['is_favorited'] is False
+
+
+@pytest.mark.django_db
+def test_user_filters_bypass_cache(authenticated_client, user, recipe):
+    url = reverse('recipes-list')
+    authenticated_client.get(url)
+
+    response = authenticated_client.get(url, {'is_favorited': 1})
+
+    assert response.data['count'] == 0
+
+
+@pytest.mark.django_db
+def test_file_based_cache_backend(settings, tmp_path, api_client, recipe,
+                                  django_assert_num_queries):
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path),
+        }
+    }
+    url = reverse('recipes-list')
+    api_client.get(url)
+
+    with django_assert_num_queries(0):
+        cached = api_client.get(url)
+    recipe.name = 'Новое название'
+    recipe.save()
+    fresh = api_client.get(url)
+
+    assert cached.data['results'][0]['name'] == 'Рецепт автора'
+    assert fresh.data['results'][0]['name'] == 'Новое название'
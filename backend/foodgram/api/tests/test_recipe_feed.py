@@ -0,0 +1,100 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.recipe_feed import get_recipe_rows, serialize_recipe_rows
+from api.serializers import RecipeSerializer
+from api.views import get_recipe_queryset
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import Subscription
+
+
+@pytest.fixture
+def feed(user, author, recipe, sample_ingredient, second_sample_ingredient):
+    author.avatar = 'users/avatars/author.png'
+    author.save()
+    recipes = [recipe] + [
+        Recipe.objects.create(
+            author=recipe_author,
+            name=f'Рецепт {number}',
+            image=image,
+            text='Описание\nв две строки',
+            cooking_time=number + 1
+        )
+        for number, (recipe_author, image) in enumerate([
+            (user, 'recipes/images/пирог.png'),
+            (author, ''),
+            (user, 'recipes/images/суп.jpg'),
+        ])
+    ]
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(
+            recipe=recipes[1], ingredient=second_sample_ingredient, amount=2
+        ),
+        RecipeIngredient(
+            recipe=recipes[1], ingredient=sample_ingredient, amount=30
+        ),
+        RecipeIngredient(
+            recipe=recipes[2], ingredient=sample_ingredient, amount=1
+        ),
+    ])
+    Favorite.objects.create(user=user, recipe=recipes[1])
+    ShoppingCart.objects.create(user=user, recipe=recipes[2])
+    Subscription.objects.create(user=user, author=author)
+    return recipes
+
+
+def make_request(user):
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = user
+    return request
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', [False, True])
+def test_matches_recipe_serializer_byte_for_byte(feed, user, authenticated):
+    request = make_request(user if authenticated else AnonymousUser())
+    queryset = get_recipe_queryset(request.user)
+
+    expected = JSONRenderer().render(RecipeSerializer(
+        queryset, many=True, context={'request': request}
+    ).data)
+    actual = JSONRenderer().render(
+        serialize_recipe_rows(get_recipe_rows(queryset), request)
+    )
+
+    assert actual == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {'limit': 2},
+    {'limit': 2, 'page': 2},
+    {'limit': 2, 'pagination': 'cursor'},
+    {'is_favorited': 1},
+])
+def test_feed_pages_match_recipe_serializer(
+        authenticated_client, feed, user, params
+):
+    response = authenticated_client.get(reverse('recipes-list'), params)
+    request = make_request(user)
+    expected = RecipeSerializer(
+        get_recipe_queryset(user).filter(
+            pk__in=[recipe['id'] for recipe in response.data['results']]
+        ),
+        many=True, context={'request': request}
+    ).data
+
+    assert JSONRenderer().render(response.data['results']) == (
+        JSONRenderer().render(expected)
+    )
+
+
+@pytest.mark.django_db
+def test_empty_page(api_client):
+    response = api_client.get(reverse('recipes-list'))
+
+    assert response.data['results'] == []
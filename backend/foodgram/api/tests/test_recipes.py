@@ -1,7 +1,19 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 
+from recipes.models import Ingredient, RecipeIngredient
+
+
+def update_data(recipe_data, ingredients):
+    data = {
+        key: value for key, value in recipe_data.items() if key != 'image'
+    }
+    data['ingredients'] = ingredients
+    return data
+
 
 @pytest.mark.django_db
 def test_create_recipe_authenticated(authenticated_client, recipe_data):
@@ -32,3 +44,61 @@ def test_get_recipes_list(api_client, authenticated_client, recipe_data):
     assert any(
         r['name'] == 'Тестовый рецепт' for r in response.data['results']
     )
+
+
+@pytest.mark.django_db
+def test_update_unchanged_ingredients_skips_writes(
+    authenticated_client, recipe_data
+):
+    recipe_id = authenticated_client.post(
+        reverse('recipes-list'), recipe_data, format='json'
+    ).data['id']
+    data = update_data(recipe_data, recipe_data['ingredients'])
+    data['text'] = 'Новое описание'
+
+    with CaptureQueriesContext(connection) as context:
+        response = authenticated_client.patch(
+            reverse('recipes-detail', args=[recipe_id]), data, format='json'
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['text'] == 'Новое описание'
+    assert not [
+        query['sql'] for query in context.captured_queries
+        if 'recipes_recipeingredient' in query['sql']
+        and query['sql'].split(None, 1)[0] in ('INSERT', 'UPDATE', 'DELETE')
+    ]
+
+
+@pytest.mark.django_db
+def test_update_ingredients_diff(authenticated_client, recipe_data,
+                                 sample_ingredient, second_sample_ingredient):
+    recipe_data['ingredients'].append(
+        {'id': second_sample_ingredient.id, 'amount': 5}
+    )
+    recipe_id = authenticated_client.post(
+        reverse('recipes-list'), recipe_data, format='json'
+    ).data['id']
+    kept_id = RecipeIngredient.objects.get(
+        recipe_id=recipe_id, ingredient=sample_ingredient
+    ).id
+    third = Ingredient.objects.create(
+        name='Перец', measurement_unit='г'
+    )
+
+    response = authenticated_client.patch(
+        reverse('recipes-detail', args=[recipe_id]),
+        update_data(recipe_data, [
+            {'id': sample_ingredient.id, 'amount': '25'},
+            {'id': third.id, 'amount': 1},
+        ]),
+        format='json'
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(
+        (item['id'], item['amount']) for item in response.data['ingredients']
+    ) == sorted([(sample_ingredient.id, 25), (third.id, 1)])
+    assert RecipeIngredient.objects.get(
+        recipe_id=recipe_id, ingredient=sample_ingredient
+    ).id == kept_id
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+import pytest
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, ShoppingCart
+from recipes.queries import insert_ignore
+from users.models import Subscription
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url_name, message', [
+    ('recipes-favorite', 'Рецепт уже в избранном'),
+    ('recipes-shopping-cart', 'Рецепт уже в списке покупок'),
+])
+def test_repeated_add_reports_existing(authenticated_client, recipe,
+                                       url_name, message):
+    url = reverse(url_name, args=[recipe.id])
+
+    first = authenticated_client.post(url)
+    second = authenticated_client.post(url)
+
+    assert first.status_code == status.HTTP_201_CREATED
+    assert second.status_code == status.HTTP_400_BAD_REQUEST
+    assert second.data == {'recipe': [message]}
+    recipe.refresh_from_db()
+    assert recipe.favorites_count + recipe.shopping_cart_count == 1
+
+
+@pytest.mark.django_db
+def test_repeated_subscribe_reports_existing(authenticated_client, author):
+    url = reverse('users-subscribe', args=[author.id])
+
+    first = authenticated_client.post(url)
+    second = authenticated_client.post(url)
+
+    assert first.status_code == status.HTTP_201_CREATED
+    assert second.status_code == status.HTTP_400_BAD_REQUEST
+    assert second.data == {'author': ['Вы уже подписаны на этого автора']}
+    assert Subscription.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_add_skips_existence_check(authenticated_client, recipe):
+    url = reverse('recipes-favorite', args=[recipe.id])
+
+    with CaptureQueriesContext(connection) as context:
+        authenticated_client.post(url)
+
+    statements = [
+        query['sql'].split(None, 1)[0] for query in context.captured_queries
+    ]
+    # Рецепт, вставка без предварительной проверки и счётчик.
+    assert [
+        statement for statement in statements
+        if statement in ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+    ] == ['SELECT', 'INSERT', 'UPDATE']
+
+
+@pytest.mark.django_db
+def test_insert_ignore(user, recipe):
+    assert insert_ignore(ShoppingCart(user=user, recipe=recipe)) is True
+    assert insert_ignore(ShoppingCart(user=user, recipe=recipe)) is False
+    assert ShoppingCart.objects.filter(user=user, recipe=recipe).count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_double_click(user, recipe):
+    if connection.vendor != 'postgresql':
+        pytest.skip('SQLite не допускает параллельной записи')
+
+    clicks = 8
+    barrier = Barrier(clicks)
+    url = reverse('recipes-favorite', args=[recipe.id])
+
+    def click(_):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        barrier.wait()
+        try:
+            return client.post(url).status_code
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=clicks) as executor:
+        statuses = list(executor.map(click, range(clicks)))
+
+    assert sorted(statuses) == (
+        [status.HTTP_201_CREATED]
+        + [status.HTTP_400_BAD_REQUEST] * (clicks - 1)
+    )
+    assert Favorite.objects.filter(user=user, recipe=recipe).count() == 1
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 1
@@ -0,0 +1,284 @@
+import csv
+import io
+import json
+import warnings
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Recipe, RecipeIngredient, ShoppingCart, ShoppingListItem
+)
+from api import signals
+from recipes.shopping_list import (
+    find_shopping_list_mismatches, rebuild_shopping_lists
+)
+
+
+URL = reverse('recipes-download-shopping-cart')
+
+
+@pytest.fixture
+def cart(
+        user, recipe, sample_ingredient, second_sample_ingredient,
+        django_capture_on_commit_callbacks
+):
+    other = Recipe.objects.create(
+        author=recipe.author,
+        name='Второй рецепт',
+        image='recipes/images/test.png',
+        text='Описание',
+        cooking_time=5
+    )
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(
+            recipe=other, ingredient=sample_ingredient, amount=50
+        ),
+        RecipeIngredient(
+            recipe=other, ingredient=second_sample_ingredient, amount=3
+        ),
+    ])
+    # Через create(), чтобы сигналы собрали готовый список покупок.
+    with django_capture_on_commit_callbacks(execute=True):
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+        ShoppingCart.objects.create(user=user, recipe=other)
+    return [recipe, other]
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(user=author)
+    return client
+
+
+def get_content(response):
+    assert response.status_code == status.HTTP_200_OK
+    # Под ASGI сервер читает такой ответ через async for.
+    assert response.is_async
+
+    async def read():
+        return b''.join([part async for part in response.streaming_content])
+
+    return async_to_sync(read)().decode()
+
+
+@pytest.mark.django_db
+def test_download_txt(authenticated_client, cart):
+    response = authenticated_client.get(URL)
+
+    assert response['Content-Type'] == 'text/plain; charset=utf-8'
+    assert 'shopping_list.txt' in response['Content-Disposition']
+    assert get_content(response) == (
+        'Список покупок:\n\n'
+        'Сахар (г) - 150\n'
+        'Соль (г) - 3\n'
+    )
+
+
+@pytest.mark.django_db
+def test_download_streams_under_asgi(user, cart):
+    token = Token.objects.create(user=user)
+
+    async def main():
+        response = await AsyncClient().get(
+            URL, headers={'Authorization': f'Token {token.key}'}
+        )
+        assert response.status_code == 200, response.content
+        # Так ответ читает ASGIHandler: синхронный итератор Django
+        # собирает целиком и предупреждает об этом.
+        return [part async for part in response]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        parts = async_to_sync(main)()
+    assert b''.join(parts).decode() == (
+        'Список покупок:\n\n'
+        'Сахар (г) - 150\n'
+        'Соль (г) - 3\n'
+    )
+
+
+@pytest.mark.django_db
+def test_download_csv(authenticated_client, cart):
+    response = authenticated_client.get(URL, {'format': 'csv'})
+
+    rows = list(csv.reader(io.StringIO(get_content(response))))
+    assert rows == [
+        ['name', 'measurement_unit', 'amount'],
+        ['Сахар', 'г', '150'],
+        ['Соль', 'г', '3'],
+    ]
+
+
+@pytest.mark.django_db
+def test_download_json(authenticated_client, cart):
+    response = authenticated_client.get(URL, {'format': 'json'})
+
+    assert json.loads(get_content(response)) == [
+        {'name': 'Сахар', 'measurement_unit': 'г', 'amount': 150},
+        {'name': 'Соль', 'measurement_unit': 'г', 'amount': 3},
+    ]
+
+
+@pytest.mark.django_db
+def test_download_empty_json(authenticated_client):
+    response = authenticated_client.get(URL, {'format': 'json'})
+
+    assert json.loads(get_content(response)) == []
+
+
+@pytest.mark.django_db
+def test_download_unknown_format(authenticated_client, cart):
+    response = authenticated_client.get(URL, {'format': 'xml'})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_download_repeated_returns_not_modified(authenticated_client, cart):
+    etag = authenticated_client.get(URL)['ETag']
+
+    response = authenticated_client.get(URL, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response['ETag'] == etag
+
+
+@pytest.mark.django_db
+def test_etag_changes_with_cart_and_format(
+        authenticated_client, user, cart, django_capture_on_commit_callbacks
+):
+    etag = authenticated_client.get(URL)['ETag']
+
+    csv_response = authenticated_client.get(
+        URL, {'format': 'csv'}, HTTP_IF_NONE_MATCH=etag
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        ShoppingCart.objects.filter(user=user, recipe=cart[1]).delete()
+    txt_response = authenticated_client.get(URL, HTTP_IF_NONE_MATCH=etag)
+
+    assert csv_response.status_code == status.HTTP_200_OK
+    assert get_content(txt_response) == (
+        'Список покупок:\n\nСахар (г) - 100\n'
+    )
+
+
+@pytest.mark.django_db
+def test_download_unauthenticated(api_client):
+    response = api_client.get(URL)
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def get_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient__name', 'total_amount'
+    ))
+
+
+@pytest.mark.django_db
+def test_shopping_list_follows_cart_api(
+        authenticated_client, user, recipe, cart
+):
+    other = cart[1]
+    url = reverse('recipes-shopping-cart', args=[other.id])
+
+    authenticated_client.delete(url)
+    assert get_list(user) == {'Сахар': 100}
+
+    authenticated_client.post(url)
+    assert get_list(user) == {'Сахар': 150, 'Соль': 3}
+
+    authenticated_client.delete(
+        reverse('recipes-shopping-cart', args=[recipe.id])
+    )
+    authenticated_client.delete(url)
+    assert get_list(user) == {}
+    assert find_shopping_list_mismatches() == []
+
+
+@pytest.mark.django_db
+def test_shopping_list_follows_batch_api(authenticated_client, user, cart):
+    url = reverse('recipes-shopping-cart-batch')
+    ids = {'recipes': [recipe.id for recipe in cart]}
+
+    authenticated_client.delete(url, ids, format='json')
+    assert get_list(user) == {}
+
+    authenticated_client.post(url, ids, format='json')
+    authenticated_client.post(url, ids, format='json')
+    assert get_list(user) == {'Сахар': 150, 'Соль': 3}
+
+
+@pytest.mark.django_db
+def test_shopping_list_follows_recipe_update(
+        author_client, user, author, recipe, cart, second_sample_ingredient,
+        django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        ShoppingCart.objects.create(user=author, recipe=recipe)
+
+    response = author_client.patch(
+        reverse('recipes-detail', args=[recipe.id]),
+        {
+            'ingredients': [{'id': second_sample_ingredient.id, 'amount': 7}],
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        },
+        format='json'
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert get_list(user) == {'Сахар': 50, 'Соль': 10}
+    assert get_list(author) == {'Соль': 7}
+
+
+@pytest.mark.django_db
+def test_shopping_list_follows_recipe_deletion(
+        author_client, user, author, cart, monkeypatch,
+        django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        ShoppingCart.objects.create(user=author, recipe=cart[0])
+    rebuilds = []
+    monkeypatch.setattr(
+        signals, 'rebuild_shopping_lists',
+        lambda user_ids: rebuilds.append(user_ids) or (
+            rebuild_shopping_lists(user_ids)
+        )
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        author_client.delete(reverse('recipes-detail', args=[cart[0].id]))
+
+    # Строки корзины и состава удаляются каскадом, но список каждого
+    # пользователя пересобирается один раз.
+    assert rebuilds == [{user.id, author.id}]
+    assert get_list(user) == {'Сахар': 50, 'Соль': 3}
+    assert get_list(author) == {}
+    assert find_shopping_list_mismatches() == []
+
+
+@pytest.mark.django_db
+def test_rebuild_shopping_lists_fixes_drift(user, cart, sample_ingredient):
+    ShoppingListItem.objects.filter(
+        user=user, ingredient=sample_ingredient
+    ).update(total_amount=1)
+
+    with pytest.raises(CommandError):
+        call_command('rebuild_shopping_lists', '--check', stdout=io.StringIO())
+    assert find_shopping_list_mismatches() == [
+        (user.id, sample_ingredient.id, 150, 1)
+    ]
+
+    call_command('rebuild_shopping_lists', stdout=io.StringIO())
+    call_command('rebuild_shopping_lists', '--check', stdout=io.StringIO())
+    assert get_list(user) == {'Сахар': 150, 'Соль': 3}
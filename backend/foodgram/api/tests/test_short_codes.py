@@ -0,0 +1,81 @@
+import string
+
+import pytest
+from django.urls import reverse
+from hypothesis import given, strategies as st
+from rest_framework import status
+
+from api import short_codes
+
+
+ids = st.integers(min_value=0, max_value=short_codes.MASK)
+
+
+@given(ids)
+def test_decode_reverses_encode(recipe_id):
+    assert short_codes.decode(short_codes.encode(recipe_id)) == recipe_id
+
+
+@given(ids)
+def test_code_is_compact_and_not_numeric(recipe_id):
+    code = short_codes.encode(recipe_id)
+
+    assert len(code) == short_codes.CODE_LENGTH
+    assert code[0] in string.ascii_letters
+    assert set(code) <= set(short_codes.ALPHABET)
+
+
+@given(ids, ids)
+def test_codes_do_not_collide(first, second):
+    if first != second:
+        assert short_codes.encode(first) != short_codes.encode(second)
+
+
+@given(st.text(alphabet=short_codes.ALPHABET, min_size=1, max_size=8))
+def test_decode_never_fails(code):
+    recipe_id = short_codes.decode(code)
+
+    if recipe_id is not None and not code.isdigit():
+        assert short_codes.encode(recipe_id) == code
+
+
+@given(st.integers(min_value=0, max_value=10 ** 12))
+def test_legacy_numeric_codes(recipe_id):
+    assert short_codes.decode(str(recipe_id)) == recipe_id
+
+
+def test_out_of_range_ids_stay_numeric():
+    recipe_id = short_codes.MASK + 1
+
+    assert short_codes.decode(short_codes.encode(recipe_id)) == recipe_id
+
+
+def test_neighbouring_ids_look_unrelated():
+    first, second = short_codes.encode(1), short_codes.encode(2)
+
+    assert sum(a == b for a, b in zip(first, second)) < 3
+
+
+@pytest.mark.parametrize('code', ['', '-1', 'abc', 'zzzzzz', 'ab/cde', '١٢٣'])
+def test_decode_rejects_foreign_codes(code):
+    assert short_codes.decode(code) is None
+
+
+@pytest.mark.django_db
+def test_short_link_uses_code(api_client, recipe):
+    response = api_client.get(reverse('recipe-get-link', args=[recipe.id]))
+
+    code = response.data['short-link'].rstrip('/').rsplit('/', 1)[-1]
+    assert code == short_codes.encode(recipe.id)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url_name', [
+    'recipe_short_redirect', 'async-recipe-short-redirect'
+])
+def test_redirect_accepts_new_and_legacy_codes(api_client, recipe, url_name):
+    for code in (short_codes.encode(recipe.id), str(recipe.id)):
+        response = api_client.get(reverse(url_name, args=[code]))
+
+        assert response.status_code == status.HTTP_302_FOUND
+        assert response['Location'].endswith(f'/recipes/{recipe.id}/')
@@ -0,0 +1,79 @@
+from urllib.parse import urlsplit
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from api.recipe_ids import recipe_ids
+from recipes.models import Recipe
+
+
+def redirect_url(recipe_id):
+    return reverse('recipe_short_redirect', args=[recipe_id])
+
+
+@pytest.mark.django_db
+def test_short_link_points_to_redirect(api_client, recipe):
+    short_link = api_client.get(
+        reverse('recipe-get-link', args=[recipe.id])
+    ).data['short-link']
+
+    response = api_client.get(urlsplit(short_link).path)
+
+    assert response['Location'].endswith(f'/recipes/{recipe.id}/')
+
+
+@pytest.mark.django_db
+def test_redirect(api_client, recipe):
+    response = api_client.get(redirect_url(recipe.id))
+
+    assert response.status_code == status.HTTP_302_FOUND
+    assert response['Location'].endswith(f'/recipes/{recipe.id}/')
+    assert 'public' in response['Cache-Control']
+    assert 'max-age=' in response['Cache-Control']
+
+
+@pytest.mark.django_db
+def test_redirect_hit_skips_database(api_client, recipe,
+                                     django_assert_num_queries):
+    recipe_ids.contains(recipe.id)
+
+    with django_assert_num_queries(0):
+        response = api_client.get(redirect_url(recipe.id))
+
+    assert response.status_code == status.HTTP_302_FOUND
+
+
+@pytest.mark.django_db
+def test_redirect_new_recipe_falls_back_to_database(api_client, recipe):
+    recipe_ids.contains(recipe.id)
+    # Рецепт, о котором битовая карта процесса ещё не знает.
+    other = Recipe.objects.bulk_create([Recipe(
+        author=recipe.author, name='Новый', image=recipe.image,
+        text='Описание', cooking_time=1
+    )])[0]
+
+    response = api_client.get(redirect_url(other.id))
+
+    assert response.status_code == status.HTTP_302_FOUND
+    assert recipe_ids.contains(other.id)
+
+
+@pytest.mark.django_db
+def test_redirect_deleted_recipe(api_client, recipe):
+    recipe_ids.contains(recipe.id)
+    recipe_id = recipe.id
+    recipe.delete()
+
+    response = api_client.get(redirect_url(recipe_id))
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {'detail': 'Рецепт не найден'}
+
+
+@pytest.mark.django_db
+def test_redirect_invalid_code(api_client):
+    response = api_client.get(redirect_url('abc'))
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {'detail': 'Неверный формат ссылки'}
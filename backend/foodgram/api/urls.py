@@ -3,7 +3,7 @@ from django.views.generic import TemplateView
 
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 
@@ -14,8 +14,28 @@ router.register(r'ingredients', views.IngredientViewSet,
 router.register(r'recipes', views.RecipeViewSet,
                 basename='recipes')
 
+async_urlpatterns = [
+    path('recipes/', async_views.recipe_list, name='async-recipes-list'),
+    path(
+        'recipes/<int:pk>/',
+        async_views.recipe_detail,
+        name='async-recipes-detail'
+    ),
+    path(
+        'ingredients/',
+        async_views.ingredient_list,
+        name='async-ingredients-list'
+    ),
+    path(
+        'r/<str:short_code>/',
+        async_views.recipe_short_redirect,
+        name='async-recipe-short-redirect'
+    ),
+]
+
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/', include(async_urlpatterns)),
     path(
         'recipes/<int:pk>/get-link/',
         views.RecipeShortLinkView.as_view(),
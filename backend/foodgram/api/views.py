@@ -3,12 +3,18 @@ import secrets
 import random
 import string
 import logging
+from functools import partial
 
 from django.conf import settings
 from django.contrib.auth import get_user_model, login
-from django.db.models import Count, Exists, OuterRef, Prefetch, Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import (
+    HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
 
 from djoser.views import UserViewSet as DjoserUserViewSet
 
@@ -23,6 +29,7 @@ from rest_framework.permissions import (
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from recipes.counters import change_counter
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -30,18 +37,39 @@ from recipes.models import (
     RecipeIngredient,
     ShoppingCart
 )
+from recipes.queries import bulk_insert_ignore, delete_returning
+from recipes.shopping_list import (
+    add_to_shopping_list, remove_from_shopping_list
+)
 
+from . import short_codes
+from .cache import (
+    get_cached_recipe_page, get_recipe_list_cache_key,
+    is_recipe_list_cacheable, overlay_user_flags,
+    set_cached_recipe_page,
+)
+from .feed_push import schedule_feed_push
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPageNumberPagination
+from .ingredient_index import ingredient_index
+from .pagination import (
+    RecipeCursorPagination, UserCursorPagination, get_paginator
+)
 from .permissions import IsAuthorOrReadOnly
+from .recipe_feed import get_recipe_rows, serialize_recipe_rows
+from .recipe_ids import recipe_ids
 from .serializers import (
     FavoriteSerializer, IngredientSerializer,
-    RecipeCreateUpdateSerializer, RecipeSerializer,
+    RecipeBatchSerializer, RecipeCreateUpdateSerializer,
+    RecipeMinifiedSerializer, RecipeSerializer,
     SetAvatarSerializer, SetPasswordSerializer,
-    ShortCodeValidatorSerializer, ShoppingCartSerializer,
+    ShoppingCartSerializer,
     SubscriptionSerializer, UserSerializer,
     UserWithRecipesSerializer,
 )
+from .shopping_list import (
+    SHOPPING_LIST_RENDERERS, get_shopping_list_etag,
+    get_shopping_list_items,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -239,6 +267,35 @@ def set_token_view(request):
     })
 
 
+def get_recipe_queryset(user):
+    """Рецепты ленты с автором, ингредиентами и флагами пользователя."""
+    queryset = Recipe.objects.all().order_by('-pub_date')
+
+    queryset = queryset.select_related('author').prefetch_related(
+        Prefetch(
+            'ingredient_amounts',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        )
+    )
+
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk')
+                )
+            )
+        )
+    return queryset
+
+
 class UserViewSet(DjoserUserViewSet):
     """CRUD для пользователя и создание/удаление подписок."""
 
@@ -342,13 +399,9 @@ class UserViewSet(DjoserUserViewSet):
     @action(['get'], detail=False,
             permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
-        authors = User.objects.filter(
-            followers__user=request.user
-        ).annotate(
-            recipes_count=Count('recipes')
-        )
+        authors = User.objects.filter(followers__user=request.user)
 
-        paginator = CustomPageNumberPagination()
+        paginator = get_paginator(request, UserCursorPagination)
 
         result_page = paginator.paginate_queryset(authors, request)
         recipes_limit = request.query_params.get('recipes_limit')
@@ -365,6 +418,11 @@ class UserViewSet(DjoserUserViewSet):
         return paginator.get_paginated_response(serializer.data)
 
 
+def build_absolute_url(request, path):
+    return (f'http{"://" if settings.DEBUG else "s://"}'
+            f'{request.get_host()}{path}')
+
+
 class RecipeShortLinkView(APIView):
     """Получение короткой ссылки для рецепта."""
 
@@ -372,49 +430,42 @@ class RecipeShortLinkView(APIView):
 
     def get(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
-        short_code = str(recipe.id)
-        redirect_path = f'/r/{short_code}/'
-
-        if settings.DEBUG:
-            absolute_url = f'http://{request.get_host()}{redirect_path}'
-        else:
-            absolute_url = f'https://{request.get_host()}{redirect_path}'
+        short_code = short_codes.encode(recipe.id)
 
         return Response(
-            {'short-link': absolute_url},
+            {'short-link': build_absolute_url(request, f'/r/{short_code}/')},
             status=status.HTTP_200_OK
         )
 
 
-class RecipeShortRedirectView(APIView):
-    """Перенаправление короткой ссылки на полный URL рецепта."""
-
-    permission_classes = [AllowAny]
-
-    def get(self, request, short_code):
-        recipe_queryset = Recipe.objects.all()
-        serializer = ShortCodeValidatorSerializer(
-            data={'short_code': short_code},
-            recipe_queryset=recipe_queryset
+def short_redirect_response(request, recipe_id, exists):
+    if recipe_id is None:
+        return JsonResponse(
+            {'detail': 'Неверный формат ссылки'},
+            status=status.HTTP_404_NOT_FOUND
         )
-        if not serializer.is_valid():
-            return Response(
-                {'detail': ' '.join(
-                    serializer.errors['short_code']
-                )},
-                status=status.HTTP_404_NOT_FOUND
-            )
+    if not exists:
+        return JsonResponse(
+            {'detail': 'Рецепт не найден'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    response = HttpResponseRedirect(
+        build_absolute_url(request, f'/recipes/{recipe_id}/')
+    )
+    patch_cache_control(
+        response, public=True, max_age=settings.SHORT_LINK_CACHE_TIMEOUT
+    )
+    return response
 
-        recipe_id = serializer.validated_data['short_code']
-        recipe_url = f'/recipes/{recipe_id}/'
-        full_url = (f'http{"://" if settings.DEBUG else "s://"}'
-                    f'{request.get_host()}{recipe_url}')
 
-        return Response(
-            {'Location': full_url},
-            status=status.HTTP_302_FOUND,
-            headers={'Location': full_url}
-        )
+@require_safe
+def recipe_short_redirect(request, short_code):
+    """Перенаправление короткой ссылки на рецепт в обход DRF."""
+    recipe_id = short_codes.decode(short_code)
+    return short_redirect_response(
+        request, recipe_id,
+        recipe_id is not None and recipe_ids.contains(recipe_id)
+    )
 
 
 class IngredientViewSet(mixins.ListModelMixin,
@@ -427,6 +478,13 @@ class IngredientViewSet(mixins.ListModelMixin,
     pagination_class = None
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        limit = request.query_params.get('limit')
+        return Response(ingredient_index.search(
+            request.query_params.get('name', ''),
+            limit=int(limit) if limit and limit.isdigit() else None
+        ))
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """CRUD для рецептов, работа с избранным и корзиной."""
@@ -439,40 +497,44 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
 
     def get_queryset(self):
-        queryset = Recipe.objects.all().order_by('-pub_date')
+        return get_recipe_queryset(self.request.user)
 
-        queryset = queryset.select_related('author').prefetch_related(
-            Prefetch(
-                'ingredient_amounts',
-                queryset=RecipeIngredient.objects.select_related('ingredient')
-            ),
-            'favorited_by',
-            'in_shopping_carts'
-        )
-
-        user = self.request.user
-        if user.is_authenticated:
-            queryset = queryset.annotate(
-                is_favorited=Exists(
-                    Favorite.objects.filter(
-                        user=user,
-                        recipe=OuterRef('pk')
-                    )
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        user=user,
-                        recipe=OuterRef('pk')
-                    )
-                )
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = get_paginator(
+                self.request, RecipeCursorPagination
             )
-        return queryset
+        return self._paginator
 
     def get_serializer_class(self):
         if self.action in ['create', 'partial_update']:
             return RecipeCreateUpdateSerializer
         return RecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        if not is_recipe_list_cacheable(request):
+            return self.list_rows(request)
+
+        cache_key = get_recipe_list_cache_key(request)
+        data = get_cached_recipe_page(cache_key)
+        if data is None:
+            response = self.list_rows(request)
+            set_cached_recipe_page(cache_key, response.data)
+            return response
+
+        if request.user.is_authenticated:
+            overlay_user_flags(data, request.user)
+        return Response(data)
+
+    def list_rows(self, request):
+        """Страница ленты без RecipeSerializer, см. recipe_feed."""
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.paginate_queryset(get_recipe_rows(queryset))
+        return self.get_paginated_response(
+            serialize_recipe_rows(rows, request)
+        )
+
     def create(self, request, *args, **kwargs):
         create_serializer = self.get_serializer(data=request.data)
         create_serializer.is_valid(raise_exception=True)
@@ -483,7 +545,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        # Рецепт сериализуется здесь, пока есть запрос для абсолютных URL,
+        # а подписчиков перебирает уже пул потоков.
+        event = dict(RecipeMinifiedSerializer(
+            recipe, context={'request': self.request}
+        ).data)
+        transaction.on_commit(
+            partial(schedule_feed_push, recipe.author_id, event)
+        )
 
     @action(
         detail=True,
@@ -495,6 +565,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             pk=pk,
             serializer_class=FavoriteSerializer,
             model_class=Favorite,
+            counter_field='favorites_count',
             not_found_message='Рецепта нет в избранном'
         )
 
@@ -509,29 +580,124 @@ class RecipeViewSet(viewsets.ModelViewSet):
             pk=pk,
             serializer_class=ShoppingCartSerializer,
             model_class=ShoppingCart,
-            not_found_message='Рецепта нет в списке покупок'
+            counter_field='shopping_cart_count',
+            not_found_message='Рецепта нет в списке покупок',
+            updates_shopping_list=True
+        )
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite/batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_batch(self, request):
+        return self._handle_relation_batch(
+            request,
+            model_class=Favorite,
+            counter_field='favorites_count'
         )
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart/batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        return self._handle_relation_batch(
+            request,
+            model_class=ShoppingCart,
+            counter_field='shopping_cart_count',
+            updates_shopping_list=True
+        )
+
+    def _handle_relation_batch(
+            self, request, model_class, counter_field,
+            updates_shopping_list=False
+    ):
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+
+        # Одним запросом: какие рецепты есть и какие уже в отношении.
+        related = dict(Recipe.objects.filter(pk__in=recipe_ids).annotate(
+            related=Exists(model_class.objects.filter(
+                user=request.user, recipe=OuterRef('pk')
+            ))
+        ).values_list('pk', 'related'))
+
+        with transaction.atomic():
+            if request.method == 'POST':
+                changed = bulk_insert_ignore([
+                    model_class(user=request.user, recipe_id=recipe_id)
+                    for recipe_id, is_related in related.items()
+                    if not is_related
+                ], returning='recipe')
+                change_counter(Recipe, changed, counter_field, 1)
+                if updates_shopping_list:
+                    add_to_shopping_list(request.user.id, changed)
+                statuses = ('added', 'exists')
+            else:
+                changed = delete_returning(model_class.objects.filter(
+                    user=request.user,
+                    recipe_id__in=[
+                        recipe_id for recipe_id, is_related in related.items()
+                        if is_related
+                    ]
+                ), returning='recipe')
+                change_counter(Recipe, changed, counter_field, -1)
+                if updates_shopping_list:
+                    remove_from_shopping_list(request.user.id, changed)
+                statuses = ('removed', 'missing')
+
+        return Response({'results': [
+            {
+                'id': recipe_id,
+                'status': (
+                    'not_found' if recipe_id not in related
+                    else statuses[0] if recipe_id in changed
+                    else statuses[1]
+                )
+            }
+            for recipe_id in recipe_ids
+        ]})
+
     def _handle_relation(
             self, request, pk,
             serializer_class, model_class,
-            not_found_message
+            counter_field, not_found_message,
+            updates_shopping_list=False
     ):
-        recipe = self.get_object()
-        data = {'recipe': recipe.id}
-        serializer = serializer_class(data=data, context={'request': request})
+        # Аннотации и ингредиенты из get_queryset() здесь не нужны.
+        recipe = get_object_or_404(Recipe, pk=pk)
+        serializer = serializer_class(context={'request': request})
 
         if request.method == 'POST':
-            serializer.is_valid(raise_exception=True)
-            serializer.save(user=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            with transaction.atomic():
+                instance = serializer.create(
+                    {'user': request.user, 'recipe': recipe}
+                )
+                change_counter(Recipe, recipe.id, counter_field, 1)
+                if updates_shopping_list:
+                    add_to_shopping_list(request.user.id, [recipe.id])
+            return Response(
+                serializer.to_representation(instance),
+                status=status.HTTP_201_CREATED
+            )
 
         if request.method == 'DELETE':
-            deleted_count, _ = model_class.objects.filter(
-                user=request.user,
-                recipe=recipe
-            ).delete()
-            if deleted_count == 0:
+            with transaction.atomic():
+                # Без сигналов: счётчик и список покупок меняются здесь же.
+                deleted = delete_returning(model_class.objects.filter(
+                    user=request.user,
+                    recipe=recipe
+                ), returning='recipe')
+                if deleted:
+                    change_counter(Recipe, recipe.id, counter_field, -1)
+                    if updates_shopping_list:
+                        remove_from_shopping_list(request.user.id, deleted)
+            if not deleted:
                 return Response(
                     {'error': not_found_message},
                     status=status.HTTP_400_BAD_REQUEST
@@ -543,32 +709,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
             methods=['get'],
             permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        user = request.user
-
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__in_shopping_carts__user=user
-        ).select_related('ingredient').values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
-        ).order_by('ingredient__name')
+        export_format = request.query_params.get('format', 'txt')
+        renderer_class = SHOPPING_LIST_RENDERERS.get(export_format)
+        if renderer_class is None:
+            return Response(
+                {'error': 'Неподдерживаемый формат списка покупок'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        text = self.generate_shopping_list(ingredients)
+        etag = get_shopping_list_etag(request.user, export_format)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
 
-        response = HttpResponse(
-            text,
-            content_type='text/plain; charset=utf-8'
+        renderer = renderer_class()
+        response = StreamingHttpResponse(
+            renderer.render(get_shopping_list_items(request.user)),
+            content_type=renderer.content_type
         )
-        response['Content-Disposition'] = ('attachment;'
-                                           ' filename="shopping_list.txt"')
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
+        )
+        response['ETag'] = etag
         return response
 
-    def generate_shopping_list(self, ingredients):
-        text = 'Список покупок:\n\n'
-        for item in ingredients:
-            text += (
-                f'{item['ingredient__name']} '
-                f'({item['ingredient__measurement_unit']}) - '
-                f'{item['total_amount']}\n'
-            )
-        return text
+    def perform_content_negotiation(self, request, force=False):
+        # Параметр format у выгрузки выбирает формат файла,
+        # а не рендерер DRF.
+        if self.action == 'download_shopping_cart':
+            force = True
+        return super().perform_content_negotiation(request, force)
@@ -6,4 +6,7 @@ set -e
 python manage.py migrate --noinput
 python manage.py collectstatic --noinput
 cp -r collected_static/. /backend_static/static/
-exec daphne -b 0.0.0.0 -p 8000 foodgram.asgi:application
\ No newline at end of file
+if [ -n "$CHANNEL_BROKER_SOCKETS" ]; then
+    python manage.py run_channel_broker &
+fi
+exec python manage.py run_asgi_workers
\ No newline at end of file
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,12 +62,70 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 ASGI_APPLICATION = 'foodgram.asgi.application'
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    },
+# Сокеты брокеров api.broker через запятую, по одному на шарду. Без
+# них слой в памяти процесса, его хватает для одного воркера.
+CHANNEL_BROKER_SOCKETS = os.getenv('CHANNEL_BROKER_SOCKETS')
+
+if CHANNEL_BROKER_SOCKETS:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'api.layers.BrokerChannelLayer',
+            'CONFIG': {
+                'shards': CHANNEL_BROKER_SOCKETS.split(','),
+                'capacity': int(os.getenv('CHANNEL_CAPACITY', 100)),
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        },
+    }
+
+# Процессы daphne в manage.py run_asgi_workers, больше одного — только
+# с брокерами.
+ASGI_WORKERS = int(os.getenv('ASGI_WORKERS', 1))
+
+# Как часто UserStatusConsumer рассылает накопленные входы и выходы, с.
+PRESENCE_TICK = float(os.getenv('PRESENCE_TICK', 0.25))
+
+# Чат: история комнаты в памяти, лимиты одного соединения и запись в БД.
+CHAT_HISTORY_SIZE = int(os.getenv('CHAT_HISTORY_SIZE', 50))
+CHAT_MAX_ROOMS = int(os.getenv('CHAT_MAX_ROOMS', 1000))
+CHAT_MAX_FRAME_SIZE = int(os.getenv('CHAT_MAX_FRAME_SIZE', 4096))
+CHAT_RATE_LIMIT = float(os.getenv('CHAT_RATE_LIMIT', 5))
+CHAT_BURST = int(os.getenv('CHAT_BURST', 10))
+CHAT_PERSIST = os.getenv('CHAT_PERSIST', 'False').lower() in ('1', 'true', 't', 'yes', 'y', 'on')
+CHAT_FLUSH_INTERVAL = float(os.getenv('CHAT_FLUSH_INTERVAL', 2))
+
+# Рассылка новых рецептов подписчикам: пачка подписчиков на запрос к БД.
+FEED_PUSH_CHUNK_SIZE = int(os.getenv('FEED_PUSH_CHUNK_SIZE', 1000))
+FEED_PUSH_WORKERS = int(os.getenv('FEED_PUSH_WORKERS', 1))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
 }
 
+RECIPES_CACHE_TIMEOUT = int(os.getenv('RECIPES_CACHE_TIMEOUT', 300))
+
+SHORT_LINK_CACHE_TIMEOUT = int(os.getenv('SHORT_LINK_CACHE_TIMEOUT', 3600))
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+# Порог в секундах для лога медленных запросов, пусто — лог выключен.
+SLOW_REQUEST_THRESHOLD = (
+    float(os.getenv('SLOW_REQUEST_THRESHOLD'))
+    if os.getenv('SLOW_REQUEST_THRESHOLD') else None
+)
+SLOW_REQUEST_TOP_QUERIES = int(os.getenv('SLOW_REQUEST_TOP_QUERIES', 5))
+
 DATABASE_ENGINE = os.getenv('DATABASE_ENGINE', 'sqlite')
 
 if DATABASE_ENGINE == 'postgres':
@@ -129,6 +188,15 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.fast_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.fast_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPageNumberPagination',
     'PAGE_SIZE': 6
 }
@@ -146,7 +214,7 @@ LOGGING = {
     'loggers': {
         '': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': os.getenv('LOG_LEVEL', 'INFO'),
             'propagate': True,
         },
     },
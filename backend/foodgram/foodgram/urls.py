@@ -3,14 +3,17 @@ from django.urls import path, include
 from django.views.generic import TemplateView
 
 from api import views
+from api.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path(
         'r/<str:short_code>/',
-        views.RecipeShortRedirectView.as_view(),
+        views.recipe_short_redirect,
         name='recipe_short_redirect'
     ),
+    # nginx не проксирует этот путь, метрики доступны только изнутри.
+    path('metrics/', metrics_view, name='metrics'),
     path('ws/', TemplateView.as_view(template_name='websocket_test.html')),
 ]
@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.db import transaction
 from django.db.models import Count, Prefetch
 
+from users.models import User
+
+from .counters import change_counter
 from .models import (
     Recipe, Ingredient, RecipeIngredient,
     Favorite, ShoppingCart
@@ -89,23 +93,22 @@ class RecipeAdmin(admin.ModelAdmin):
                         'ingredient'
                     )
                 )
-            ).annotate(
-                _favorites_count=Count('favorited_by'),
-                _shopping_cart_count=Count('in_shopping_carts')
             )
         )
 
-    def favorites_count(self, obj):
-        return obj._favorites_count
-
-    favorites_count.admin_order_field = '_favorites_count'
-    favorites_count.short_description = 'В избранном'
-
-    def shopping_cart_count(self, obj):
-        return obj._shopping_cart_count
-
-    shopping_cart_count.admin_order_field = '_shopping_cart_count'
-    shopping_cart_count.short_description = 'В корзинах покупок'
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        # Создание и удаление рецепта считают сигналы, здесь — только
+        # смена автора.
+        previous_author_id = (
+            Recipe.objects.filter(pk=obj.pk).values_list(
+                'author_id', flat=True
+            ).first() if change else None
+        )
+        super().save_model(request, obj, form, change)
+        if change and previous_author_id != obj.author_id:
+            change_counter(User, obj.author_id, 'recipes_count', 1)
+            change_counter(User, previous_author_id, 'recipes_count', -1)
 
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
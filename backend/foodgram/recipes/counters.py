@@ -0,0 +1,48 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import User
+
+from .models import Favorite, Recipe, ShoppingCart
+
+
+def change_counter(model, pks, field, delta):
+    """Атомарно изменяет счётчик одним UPDATE без чтения значения.
+
+    Строки, удалённые каскадом или из админки, учитывают сигналы в
+    api/signals.py. Для изменений в обход ORM (bulk_create, сырой SQL)
+    счётчики выравнивает команда recount.
+    """
+    if not isinstance(pks, (list, tuple, set)):
+        pks = [pks]
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+)
+
+
+def recount():
+    """Пересчитывает разошедшиеся счётчики, возвращает число исправлений."""
+    fixed = {}
+    for model, field, related_model, related_field in COUNTERS:
+        actual = count_subquery(related_model, related_field)
+        fixed[f'{model._meta.model_name}.{field}'] = model.objects.exclude(
+            **{field: actual}
+        ).update(**{field: actual})
+    return fixed
@@ -0,0 +1,102 @@
+"""Уменьшенные копии изображений рецептов и аватаров в WebP.
+
+Копии строятся в пуле потоков после фиксации транзакции и лежат рядом
+с оригиналом под предсказуемыми именами, поэтому их URL известен
+сразу и не требует поля в модели.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+# Название копии и наибольшая сторона в пикселях.
+RENDITIONS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1280,
+}
+WEBP_QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def get_rendition_name(name, rendition):
+    return f'{os.path.splitext(name)[0]}.{rendition}.webp'
+
+
+def get_rendition_urls(image, request=None):
+    """URL всех копий изображения, None если изображения нет."""
+    if not image:
+        return None
+    urls = {}
+    for rendition in RENDITIONS:
+        url = image.storage.url(get_rendition_name(image.name, rendition))
+        urls[rendition] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def generate_renditions(name, storage=default_storage):
+    """Создаёт недостающие копии изображения, возвращает их число."""
+    missing = [
+        rendition for rendition in RENDITIONS
+        if not storage.exists(get_rendition_name(name, rendition))
+    ]
+    if not missing:
+        return 0
+
+    with storage.open(name) as file, Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    for rendition in missing:
+        size = RENDITIONS[rendition]
+        copy = image.copy()
+        copy.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        copy.save(buffer, 'WEBP', quality=WEBP_QUALITY)
+        storage.save(
+            get_rendition_name(name, rendition), ContentFile(buffer.getvalue())
+        )
+    return len(missing)
+
+
+def _generate(name):
+    try:
+        generate_renditions(name)
+    except Exception:
+        logger.exception('Не удалось создать копии изображения %s', name)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                thread_name_prefix='renditions'
+            )
+        return _executor
+
+
+def schedule_renditions(name):
+    """Ставит создание копий в очередь пула потоков."""
+    future = _get_executor().submit(_generate, name)
+    _pending.add(future)
+    future.add_done_callback(_pending.discard)
+    return future
+
+
+def wait_for_renditions(timeout=None):
+    """Дожидается обработки уже поставленных в очередь изображений."""
+    wait(list(_pending), timeout=timeout)
@@ -0,0 +1,31 @@
+from itertools import chain
+
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_renditions
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие WebP-копии изображений рецептов и аватаров'
+
+    def handle(self, *args, **options):
+        names = chain(
+            Recipe.objects.exclude(image='').values_list(
+                'image', flat=True
+            ).iterator(),
+            User.objects.exclude(avatar='').values_list(
+                'avatar', flat=True
+            ).iterator(),
+        )
+        created = failed = 0
+        for name in names:
+            try:
+                created += generate_renditions(name)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано копий: {created}, ошибок: {failed}'
+        ))
@@ -0,0 +1,172 @@
+import csv
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import Ingredient
+from recipes.queries import bulk_insert_ignore
+from recipes.signals import ingredients_loaded
+
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    """Пары (название, единица), None для строки без двух колонок."""
+    for row in csv.reader(file):
+        if row:
+            yield (row[0], row[1]) if len(row) >= 2 else None
+
+
+def read_json(file):
+    """Поэлементно разбирает JSON-массив, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON-файл должен содержать массив')
+    position = 1
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON-файл')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        try:
+            yield item['name'], item['measurement_unit']
+        except (KeyError, TypeError):
+            yield None
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию — по расширению'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном INSERT'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if not path.exists():
+            raise CommandError(f'Файл не найден: {path}')
+
+        started = time.perf_counter()
+        self.skipped = 0
+        with open(path, encoding='utf-8') as file:
+            rows = self.clean_rows(READERS[file_format](file))
+            if connection.vendor == 'postgresql':
+                total, created = self.copy_rows(rows)
+            else:
+                total, created = self.insert_rows(rows, options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        if created:
+            ingredients_loaded.send(sender=Ingredient)
+        if self.skipped:
+            self.stderr.write(self.style.WARNING(
+                f'Пропущено {self.skipped} строк без названия '
+                f'или единицы измерения'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено {created} ингредиентов из {total} строк '
+            f'за {elapsed:.2f} с ({total / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
+
+    def clean_rows(self, rows):
+        for row in rows:
+            if row is None or not all(
+                isinstance(value, str) for value in row
+            ):
+                self.skipped += 1
+                continue
+            yield row[0].strip(), row[1].strip()
+
+    def insert_rows(self, rows, batch_size):
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        total = created = 0
+        batch = []
+        with transaction.atomic():
+            for row in rows:
+                total += 1
+                if row in existing:
+                    continue
+                existing.add(row)
+                batch.append(Ingredient(name=row[0], measurement_unit=row[1]))
+                if len(batch) >= batch_size:
+                    created += self.insert_batch(batch)
+                    batch = []
+            created += self.insert_batch(batch)
+        return total, created
+
+    @staticmethod
+    def insert_batch(batch):
+        # Строки, добавленные параллельно после чтения existing, тоже
+        # пропускаются: считаем только то, что вернул INSERT.
+        return len(bulk_insert_ignore(batch, 'id'))
+
+    def copy_rows(self, rows):
+        """COPY во временную таблицу и слияние одним INSERT ... SELECT."""
+        table = Ingredient._meta.db_table
+        total = 0
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as staging:
+            writer = csv.writer(staging)
+            for row in rows:
+                writer.writerow(row)
+                total += 1
+            staging.seek(0)
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    'CREATE TEMPORARY TABLE ingredient_staging '
+                    '(name varchar(200), measurement_unit varchar(200)) '
+                    'ON COMMIT DROP'
+                )
+                cursor.copy_expert(
+                    'COPY ingredient_staging (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    staging
+                )
+                cursor.execute(
+                    f'INSERT INTO {table} (name, measurement_unit) '
+                    f'SELECT DISTINCT s.name, s.measurement_unit '
+                    f'FROM ingredient_staging s '
+                    f'WHERE NOT EXISTS ('
+                    f'SELECT 1 FROM {table} i '
+                    f'WHERE i.name = s.name '
+                    f'AND i.measurement_unit = s.measurement_unit)'
+                )
+                created = cursor.rowcount
+        return total, created
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.shopping_list import (
+    find_shopping_list_mismatches, rebuild_shopping_lists
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает готовые списки покупок по корзинам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти расхождения, ничего не меняя'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            mismatches = find_shopping_list_mismatches()
+            for user_id, ingredient_id, expected, stored in mismatches:
+                self.stdout.write(
+                    f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                    f'ожидалось {expected}, сохранено {stored}'
+                )
+            if mismatches:
+                raise CommandError(
+                    f'Расхождений в списках покупок: {len(mismatches)}'
+                )
+            self.stdout.write(self.style.SUCCESS('Списки покупок сходятся'))
+            return
+
+        created = rebuild_shopping_lists()
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, позиций: {created}'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного, корзин и рецептов авторов'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        for counter, fixed in recount().items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Сливает одинаковые ингредиенты перед добавлением уникальности."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+
+    for group in duplicates:
+        keep_id = group['keep_id']
+        extra_ids = list(Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit']
+        ).exclude(id=keep_id).values_list('id', flat=True))
+
+        for amount in RecipeIngredient.objects.filter(
+                ingredient_id__in=extra_ids
+        ):
+            kept = RecipeIngredient.objects.filter(
+                recipe_id=amount.recipe_id, ingredient_id=keep_id
+            ).first()
+            if kept is None:
+                amount.ingredient_id = keep_id
+                amount.save(update_fields=['ingredient'])
+            else:
+                kept.amount += amount.amount
+                kept.save(update_fields=['amount'])
+                amount.delete()
+
+        Ingredient.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_alter_favorite_recipe_alter_favorite_user_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
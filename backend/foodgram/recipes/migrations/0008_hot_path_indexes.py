@@ -0,0 +1,56 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+INGREDIENT_NAME_PATTERN_INDEX = 'ingredient_upper_name_like_idx'
+
+
+def create_name_pattern_index(apps, schema_editor):
+    # Индекс для UPPER(name) LIKE 'префикс%' (istartswith) есть только
+    # в PostgreSQL: UPPER возвращает text, поэтому text_pattern_ops.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INGREDIENT_NAME_PATTERN_INDEX} '
+        f'ON recipes_ingredient (UPPER(name) text_pattern_ops)'
+    )
+
+
+def drop_name_pattern_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'DROP INDEX IF EXISTS {INGREDIENT_NAME_PATTERN_INDEX}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_merge_duplicate_ingredients'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['recipe', 'user'], name='favorite_recipe_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['recipe', 'user'], name='shopping_cart_recipe_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_unit'),
+        ),
+        migrations.RunPython(
+            create_name_pattern_index, drop_name_pattern_index
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.db.models import Sum
+
+BATCH_SIZE = 1000
+
+
+def fill_shopping_lists(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+
+    totals = RecipeIngredient.objects.filter(
+        recipe__in_shopping_carts__isnull=False
+    ).values_list(
+        'recipe__in_shopping_carts__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by().iterator()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id,
+                total_amount=total
+            )
+            for user_id, ingredient_id, total in totals
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_shopping_list_item'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
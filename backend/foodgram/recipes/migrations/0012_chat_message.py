@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_fill_shopping_list_items'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room', models.CharField(max_length=64, verbose_name='Комната')),
+                ('user_label', models.CharField(max_length=254, verbose_name='Подпись автора')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('sent_at', models.DateTimeField(verbose_name='Отправлено')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chat_messages', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Сообщение чата',
+                'verbose_name_plural': 'Сообщения чата',
+                'ordering': ['sent_at'],
+                'indexes': [models.Index(fields=['room', '-sent_at'], name='chat_room_sent_idx')],
+            },
+        ),
+    ]
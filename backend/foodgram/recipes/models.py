@@ -1,12 +1,14 @@
 from django.core.validators import MinValueValidator
 from django.db import models
 
-from users.models import User
+from users.models import CounterFieldsMixin, User
 
 
 RECIPE_NAME_LENGTH = 200
 INGREDIENT_NAME_LENGTH = 200
 MEASUREMENT_NAME_LENGTH = 200
+CHAT_ROOM_LENGTH = 64
+CHAT_USER_LENGTH = 254
 
 
 class Ingredient(models.Model):
@@ -17,6 +19,12 @@ class Ingredient(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit'
+            )
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ['name']
@@ -25,7 +33,7 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -50,8 +58,22 @@ class Recipe(models.Model):
         ]
     )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        'В корзинах покупок', default=0, editable=False
+    )
+
+    counter_fields = ('favorites_count', 'shopping_cart_count')
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_idx'
+            )
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
@@ -117,6 +139,12 @@ class Favorite(models.Model):
                 name='unique_favorite'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorite_recipe_user_idx'
+            )
+        ]
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
 
@@ -145,8 +173,79 @@ class ShoppingCart(models.Model):
                 name='unique_shopping_cart'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='shopping_cart_recipe_user_idx'
+            )
+        ]
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
 
     def __str__(self):
         return f'{self.recipe.name} в списке покупок у {self.user.email}'
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в корзине пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    # Без ограничения на знак: при удалении рецепта из корзины сумма
+    # сначала уменьшается, а опустевшие строки удаляются следом.
+    total_amount = models.IntegerField('Количество')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Списки покупок по ингредиентам'
+
+    def __str__(self):
+        return f'{self.ingredient.name} у {self.user.email}'
+
+
+class ChatMessage(models.Model):
+    """Сообщение чата, записанное пачкой из api.chat.ChatArchive."""
+
+    room = models.CharField('Комната', max_length=CHAT_ROOM_LENGTH)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='chat_messages',
+        verbose_name='Автор'
+    )
+    user_label = models.CharField(
+        'Подпись автора', max_length=CHAT_USER_LENGTH
+    )
+    text = models.TextField('Текст')
+    sent_at = models.DateTimeField('Отправлено')
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['room', '-sent_at'], name='chat_room_sent_idx'
+            )
+        ]
+        verbose_name = 'Сообщение чата'
+        verbose_name_plural = 'Сообщения чата'
+        ordering = ['sent_at']
+
+    def __str__(self):
+        return f'{self.user_label} в {self.room}'
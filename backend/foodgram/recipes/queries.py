@@ -0,0 +1,75 @@
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, router
+
+
+def _insert_ignore_sql(objs, connection, returning=None):
+    model = type(objs[0])
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    quote = connection.ops.quote_name
+    row = f'({", ".join(["%s"] * len(fields))})'
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} '
+        f'({", ".join(quote(field.column) for field in fields)}) '
+        f'VALUES {", ".join([row] * len(objs))} '
+        f'ON CONFLICT DO NOTHING'
+    )
+    if returning:
+        sql += f' RETURNING {quote(model._meta.get_field(returning).column)}'
+    params = [
+        field.get_db_prep_save(field.pre_save(obj, add=True), connection)
+        for obj in objs
+        for field in fields
+    ]
+    return sql, params
+
+
+def insert_ignore(obj):
+    """Вставляет объект одним INSERT ... ON CONFLICT DO NOTHING.
+
+    Возвращает True, если строка добавлена, и False, если такая уже
+    есть. В отличие от проверки exists() перед save() не допускает
+    гонки между параллельными запросами.
+    """
+    connection = connections[router.db_for_write(type(obj))]
+    with connection.cursor() as cursor:
+        cursor.execute(*_insert_ignore_sql([obj], connection))
+        return cursor.rowcount == 1
+
+
+def bulk_insert_ignore(objs, returning):
+    """Как insert_ignore, но для списка объектов одним запросом.
+
+    Возвращает множество значений поля returning у добавленных строк,
+    уже существующие строки в него не попадают.
+    """
+    if not objs:
+        return set()
+    connection = connections[router.db_for_write(type(objs[0]))]
+    with connection.cursor() as cursor:
+        cursor.execute(*_insert_ignore_sql(objs, connection, returning))
+        return {value for value, in cursor.fetchall()}
+
+
+def delete_returning(queryset, returning):
+    """Удаляет строки queryset одним DELETE без сигналов.
+
+    Возвращает множество значений поля returning у удалённых строк.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    try:
+        subquery, params = queryset.values('pk').query.sql_with_params()
+    except EmptyResultSet:
+        return set()
+    sql = (
+        f'DELETE FROM {quote(model._meta.db_table)} '
+        f'WHERE {quote(model._meta.pk.column)} IN ({subquery}) '
+        f'RETURNING {quote(model._meta.get_field(returning).column)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {value for value, in cursor.fetchall()}
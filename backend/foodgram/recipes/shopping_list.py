@@ -0,0 +1,117 @@
+"""Готовые списки покупок пользователей.
+
+Добавление рецептов в корзину и удаление из неё через API меняют
+суммы ингредиентов одним UPSERT. Остальные изменения корзины и состава
+рецептов пересобирают списки затронутых пользователей целиком.
+"""
+from django.db import connections, router, transaction
+from django.db.models import Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+def get_live_totals(user_ids=None):
+    """Суммы ингредиентов, посчитанные заново по корзинам."""
+    # Один filter(), чтобы values() переиспользовал то же соединение
+    # с корзинами, а не добавил второе.
+    if user_ids is None:
+        queryset = RecipeIngredient.objects.filter(
+            recipe__in_shopping_carts__isnull=False
+        )
+    else:
+        queryset = RecipeIngredient.objects.filter(
+            recipe__in_shopping_carts__user__in=user_ids
+        )
+    return queryset.values_list(
+        'recipe__in_shopping_carts__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def rebuild_shopping_lists(user_ids=None):
+    """Пересобирает списки пользователей, по умолчанию — всех."""
+    if isinstance(user_ids, (list, tuple, set)) and not user_ids:
+        return 0
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user__in=user_ids)
+    connection = connections[router.db_for_write(ShoppingListItem)]
+    quote = connection.ops.quote_name
+    select, params = get_live_totals(user_ids).query.sql_with_params()
+    # Без транзакции между DELETE и INSERT списки видны пустыми, а
+    # упавший INSERT оставил бы их пустыми насовсем.
+    with transaction.atomic(using=connection.alias):
+        items.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(ShoppingListItem._meta.db_table)} '
+                f'({quote("user_id")}, {quote("ingredient_id")}, '
+                f'{quote("total_amount")}) {select}',
+                params
+            )
+            return cursor.rowcount
+
+
+def rebuild_recipe_shopping_lists(recipe_ids):
+    """Пересобирает списки всех, у кого эти рецепты в корзине."""
+    return rebuild_shopping_lists(ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('user_id'))
+
+
+def _change_shopping_list(user_id, recipe_ids, sign):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    connection = connections[router.db_for_write(ShoppingListItem)]
+    quote = connection.ops.quote_name
+    items = quote(ShoppingListItem._meta.db_table)
+    total = quote('total_amount')
+    amount = quote('amount')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {items} '
+            f'({quote("user_id")}, {quote("ingredient_id")}, {total}) '
+            f'SELECT %s, {quote("ingredient_id")}, %s * SUM({amount}) '
+            f'FROM {quote(RecipeIngredient._meta.db_table)} '
+            f'WHERE {quote("recipe_id")} '
+            f'IN ({", ".join(["%s"] * len(recipe_ids))}) '
+            f'GROUP BY {quote("ingredient_id")} '
+            f'ON CONFLICT ({quote("user_id")}, {quote("ingredient_id")}) '
+            f'DO UPDATE SET {total} = {items}.{total} + excluded.{total}',
+            [user_id, sign, *recipe_ids]
+        )
+    if sign < 0:
+        ShoppingListItem.objects.filter(
+            user_id=user_id, total_amount__lte=0
+        ).delete()
+
+
+def add_to_shopping_list(user_id, recipe_ids):
+    """Прибавляет ингредиенты рецептов, только что попавших в корзину."""
+    _change_shopping_list(user_id, recipe_ids, 1)
+
+
+def remove_from_shopping_list(user_id, recipe_ids):
+    """Вычитает ингредиенты рецептов, удалённых из корзины."""
+    _change_shopping_list(user_id, recipe_ids, -1)
+
+
+def find_shopping_list_mismatches():
+    """Расхождения готовых списков с подсчётом по корзинам.
+
+    Возвращает кортежи (пользователь, ингредиент, ожидалось, сохранено).
+    """
+    live = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in get_live_totals().iterator()
+    }
+    stored = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in ShoppingListItem.objects
+        .values_list('user_id', 'ingredient_id', 'total_amount').iterator()
+    }
+    return sorted(
+        (*key, live.get(key), stored.get(key))
+        for key in live.keys() | stored.keys()
+        if live.get(key) != stored.get(key)
+    )
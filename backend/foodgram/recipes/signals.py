@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+
+# Отправляется после массовой загрузки ингредиентов в обход save().
+ingredients_loaded = Signal()
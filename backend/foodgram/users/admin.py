@@ -1,6 +1,5 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from django.db.models import Count
 
 from .models import User, Subscription
 
@@ -36,17 +35,6 @@ class CustomUserAdmin(UserAdmin):
         }),
     )
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            recipes_count=Count('recipes')
-        )
-
-    def recipes_count(self, obj):
-        return obj.recipes_count
-
-    recipes_count.admin_order_field = 'recipes_count'
-    recipes_count.short_description = 'Количество рецептов'
-
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
         is_superuser = request.user.is_superuser
@@ -6,7 +6,26 @@ NAME_LENGTH = 150
 EMAIL_LENGTH = 254
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """Не даёт save() затереть счётчики, изменённые через F()."""
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     email = models.EmailField(
         'Email адрес',
         max_length=EMAIL_LENGTH,
@@ -25,6 +44,11 @@ class User(AbstractUser):
         default='',
         blank=True
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False
+    )
+
+    counter_fields = ('recipes_count',)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -60,6 +84,12 @@ class Subscription(models.Model):
                 name='unique_subscription'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='subscription_author_user_idx'
+            )
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 